@@ -157,7 +157,7 @@ def verify_token():
                 status_code=401
             )), 401
         
-        logger.info(f"✅ Token verified for user: {user.username}")
+        logger.debug(f"✅ Token verified for user: {user.username}")
         
         return jsonify(success_response(
             message='Token hợp lệ',
@@ -3,12 +3,13 @@ Video Processing API
 API để xử lý video (speech-to-text, translation, subtitle, quiz, vocabulary)
 """
 import logging
-import threading
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from database.models import Video
+from database.models import Video, ProcessingJob
 from middleware.auth_middleware import get_current_user
-from modules.video_processor.process_video import process_video_background
+from modules.video_processor.job_queue import job_queue, enqueue_video_processing
+from modules.translation.translation_memory import translation_memory
+from modules.speech_to_text.transcription_service import transcription_service
 from utils.response_handler import success_response, error_response
 
 logger = logging.getLogger(__name__)
@@ -28,9 +29,10 @@ def process_video(video_id):
         video_id: ID của video
     
     Returns:
-        202: Đã bắt đầu xử lý
+        202: Đã đưa vào hàng đợi xử lý
         404: Video không tồn tại
         403: Không có quyền
+        429: Hàng đợi đầy
     """
     try:
         user = get_current_user()
@@ -57,24 +59,24 @@ def process_video(video_id):
                 data={'video': video.to_dict()}
             )), 200
         
-        # Get app instance để truyền vào background thread
-        app = current_app._get_current_object()
+        # Đưa video vào hàng đợi xử lý (worker pool giới hạn)
+        success, job, message = enqueue_video_processing(video_id, user.user_id)
         
-        # Start processing in background thread
-        thread = threading.Thread(
-            target=process_video_background,
-            args=(video_id, app)  # Truyền app instance vào
-        )
-        thread.daemon = True
-        thread.start()
+        if not success:
+            return jsonify(error_response(
+                message=message,
+                status_code=429
+            )), 429
         
-        logger.info(f"Started background processing for video {video_id}")
+        logger.info(f"Queued processing job {job.job_id} for video {video_id}")
         
         return jsonify(success_response(
-            message='Đã bắt đầu xử lý video. Quá trình có thể mất vài phút.',
+            message='Đã đưa video vào hàng đợi xử lý. Quá trình có thể mất vài phút.',
             data={
                 'video_id': video_id,
-                'status': 'processing'
+                'status': job.status,
+                'job': job.to_dict(),
+                'queue_position': job_queue.get_queue_position(job)
             }
         )), 202
         
@@ -117,12 +119,19 @@ def get_processing_status(video_id):
         subtitle_count = Subtitle.query.filter_by(video_id=video_id).count()
         quiz_count = Quiz.query.filter_by(video_id=video_id).count()
         
+        # Job xử lý gần nhất của video
+        job = ProcessingJob.query.filter_by(video_id=video_id).order_by(
+            ProcessingJob.job_id.desc()
+        ).first()
+        
         return jsonify(success_response(
             message='Lấy trạng thái thành công',
             data={
                 'video': video.to_dict(),
                 'subtitle_count': subtitle_count,
                 'quiz_count': quiz_count,
+                'job': job.to_dict() if job else None,
+                'queue_position': job_queue.get_queue_position(job),
                 'is_ready': video.status == 'completed'
             }
         )), 200
@@ -133,4 +142,76 @@ def get_processing_status(video_id):
             message='Lỗi khi lấy trạng thái',
             status_code=500,
             error=str(e)
-        )), 500
\ No newline at end of file
+        )), 500
+
+
+@process_bp.route('/queue', methods=['GET'])
+@jwt_required()
+def get_queue_stats():
+    """
+    API lấy thống kê hàng đợi xử lý video
+    
+    Returns:
+        200: Số job theo trạng thái, số worker và số worker đang bận
+    """
+    try:
+        return jsonify(success_response(
+            message='Lấy thống kê hàng đợi thành công',
+            data=job_queue.get_stats()
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Lỗi API get_queue_stats: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi lấy thống kê hàng đợi',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@process_bp.route('/translation-memory', methods=['GET'])
+@jwt_required()
+def get_translation_memory_stats():
+    """
+    API lấy thống kê translation memory
+    
+    Returns:
+        200: Số hit/miss (process hiện tại và tích lũy), hit rate, số bản dịch đã lưu
+    """
+    try:
+        return jsonify(success_response(
+            message='Lấy thống kê translation memory thành công',
+            data=translation_memory.get_stats()
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Lỗi API get_translation_memory_stats: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi lấy thống kê translation memory',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@process_bp.route('/whisper', methods=['GET'])
+@jwt_required()
+def get_whisper_stats():
+    """
+    API lấy thống kê transcription service
+    
+    Returns:
+        200: Số job đang chờ, trạng thái và mức sử dụng từng Whisper replica
+    """
+    try:
+        return jsonify(success_response(
+            message='Lấy thống kê Whisper thành công',
+            data=transcription_service.get_stats()
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Lỗi API get_whisper_stats: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi lấy thống kê Whisper',
+            status_code=500,
+            error=str(e)
+        )), 500
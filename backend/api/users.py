@@ -7,7 +7,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.models import LearningProgress, Video
 from database.db_config import db
-from middleware.auth_middleware import get_current_user
+from middleware.auth_middleware import get_current_user, invalidate_user_cache
 from modules.auth import change_password
 from utils.response_handler import success_response, error_response
 
@@ -100,6 +100,7 @@ def update_profile():
             user.email = data['email']
         
         db.session.commit()
+        invalidate_user_cache(user.user_id)
         
         return jsonify(success_response(
             message='Cập nhật profile thành công',
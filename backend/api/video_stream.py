@@ -3,12 +3,20 @@ Video Streaming API - Serve video files
 Thêm vào videos.py hoặc tạo file riêng
 """
 import logging
+import mimetypes
 import os
-from flask import Blueprint, request, jsonify, send_file
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, send_file, send_from_directory, current_app, url_for
 from flask_jwt_extended import jwt_required
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
 from database.models import Video
 from middleware.auth_middleware import get_current_user
-from utils.response_handler import error_response
+from utils.response_handler import success_response, error_response
+from utils.file_handler import get_file_extension
+from utils.constants import VIDEO_MIME_TYPES
+from modules.video_processor.hls_packager import get_hls_playlist, HLS_MIME_TYPES, MASTER_PLAYLIST
+from config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,57 @@ logger = logging.getLogger(__name__)
 video_stream_bp = Blueprint('video_stream', __name__)
 
 
+def get_video_mimetype(file_path):
+    """
+    Xác định MIME type của video theo phần mở rộng
+    
+    Args:
+        file_path: Đường dẫn file video
+    
+    Returns:
+        str: MIME type (mặc định application/octet-stream)
+    """
+    extension = get_file_extension(file_path)
+    
+    if extension in VIDEO_MIME_TYPES:
+        return VIDEO_MIME_TYPES[extension]
+    
+    return mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+
+def send_video_file(video, as_attachment=False):
+    """
+    Gửi file video hỗ trợ Range (206), ETag/Last-Modified (304)
+    
+    send_file(conditional=True) chỉ đọc đoạn byte được yêu cầu nên tua video
+    không phải tải lại từ đầu.
+    
+    Args:
+        video: Video
+        as_attachment: True = tải về, False = phát trực tiếp
+    
+    Returns:
+        Flask response
+    """
+    try:
+        return send_file(
+            video.file_path,
+            mimetype=get_video_mimetype(video.file_path),
+            as_attachment=as_attachment,
+            download_name=video.original_filename,
+            conditional=True,
+            etag=True
+        )
+    except RequestedRangeNotSatisfiable:
+        response = jsonify(error_response(
+            message='Range không hợp lệ',
+            status_code=416
+        ))
+        response.status_code = 416
+        response.headers['Content-Range'] = f"bytes */{os.path.getsize(video.file_path)}"
+        return response
+
+
 @video_stream_bp.route('/stream/<int:video_id>', methods=['GET'])
 @jwt_required()
 def stream_video(video_id):
@@ -42,13 +101,8 @@ def stream_video(video_id):
                 status_code=404
             )), 404
         
-        # Stream video
-        return send_file(
-            video.file_path,
-            mimetype='video/mp4',
-            as_attachment=False,
-            download_name=video.original_filename
-        )
+        # Stream video (Range/ETag do send_video_file xử lý)
+        return send_video_file(video)
         
     except Exception as e:
         logger.error(f"Lỗi stream video: {str(e)}")
@@ -76,12 +130,7 @@ def download_video(video_id):
                 status_code=404
             )), 404
         
-        return send_file(
-            video.file_path,
-            mimetype='video/mp4',
-            as_attachment=True,
-            download_name=video.original_filename
-        )
+        return send_video_file(video, as_attachment=True)
         
     except Exception as e:
         logger.error(f"Lỗi download video: {str(e)}")
@@ -89,4 +138,148 @@ def download_video(video_id):
             message='Lỗi khi download video',
             status_code=500,
             error=str(e)
-        )), 500
\ No newline at end of file
+        )), 500
+
+
+def create_hls_token(video, user_id):
+    """
+    Tạo token ký (itsdangerous, SECRET_KEY) cho phép đọc HLS của một video
+
+    Player HLS gốc (Safari/AVPlayer, <video src=...m3u8>) không gửi được header
+    Authorization, nên token nằm trong đường dẫn: URI tương đối trong playlist
+    (index.m3u8, segment_*.ts, phụ đề) tự giữ token mà không cần sửa playlist.
+    """
+    return _hls_serializer().dumps({'video_id': video.video_id, 'user_id': user_id})
+
+
+def _hls_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='hls-playlist')
+
+
+def _verify_hls_token(token, video_id):
+    """
+    Kiểm tra token HLS
+
+    Returns:
+        tuple: (user_id: int or None, remaining_seconds: int)
+    """
+    expires = current_app.config['HLS_TOKEN_EXPIRES']
+
+    try:
+        payload, signed_at = _hls_serializer().loads(token, max_age=expires, return_timestamp=True)
+    except (BadSignature, SignatureExpired):
+        return None, 0
+
+    if payload.get('video_id') != video_id:
+        return None, 0
+
+    elapsed = (datetime.now(timezone.utc) - signed_at).total_seconds()
+    return payload.get('user_id'), max(0, int(expires - elapsed))
+
+
+@video_stream_bp.route('/<int:video_id>/hls', methods=['GET'])
+@jwt_required()
+def get_hls_url(video_id):
+    """
+    Lấy URL master playlist HLS đã ký (dùng được làm <video src> không cần JWT)
+    Path: /api/v1/videos/<video_id>/hls
+    """
+    try:
+        user = get_current_user()
+        
+        video = Video.query.filter_by(video_id=video_id, user_id=user.user_id).first()
+        
+        if not video:
+            return jsonify(error_response(
+                message='Không tìm thấy video',
+                status_code=404
+            )), 404
+        
+        if not get_hls_playlist(video):
+            return jsonify(error_response(
+                message='Video chưa được đóng gói HLS',
+                status_code=404
+            )), 404
+        
+        token = create_hls_token(video, user.user_id)
+        
+        return jsonify(success_response(
+            message='Lấy URL HLS thành công',
+            data={
+                'playlist_url': url_for(
+                    'video_stream.stream_hls', video_id=video_id, token=token, filename=MASTER_PLAYLIST
+                ),
+                'expires_in': current_app.config['HLS_TOKEN_EXPIRES']
+            }
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Lỗi lấy URL HLS: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi lấy URL HLS',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@video_stream_bp.route('/hls/<int:video_id>/<token>/<path:filename>', methods=['GET'])
+def stream_hls(video_id, token, filename):
+    """
+    Phục vụ HLS playlist/segment/phụ đề đã đóng gói (xác thực bằng token trong URL)
+    Path: /api/v1/videos/hls/<video_id>/<token>/master.m3u8
+    """
+    try:
+        user_id, remaining_seconds = _verify_hls_token(token, video_id)
+        
+        if user_id is None:
+            return jsonify(error_response(
+                message='URL HLS không hợp lệ hoặc đã hết hạn',
+                status_code=403
+            )), 403
+        
+        video = Video.query.filter_by(video_id=video_id, user_id=user_id).first()
+        
+        if not video:
+            return jsonify(error_response(
+                message='Không tìm thấy video',
+                status_code=404
+            )), 404
+        
+        playlist = get_hls_playlist(video)
+        
+        if not playlist:
+            return jsonify(error_response(
+                message='Video chưa được đóng gói HLS',
+                status_code=404
+            )), 404
+        
+        extension = get_file_extension(filename)
+        
+        try:
+            response = send_from_directory(
+                os.path.dirname(playlist),
+                filename,
+                mimetype=HLS_MIME_TYPES.get(extension),
+                conditional=True,
+                etag=True
+            )
+        except NotFound:
+            return jsonify(error_response(
+                message='Không tìm thấy file HLS',
+                status_code=404
+            )), 404
+        
+        # Nội dung HLS không đổi sau khi đóng gói → CDN/cache được theo URL đã ký,
+        # nhưng không lâu hơn hạn còn lại của token
+        max_age = min(Config.HLS_CACHE_MAX_AGE, remaining_seconds)
+        response.headers['Cache-Control'] = f"public, max-age={max_age}, immutable"
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"Lỗi stream HLS: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi stream HLS',
+            status_code=500,
+            error=str(e)
+        )), 500
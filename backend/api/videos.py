@@ -2,18 +2,31 @@
 Videos API Routes
 API cho quản lý video
 """
+import hashlib
 import logging
 import os
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from werkzeug.utils import secure_filename
-from database.models import Video
+from database.models import Video, UploadSession, Vocabulary, UserVocabulary
 from database.db_config import db
 from middleware.auth_middleware import get_current_user
 from utils.response_handler import success_response, error_response, paginated_response
 from utils.validators import validate_video_file
 from utils.file_handler import save_uploaded_file, delete_file
-from utils.constants import VIDEO_STATUS_PENDING, SUCCESS_VIDEO_UPLOAD, SUCCESS_VIDEO_DELETE
+from utils.pagination import encode_cursor, decode_cursor, keyset_filter, parse_bool_arg
+from api.vocabulary import invalidate_vocabulary_stats
+from modules.video_processor import validate_video
+from modules.video_processor.artifact_reuse import clone_processed_video
+from modules.video_processor.upload_session import (
+    create_upload_session, write_upload_chunk, finalize_upload,
+    complete_upload_session, release_upload_session, cancel_upload_session
+)
+from utils.constants import (
+    VIDEO_STATUS_PENDING, UPLOAD_STATUS_COMPLETED, UPLOAD_STATUS_WRITING, UPLOAD_STATUS_FINALIZING,
+    SUCCESS_VIDEO_UPLOAD, SUCCESS_VIDEO_DELETE
+)
 from config import Config
 
 logger = logging.getLogger(__name__)
@@ -32,6 +45,8 @@ def get_videos():
     - page: Trang (default: 1)
     - per_page: Số video mỗi trang (default: 10)
     - status: Lọc theo status (optional)
+    - cursor: next_cursor của trang trước (optional, thay cho page)
+    - include_total: Đếm tổng số video (default: true khi dùng page, false khi dùng cursor)
     """
     try:
         user = get_current_user()
@@ -40,6 +55,8 @@ def get_videos():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status', None, type=str)
+        cursor = request.args.get('cursor', None, type=str)
+        include_total = parse_bool_arg(request.args.get('include_total'), default=not cursor)
         
         # Query
         query = Video.query.filter_by(user_id=user.user_id)
@@ -47,12 +64,30 @@ def get_videos():
         if status:
             query = query.filter_by(status=status)
         
-        # Order by upload_date desc
-        query = query.order_by(Video.upload_date.desc())
+        total_items = query.count() if include_total else None
         
-        # Pagination
-        total_items = query.count()
-        videos = query.offset((page - 1) * per_page).limit(per_page).all()
+        # Order by upload_date desc (video_id để thứ tự ổn định cho cursor)
+        query = query.order_by(Video.upload_date.desc(), Video.video_id.desc())
+        
+        # Pagination: keyset theo (upload_date, video_id) nếu có cursor, ngược lại OFFSET
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, datetime.fromisoformat, int)
+            except ValueError as e:
+                return jsonify(error_response(message=str(e), status_code=400)), 400
+            
+            query = query.filter(keyset_filter([Video.upload_date, Video.video_id], cursor_values))
+            page = None
+        else:
+            query = query.offset((page - 1) * per_page)
+        
+        # Lấy thêm một dòng để biết còn trang sau không
+        videos = query.limit(per_page + 1).all()
+        next_cursor = None
+        
+        if len(videos) > per_page:
+            videos = videos[:per_page]
+            next_cursor = encode_cursor(videos[-1].upload_date, videos[-1].video_id)
         
         # Convert to dict
         videos_data = [video.to_dict() for video in videos]
@@ -62,7 +97,9 @@ def get_videos():
             page=page,
             per_page=per_page,
             total_items=total_items,
-            message='Lấy danh sách video thành công'
+            message='Lấy danh sách video thành công',
+            next_cursor=next_cursor,
+            cursor=cursor
         )), 200
         
     except Exception as e:
@@ -106,6 +143,54 @@ def get_video(video_id):
         )), 500
 
 
+def _register_uploaded_video(user, title, original_filename, file_path, content_hash):
+    """
+    Kiểm tra file video đã lưu, tạo Video record và dùng lại kết quả / đưa vào hàng đợi
+    (dùng chung cho upload một lần và upload theo chunk)
+    
+    Returns:
+        tuple: (success: bool, video: Video, message: str)
+    """
+    # Probe metadata một lần (ffprobe, được cache cho bước xử lý sau)
+    is_valid, message, video_info = validate_video(file_path)
+    
+    if not is_valid:
+        delete_file(file_path)
+        return False, None, message
+    
+    # Tạo video record
+    video = Video(
+        user_id=user.user_id,
+        title=title,
+        original_filename=secure_filename(original_filename),
+        file_path=file_path,
+        duration=video_info['duration'],
+        content_hash=content_hash,
+        status=VIDEO_STATUS_PENDING
+    )
+    
+    db.session.add(video)
+    db.session.commit()
+    
+    logger.info(f"Video uploaded: {video.video_id}")
+    
+    # Đã có video cùng nội dung được xử lý → dùng lại kết quả, không cần xếp hàng
+    cloned, _, _ = clone_processed_video(video)
+    
+    if not cloned:
+        # AUTO-START PROCESSING: đưa vào hàng đợi xử lý
+        from modules.video_processor.job_queue import enqueue_video_processing
+        
+        queued, job, queue_message = enqueue_video_processing(video.video_id, user.user_id)
+        
+        if queued:
+            logger.info(f"Auto-queued processing job {job.job_id} for video {video.video_id}")
+        else:
+            logger.warning(f"Không thể đưa video {video.video_id} vào hàng đợi: {queue_message}")
+    
+    return True, video, SUCCESS_VIDEO_UPLOAD
+
+
 @videos_bp.route('/upload', methods=['POST'])
 @jwt_required()
 def upload_video():
@@ -149,11 +234,13 @@ def upload_video():
         # Lấy title
         title = request.form.get('title', file.filename)
         
-        # Lưu file
+        # Lưu file (tính SHA-256 trong lúc ghi để nhận diện video trùng nội dung)
+        hasher = hashlib.sha256()
         success, file_path, save_message = save_uploaded_file(
             file=file,
             upload_folder=Config.UPLOAD_FOLDER,
-            subfolder='videos'
+            subfolder='videos',
+            hasher=hasher
         )
         
         if not success:
@@ -162,46 +249,289 @@ def upload_video():
                 status_code=500
             )), 500
         
-        # Tạo video record
-        video = Video(
-            user_id=user.user_id,
+        success, video, message = _register_uploaded_video(
+            user=user,
             title=title,
-            original_filename=secure_filename(file.filename),
+            original_filename=file.filename,
             file_path=file_path,
-            status=VIDEO_STATUS_PENDING
+            content_hash=hasher.hexdigest()
         )
         
-        db.session.add(video)
-        db.session.commit()
+        if not success:
+            return jsonify(error_response(
+                message=message,
+                status_code=400
+            )), 400
         
-        logger.info(f"Video uploaded: {video.video_id}")
+        return jsonify(success_response(
+            message=message,
+            data={'video': video.to_dict()}
+        )), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi API upload_video: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi upload video',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+def _get_upload_session(upload_id, user):
+    """Lấy phiên upload của user (None nếu không tồn tại)"""
+    return UploadSession.query.filter_by(upload_id=upload_id, user_id=user.user_id).first()
+
+
+@videos_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    """
+    API tạo phiên upload theo chunk (resumable)
+    
+    Request body:
+    {
+        "filename": "string",
+        "total_size": int (bytes),
+        "title": "string" (optional)
+    }
+    """
+    try:
+        user = get_current_user()
+        data = request.get_json() or {}
+        
+        filename = data.get('filename', '')
+        total_size = data.get('total_size')
+        
+        if not filename or not isinstance(total_size, int):
+            return jsonify(error_response(
+                message='Thiếu filename hoặc total_size',
+                status_code=400
+            )), 400
+        
+        is_valid, message = validate_video_file(
+            filename,
+            Config.ALLOWED_VIDEO_EXTENSIONS
+        )
+        
+        if not is_valid:
+            return jsonify(error_response(
+                message=message,
+                status_code=400
+            )), 400
+        
+        success, session, message = create_upload_session(
+            user.user_id, filename, total_size, title=data.get('title')
+        )
+        
+        if not success:
+            return jsonify(error_response(
+                message=message,
+                status_code=400
+            )), 400
+        
+        return jsonify(success_response(
+            message=message,
+            data={
+                'upload': session.to_dict(),
+                'chunk_size': Config.UPLOAD_CHUNK_SIZE
+            }
+        )), 201
+        
+    except Exception as e:
+        logger.error(f"Lỗi API create_upload: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi tạo phiên upload',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@videos_bp.route('/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """
+    API lấy trạng thái phiên upload (client dùng received_bytes để tiếp tục upload)
+    """
+    try:
+        user = get_current_user()
+        session = _get_upload_session(upload_id, user)
+        
+        if not session:
+            return jsonify(error_response(
+                message='Không tìm thấy phiên upload',
+                status_code=404
+            )), 404
+        
+        return jsonify(success_response(
+            message='Lấy trạng thái upload thành công',
+            data={'upload': session.to_dict()}
+        )), 200
         
-        # AUTO-START PROCESSING IN BACKGROUND
+    except Exception as e:
+        logger.error(f"Lỗi API get_upload: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi lấy trạng thái upload',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@videos_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """
+    API gửi một chunk (body là dữ liệu nhị phân)
+    
+    Query params:
+    - offset: Vị trí byte của chunk, phải bằng received_bytes hiện tại
+    """
+    try:
+        user = get_current_user()
+        session = _get_upload_session(upload_id, user)
+        
+        if not session:
+            return jsonify(error_response(
+                message='Không tìm thấy phiên upload',
+                status_code=404
+            )), 404
+        
+        offset = request.args.get('offset', None, type=int)
+        
+        if offset is None or offset < 0:
+            return jsonify(error_response(
+                message='Thiếu hoặc sai offset',
+                status_code=400
+            )), 400
+        
+        success, received_bytes, message = write_upload_chunk(session, offset, request.stream)
+        
+        if not success:
+            # Sai offset hoặc chunk khác đang ghi → 409 kèm received_bytes để client
+            # gửi lại từ đúng vị trí
+            conflict = offset != received_bytes or session.status == UPLOAD_STATUS_WRITING
+            status_code = 409 if conflict else 400
+            response = error_response(
+                message=message,
+                status_code=status_code
+            )
+            response['received_bytes'] = received_bytes
+            return jsonify(response), status_code
+        
+        return jsonify(success_response(
+            message=message,
+            data={'upload': session.to_dict()}
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Lỗi API upload_chunk: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi upload chunk',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@videos_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """
+    API kết thúc upload theo chunk: tạo video và bắt đầu xử lý
+    """
+    try:
+        user = get_current_user()
+        session = _get_upload_session(upload_id, user)
+        
+        if not session:
+            return jsonify(error_response(
+                message='Không tìm thấy phiên upload',
+                status_code=404
+            )), 404
+        
+        success, content_hash, message = finalize_upload(session)
+        
+        if not success:
+            return jsonify(error_response(
+                message=message,
+                status_code=400
+            )), 400
+        
+        # Phiên đã được claim (finalizing): lỗi bất ngờ → trả về uploading để gọi lại
         try:
-            import threading
-            from modules.video_processor.process_video import process_video_background
-            
-            thread = threading.Thread(
-                target=process_video_background,
-                args=(video.video_id,)
+            success, video, message = _register_uploaded_video(
+                user=user,
+                title=session.title,
+                original_filename=session.original_filename,
+                file_path=session.file_path,
+                content_hash=content_hash
             )
-            thread.daemon = True
-            thread.start()
-            
-            logger.info(f"Auto-started processing for video {video.video_id}")
-        except Exception as e:
-            logger.error(f"Error starting auto-process: {str(e)}")
+        except Exception:
+            release_upload_session(session)
+            raise
+        
+        if not success:
+            # File không hợp lệ đã bị xóa → bỏ phiên upload
+            cancel_upload_session(session, expected_status=UPLOAD_STATUS_FINALIZING)
+            return jsonify(error_response(
+                message=message,
+                status_code=400
+            )), 400
+        
+        complete_upload_session(session, video.video_id)
         
         return jsonify(success_response(
-            message=SUCCESS_VIDEO_UPLOAD,
+            message=message,
             data={'video': video.to_dict()}
         )), 201
         
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Lỗi API upload_video: {str(e)}")
+        logger.error(f"Lỗi API complete_upload: {str(e)}")
         return jsonify(error_response(
-            message='Lỗi khi upload video',
+            message='Lỗi khi hoàn tất upload',
+            status_code=500,
+            error=str(e)
+        )), 500
+
+
+@videos_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def delete_upload(upload_id):
+    """
+    API hủy phiên upload và xóa dữ liệu đã nhận
+    """
+    try:
+        user = get_current_user()
+        session = _get_upload_session(upload_id, user)
+        
+        if not session:
+            return jsonify(error_response(
+                message='Không tìm thấy phiên upload',
+                status_code=404
+            )), 404
+        
+        if session.status == UPLOAD_STATUS_COMPLETED:
+            return jsonify(error_response(
+                message='Phiên upload đã hoàn tất',
+                status_code=400
+            )), 400
+        
+        # Chỉ hủy khi không có request nào đang ghi chunk hoặc hoàn tất phiên này
+        if not cancel_upload_session(session):
+            return jsonify(error_response(
+                message='Phiên upload đang được xử lý, thử lại sau',
+                status_code=409
+            )), 409
+        
+        return jsonify(success_response(
+            message='Đã hủy phiên upload'
+        )), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi API delete_upload: {str(e)}")
+        return jsonify(error_response(
+            message='Lỗi khi hủy phiên upload',
             status_code=500,
             error=str(e)
         )), 500
@@ -229,10 +559,24 @@ def delete_video(video_id):
         if video.file_path and os.path.exists(video.file_path):
             delete_file(video.file_path)
         
+        # User có từ đã lưu thuộc video này (bị xóa theo cascade) → thống kê từ vựng đổi
+        affected_users = [
+            user_id for (user_id,) in db.session.query(UserVocabulary.user_id).filter(
+                db.or_(
+                    UserVocabulary.video_id == video_id,
+                    UserVocabulary.vocab_id.in_(
+                        db.session.query(Vocabulary.vocab_id).filter(Vocabulary.video_id == video_id)
+                    )
+                )
+            ).distinct()
+        ]
+        
         # Xóa record
         db.session.delete(video)
         db.session.commit()
         
+        invalidate_vocabulary_stats(affected_users)
+        
         logger.info(f"Video deleted: {video_id}")
         
         return jsonify(success_response(
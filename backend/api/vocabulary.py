@@ -11,19 +11,38 @@ Features:
 - ✅ Proper error handling
 """
 import logging
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
+from sqlalchemy import func
 from database.models import Vocabulary, UserVocabulary, Video
 from database.db_config import db
 from middleware.auth_middleware import get_current_user
 from utils.response_handler import success_response, error_response, paginated_response
 from utils.constants import SUCCESS_VOCABULARY_SAVED
+from utils.cache import TTLCache
+from utils.pagination import encode_cursor, decode_cursor, keyset_filter, parse_bool_arg
+from config import Config
 
 logger = logging.getLogger(__name__)
 
 # Tạo Blueprint
 vocabulary_bp = Blueprint('vocabulary', __name__)
 
+# Thống kê từ vựng theo user_id (xóa khi user lưu/xóa/cập nhật trạng thái từ hoặc video bị xóa)
+_stats_cache = TTLCache(max_entries=4096, ttl=Config.VOCABULARY_STATS_CACHE_TTL)
+
+
+def invalidate_vocabulary_stats(user_ids):
+    """
+    Xóa thống kê từ vựng đã cache của các user (khi từ đã lưu bị xóa ngoài API vocabulary)
+
+    Args:
+        user_ids: Iterable user_id
+    """
+    for user_id in user_ids:
+        _stats_cache.invalidate(user_id)
+
 
 @vocabulary_bp.route('/<int:video_id>', methods=['GET'])
 @jwt_required()
@@ -89,6 +108,8 @@ def get_all_vocabulary():
         - language: Lọc theo ngôn ngữ (optional)
         - search: Tìm kiếm từ (optional)
         - video_id: Lọc theo video (optional)
+        - cursor: next_cursor của trang trước (optional, thay cho page)
+        - include_total: Đếm tổng số từ (default: true khi dùng page, false khi dùng cursor)
     
     Returns:
         200: Danh sách từ vựng với pagination
@@ -102,6 +123,8 @@ def get_all_vocabulary():
         language = request.args.get('language', None)
         search = request.args.get('search', None)
         video_id = request.args.get('video_id', None, type=int)
+        cursor = request.args.get('cursor', None)
+        include_total = parse_bool_arg(request.args.get('include_total'), default=not cursor)
         
         # Query - Join với Video để chỉ lấy vocabulary của user
         query = db.session.query(Vocabulary).join(
@@ -124,12 +147,30 @@ def get_all_vocabulary():
                 )
             )
         
+        total_items = query.count() if include_total else None
+        
         # Order by vocab_id desc
         query = query.order_by(Vocabulary.vocab_id.desc())
         
-        # Pagination
-        total_items = query.count()
-        vocabularies = query.offset((page - 1) * per_page).limit(per_page).all()
+        # Pagination: keyset theo vocab_id nếu có cursor, ngược lại OFFSET
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, int)
+            except ValueError as e:
+                return jsonify(error_response(message=str(e), status_code=400)), 400
+            
+            query = query.filter(keyset_filter([Vocabulary.vocab_id], cursor_values))
+            page = None
+        else:
+            query = query.offset((page - 1) * per_page)
+        
+        # Lấy thêm một dòng để biết còn trang sau không
+        vocabularies = query.limit(per_page + 1).all()
+        next_cursor = None
+        
+        if len(vocabularies) > per_page:
+            vocabularies = vocabularies[:per_page]
+            next_cursor = encode_cursor(vocabularies[-1].vocab_id)
         
         # Convert to dict
         vocabularies_data = [vocab.to_dict() for vocab in vocabularies]
@@ -139,7 +180,9 @@ def get_all_vocabulary():
             page=page,
             per_page=per_page,
             total_items=total_items,
-            message='Lấy danh sách từ vựng thành công'
+            message='Lấy danh sách từ vựng thành công',
+            next_cursor=next_cursor,
+            cursor=cursor
         )), 200
         
     except Exception as e:
@@ -212,6 +255,7 @@ def save_vocabulary():
         
         db.session.add(user_vocab)
         db.session.commit()
+        _stats_cache.invalidate(user.user_id)
         
         logger.info(f"✅ User {user.user_id} saved vocabulary {vocab_id}")
         
@@ -230,6 +274,17 @@ def save_vocabulary():
         )), 500
 
 
+def _saved_vocabulary_to_dict(user_vocab, vocab):
+    """Gộp Vocabulary và trạng thái học của user thành một dict"""
+    vocab_data = vocab.to_dict()
+    vocab_data['user_vocab_id'] = user_vocab.id
+    vocab_data['learned_status'] = user_vocab.learned_status
+    vocab_data['saved_date'] = user_vocab.saved_date.isoformat() if user_vocab.saved_date else None
+    vocab_data['last_reviewed'] = user_vocab.last_reviewed.isoformat() if user_vocab.last_reviewed else None
+    vocab_data['review_count'] = user_vocab.review_count
+    return vocab_data
+
+
 @vocabulary_bp.route('/saved', methods=['GET'])
 @jwt_required()
 def get_saved_vocabulary():
@@ -242,6 +297,8 @@ def get_saved_vocabulary():
         - learned_status: Lọc theo trạng thái (optional: learning/learned/mastered)
         - language: Lọc theo ngôn ngữ (optional)
         - video_id: Lọc theo video (optional)
+        - cursor: next_cursor của trang trước (optional, thay cho page)
+        - include_total: Đếm tổng số từ (default: true khi dùng page, false khi dùng cursor)
     
     Returns:
         200: Danh sách từ vựng đã lưu với pagination
@@ -255,46 +312,84 @@ def get_saved_vocabulary():
         learned_status = request.args.get('learned_status', None)
         language = request.args.get('language', None)
         video_id = request.args.get('video_id', None, type=int)
-        
-        # Query
-        query = UserVocabulary.query.filter_by(user_id=user.user_id)
+        cursor = request.args.get('cursor', None)
+        include_total = parse_bool_arg(request.args.get('include_total'), default=not cursor)
+        
+        # Một query: join Vocabulary, lọc ngôn ngữ trong SQL
+        query = db.session.query(
+            UserVocabulary,
+            Vocabulary
+        ).join(
+            Vocabulary, UserVocabulary.vocab_id == Vocabulary.vocab_id
+        ).filter(
+            UserVocabulary.user_id == user.user_id
+        )
         
         if learned_status:
-            query = query.filter_by(learned_status=learned_status)
+            query = query.filter(UserVocabulary.learned_status == learned_status)
         
         if video_id:
-            query = query.filter_by(video_id=video_id)
-        
-        # Order by saved_date desc
-        query = query.order_by(UserVocabulary.saved_date.desc())
-        
-        # Pagination
-        total_items = query.count()
-        user_vocabs = query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Convert to dict và join với Vocabulary
-        vocabularies_data = []
-        for user_vocab in user_vocabs:
-            vocab = Vocabulary.query.get(user_vocab.vocab_id)
-            if vocab:
-                # Filter by language if specified
-                if language and vocab.language != language:
-                    continue
-                
-                vocab_data = vocab.to_dict()
-                vocab_data['user_vocab_id'] = user_vocab.id
-                vocab_data['learned_status'] = user_vocab.learned_status
-                vocab_data['saved_date'] = user_vocab.saved_date.isoformat() if user_vocab.saved_date else None
-                vocab_data['last_reviewed'] = user_vocab.last_reviewed.isoformat() if user_vocab.last_reviewed else None
-                vocab_data['review_count'] = user_vocab.review_count
-                vocabularies_data.append(vocab_data)
+            query = query.filter(UserVocabulary.video_id == video_id)
+        
+        if language:
+            query = query.filter(Vocabulary.language == language)
+        
+        # Order by saved_date desc (id để thứ tự ổn định giữa các trang)
+        order_columns = [UserVocabulary.saved_date, UserVocabulary.id]
+        query = query.order_by(*(column.desc() for column in order_columns))
+        total_items = None
+        
+        if cursor:
+            # Keyset theo (saved_date, id); tổng số (nếu cần) đếm trên query chưa lọc cursor
+            try:
+                cursor_values = decode_cursor(cursor, datetime.fromisoformat, int)
+            except ValueError as e:
+                return jsonify(error_response(message=str(e), status_code=400)), 400
+            
+            if include_total:
+                total_items = query.with_entities(func.count(UserVocabulary.id)).order_by(None).scalar()
+            
+            rows = query.filter(keyset_filter(order_columns, cursor_values)).limit(per_page + 1).all()
+            page = None
+        
+        elif include_total:
+            # Tổng số dòng qua COUNT(*) OVER() trong cùng query
+            rows = query.add_columns(
+                func.count().over().label('total_items')
+            ).offset((page - 1) * per_page).limit(per_page + 1).all()
+            
+            if rows:
+                total_items = rows[0].total_items
+            elif page > 1:
+                # Trang vượt quá cuối: không có dòng nào mang tổng số → đếm riêng
+                total_items = query.with_entities(func.count(UserVocabulary.id)).order_by(None).scalar()
+            else:
+                total_items = 0
+        
+        else:
+            rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        
+        # Lấy thêm một dòng để biết còn trang sau không
+        next_cursor = None
+        
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            last_user_vocab = rows[-1][0]
+            next_cursor = encode_cursor(last_user_vocab.saved_date, last_user_vocab.id)
+        
+        vocabularies_data = [
+            _saved_vocabulary_to_dict(row[0], row[1])
+            for row in rows
+        ]
         
         return jsonify(paginated_response(
             items=vocabularies_data,
             page=page,
             per_page=per_page,
-            total_items=len(vocabularies_data),  # Use filtered count
-            message='Lấy danh sách từ vựng thành công'
+            total_items=total_items,
+            message='Lấy danh sách từ vựng thành công',
+            next_cursor=next_cursor,
+            cursor=cursor
         )), 200
         
     except Exception as e:
@@ -337,6 +432,7 @@ def delete_vocabulary(user_vocab_id):
         # Xóa
         db.session.delete(user_vocab)
         db.session.commit()
+        _stats_cache.invalidate(user.user_id)
         
         logger.info(f"✅ User {user.user_id} deleted vocabulary {user_vocab_id}")
         
@@ -413,6 +509,7 @@ def update_vocabulary_status(user_vocab_id):
         user_vocab.last_reviewed = datetime.utcnow()
         
         db.session.commit()
+        _stats_cache.invalidate(user.user_id)
         
         logger.info(f"✅ User {user.user_id} updated vocabulary {user_vocab_id} to {learned_status}")
         
@@ -431,6 +528,55 @@ def update_vocabulary_status(user_vocab_id):
         )), 500
 
 
+def _compute_vocabulary_stats(user_id):
+    """
+    Tính thống kê từ vựng của user bằng một query GROUP BY trên user_vocabulary
+    (outer join với vocabulary: từ đã lưu mất vocabulary vẫn được tính vào total/trạng thái,
+    chỉ bỏ qua ở by_language/by_video)
+    
+    Returns:
+        dict: total, learning, learned, mastered, by_language, by_video
+    """
+    rows = db.session.query(
+        UserVocabulary.learned_status,
+        Vocabulary.language,
+        Vocabulary.video_id,
+        func.count(UserVocabulary.id)
+    ).outerjoin(
+        Vocabulary, UserVocabulary.vocab_id == Vocabulary.vocab_id
+    ).filter(
+        UserVocabulary.user_id == user_id
+    ).group_by(
+        UserVocabulary.learned_status, Vocabulary.language, Vocabulary.video_id
+    ).all()
+    
+    stats = {
+        'total': 0,
+        'learning': 0,
+        'learned': 0,
+        'mastered': 0,
+        'by_language': {},
+        'by_video': {}
+    }
+    
+    for learned_status, language, video_id, count in rows:
+        stats['total'] += count
+        
+        if learned_status in ('learning', 'learned', 'mastered'):
+            stats[learned_status] += count
+        
+        # language NOT NULL → None nghĩa là vocabulary không còn
+        if language is None:
+            continue
+        
+        stats['by_language'][language] = stats['by_language'].get(language, 0) + count
+        
+        if video_id:
+            stats['by_video'][video_id] = stats['by_video'].get(video_id, 0) + count
+    
+    return stats
+
+
 @vocabulary_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_vocabulary_stats():
@@ -458,38 +604,11 @@ def get_vocabulary_stats():
     try:
         user = get_current_user()
         
-        # Tổng số từ đã lưu
-        total = UserVocabulary.query.filter_by(user_id=user.user_id).count()
-        
-        # Theo trạng thái
-        learning = UserVocabulary.query.filter_by(user_id=user.user_id, learned_status='learning').count()
-        learned = UserVocabulary.query.filter_by(user_id=user.user_id, learned_status='learned').count()
-        mastered = UserVocabulary.query.filter_by(user_id=user.user_id, learned_status='mastered').count()
-        
-        # Theo ngôn ngữ
-        user_vocabs = UserVocabulary.query.filter_by(user_id=user.user_id).all()
-        by_language = {}
-        by_video = {}
-        
-        for user_vocab in user_vocabs:
-            vocab = Vocabulary.query.get(user_vocab.vocab_id)
-            if vocab:
-                # By language
-                lang = vocab.language
-                by_language[lang] = by_language.get(lang, 0) + 1
-                
-                # By video
-                if vocab.video_id:
-                    by_video[vocab.video_id] = by_video.get(vocab.video_id, 0) + 1
-        
-        stats = {
-            'total': total,
-            'learning': learning,
-            'learned': learned,
-            'mastered': mastered,
-            'by_language': by_language,
-            'by_video': by_video
-        }
+        stats = _stats_cache.get(user.user_id)
+        
+        if stats is None:
+            stats = _compute_vocabulary_stats(user.user_id)
+            _stats_cache.set(user.user_id, stats)
         
         return jsonify(success_response(
             message='Lấy thống kê thành công',
@@ -28,12 +28,13 @@ from api.process import process_bp
 # Force UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-def create_app(config_name='development'):
+def create_app(config_name='development', start_job_queue=True):
     """
     Factory function để tạo Flask application
     
     Args:
         config_name: Tên cấu hình (development, production, testing)
+        start_job_queue: Khởi động worker pool xử lý video (False cho worker process)
     
     Returns:
         Flask app instance
@@ -45,6 +46,7 @@ def create_app(config_name='development'):
     
     # Load configuration
     app.config.from_object(config[config_name])
+    app.config['CONFIG_NAME'] = config_name
 
         # ========== ADD THESE LINES ==========
     # Force UTF-8
@@ -52,6 +54,9 @@ def create_app(config_name='development'):
     
     @app.after_request
     def after_request(response):
+        # File (video stream/download, phụ đề) giữ nguyên Content-Type của send_file
+        if response.direct_passthrough:
+            return response
         response.headers['Content-Type'] = 'application/json; charset=utf-8'
         return response
     # ====================================
@@ -88,7 +93,16 @@ def create_app(config_name='development'):
     app.register_blueprint(users_bp, url_prefix='/api/v1/users')
     app.register_blueprint(process_bp, url_prefix='/api/v1/process')
     app.register_blueprint(video_stream_bp, url_prefix='/api/v1/videos')
-
+    
+    # Khởi động hàng đợi xử lý video (worker pool giới hạn)
+    if start_job_queue and app.config.get('JOB_QUEUE_ENABLED'):
+        from modules.video_processor.job_queue import init_job_queue
+        init_job_queue(app)
+        
+        # Thread workers transcribe trong process này → warm-up Whisper ở background
+        if app.config.get('JOB_WORKER_MODE') != 'process':
+            from modules.speech_to_text.transcription_service import init_transcription_service
+            init_transcription_service()
     
     # Health check route
     @app.route('/')
@@ -117,6 +131,29 @@ def create_app(config_name='development'):
             data={'status': 'healthy'}
         ))
     
+    @app.route('/api/v1/ready')
+    def readiness_check():
+        """Readiness probe: 503 cho tới khi các worker của job queue load xong Whisper"""
+        from modules.video_processor.job_queue import job_queue
+        from modules.speech_to_text.transcription_service import transcription_service
+        
+        if not job_queue.is_ready():
+            return jsonify(error_response(
+                message='Whisper model đang được load',
+                status_code=503
+            )), 503
+        
+        return jsonify(success_response(
+            message='Sẵn sàng',
+            data={
+                'status': 'ready',
+                'job_queue': 'running' if job_queue.app is not None else 'disabled',
+                'worker_mode': job_queue.worker_mode,
+                'ready_workers': job_queue.ready_worker_count,
+                'whisper': transcription_service.get_stats()
+            }
+        ))
+    
     # JWT error handlers
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -178,12 +215,19 @@ if __name__ == '__main__':
     # Lấy config name từ biến môi trường
     config_name = os.getenv('FLASK_ENV', 'development')
     
+    # Debug mode chạy werkzeug reloader: process cha chỉ theo dõi file và khởi động lại
+    # process con (WERKZEUG_RUN_MAIN=true) → chỉ process con chạy hàng đợi và load Whisper,
+    # tránh hai dispatcher claim job và hai bộ model trong RAM
+    debug = config[config_name].DEBUG
+    is_reloader_parent = debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    
     # Tạo app
-    app = create_app(config_name)
+    app = create_app(config_name, start_job_queue=not is_reloader_parent)
     
     # Chạy server
     app.run(
         host=app.config['HOST'],
         port=app.config['PORT'],
-        debug=app.config['DEBUG']
+        debug=debug,
+        use_reloader=debug
     )
\ No newline at end of file
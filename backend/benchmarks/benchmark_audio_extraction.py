@@ -0,0 +1,81 @@
+"""
+Benchmark trích xuất audio: moviepy vs ffmpeg (ghi WAV) vs ffmpeg pipe (không ghi file)
+Chạy: python benchmarks/benchmark_audio_extraction.py <video.mp4>
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.video_processor.audio_extractor import extract_audio_from_video, open_audio_pipe
+
+
+def peak_rss_mb():
+    """Peak RSS của process hiện tại và các process con (MB, Linux)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+def run_file(label, video_path, backend, output_dir):
+    output_path = os.path.join(output_dir, f"{backend}.wav")
+
+    start = time.perf_counter()
+    success, audio_path, message = extract_audio_from_video(video_path, output_path, backend=backend)
+    elapsed = time.perf_counter() - start
+
+    if not success:
+        print(f"❌ {label}: {message}")
+        return
+
+    size_mb = os.path.getsize(audio_path) / 1024 / 1024
+    own, children = peak_rss_mb()
+    print(f"✅ {label}: {elapsed:.2f}s, {size_mb:.1f} MB WAV, peak RSS python={own:.0f}MB ffmpeg={children:.0f}MB")
+
+
+def run_pipe(video_path):
+    start = time.perf_counter()
+    success, process, message = open_audio_pipe(video_path)
+
+    if not success:
+        print(f"❌ ffmpeg pipe: {message}")
+        return
+
+    total = 0
+    while True:
+        chunk = process.stdout.read(1 << 20)
+        if not chunk:
+            break
+        total += len(chunk)
+    process.wait()
+    elapsed = time.perf_counter() - start
+
+    if process.returncode != 0:
+        print(f"❌ ffmpeg pipe: {process.stderr.read().decode('utf-8', errors='ignore')}")
+        return
+
+    print(f"✅ ffmpeg pipe: {elapsed:.2f}s, {total / 1024 / 1024:.1f} MB PCM qua stdout")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark moviepy vs ffmpeg audio extraction')
+    parser.add_argument('video_path')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"Video: {args.video_path} ({os.path.getsize(args.video_path) / 1024 / 1024:.1f} MB)")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # ffmpeg trước để peak RSS của python chưa bị moviepy làm tăng
+        run_file('ffmpeg', args.video_path, 'ffmpeg', output_dir)
+        run_pipe(args.video_path)
+        run_file('moviepy', args.video_path, 'moviepy', output_dir)
+
+
+if __name__ == "__main__":
+    main()
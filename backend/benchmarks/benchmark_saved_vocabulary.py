@@ -0,0 +1,146 @@
+"""
+Benchmark GET /api/v1/vocabulary/saved với nhiều từ vựng đã lưu mỗi user
+Chạy: python benchmarks/benchmark_saved_vocabulary.py [--words 50000] [--users 2] [--max-ms 300]
+
+Dùng TestingConfig (SQLite in-memory). Đo latency (p50/p95) và số câu SQL mỗi request
+cho trang đầu, trang giữa, trang cuối (OFFSET và cursor) và lọc theo ngôn ngữ; exit 1 nếu vượt ngưỡng
+(phát hiện N+1 quay lại).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from app import create_app
+from database.db_config import db
+from database.models import User, Vocabulary, UserVocabulary
+
+LANGUAGES = ['en', 'ja', 'ko', 'fr']
+STATUSES = ['learning', 'learned', 'mastered']
+
+
+def seed(words, users):
+    """Tạo users, mỗi user `words` từ vựng đã lưu; trả về danh sách user_id"""
+    user_ids = []
+    now = datetime.utcnow()
+
+    for u in range(users):
+        user = User(username=f'bench{u}', email=f'bench{u}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.user_id)
+
+        first_vocab_id = (db.session.query(db.func.max(Vocabulary.vocab_id)).scalar() or 0) + 1
+        db.session.execute(insert(Vocabulary), [
+            {
+                'vocab_id': first_vocab_id + i,
+                'word': f'word{u}_{i}',
+                'translation': f'nghĩa {i}',
+                'language': LANGUAGES[i % len(LANGUAGES)]
+            }
+            for i in range(words)
+        ])
+        db.session.execute(insert(UserVocabulary), [
+            {
+                'user_id': user.user_id,
+                'vocab_id': first_vocab_id + i,
+                'learned_status': STATUSES[i % len(STATUSES)],
+                'saved_date': now - timedelta(seconds=i),
+                'review_count': 0
+            }
+            for i in range(words)
+        ])
+
+    db.session.commit()
+    return user_ids
+
+
+def measure(client, headers, query_string, repeat, counter):
+    """Gọi endpoint `repeat` lần; trả về (latencies ms, số câu SQL mỗi request, response cuối)"""
+    latencies = []
+    statements = 0
+
+    for _ in range(repeat):
+        counter[0] = 0
+        start = time.perf_counter()
+        response = client.get('/api/v1/vocabulary/saved', query_string=query_string, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statements = max(statements, counter[0])
+
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)}")
+
+    return latencies, statements, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark saved vocabulary listing')
+    parser.add_argument('--words', type=int, default=50000, help='Số từ đã lưu mỗi user')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-ms', type=float, default=300.0, help='Ngưỡng p95 (ms)')
+    parser.add_argument('--max-queries', type=int, default=3, help='Ngưỡng số câu SQL mỗi request')
+    args = parser.parse_args()
+
+    app = create_app('testing', start_job_queue=False)
+    counter = [0]
+
+    with app.app_context():
+        start = time.perf_counter()
+        user_ids = seed(args.words, args.users)
+        print(f"Seed {args.users} users x {args.words} từ: {time.perf_counter() - start:.1f}s")
+
+        event.listen(
+            db.engine, 'before_cursor_execute',
+            lambda *_: counter.__setitem__(0, counter[0] + 1)
+        )
+
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_ids[0]))}'}
+
+    last_page = (args.words + args.per_page - 1) // args.per_page
+    client = app.test_client()
+
+    # next_cursor của trang kế cuối → trang cuối qua keyset thay vì OFFSET
+    _, _, body = measure(client, headers, {'page': last_page - 1, 'per_page': args.per_page}, 1, counter)
+    deep_cursor = body['data']['pagination']['next_cursor']
+
+    cases = [
+        ('Trang đầu', {'page': 1}),
+        ('Trang giữa', {'page': last_page // 2}),
+        ('Trang cuối', {'page': last_page}),
+        ('Cursor trang cuối', {'cursor': deep_cursor}),
+        ('Lọc language=ja', {'page': 2, 'language': 'ja'}),
+        ('Lọc learned + ja', {'page': 1, 'language': 'ja', 'learned_status': 'learned'})
+    ]
+
+    print("=" * 80)
+    failed = False
+
+    for label, params in cases:
+        params = dict(params, per_page=args.per_page)
+        latencies, statements, body = measure(client, headers, params, args.repeat, counter)
+        p50 = statistics.median(latencies)
+        p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+        pagination = body['data']['pagination']
+
+        ok = p95 <= args.max_ms and statements <= args.max_queries
+        failed = failed or not ok
+
+        print(
+            f"{'✅' if ok else '❌'} {label:<18} p50 {p50:6.1f}ms  p95 {p95:6.1f}ms  "
+            f"{statements} SQL  {len(body['data']['items'])} items / total {pagination['total_items'] or '-'}"
+        )
+
+    print("=" * 80)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark Whisper: transcribe một lần (single-call) vs chia chunk song song
+Chạy: python benchmarks/benchmark_transcription.py <audio.wav> [--language en]
+
+Audio phải là WAV PCM 16kHz mono (file trong storage/processed_audio).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from modules.speech_to_text.whisper_handler import transcribe_audio_whisper
+from modules.speech_to_text.chunked_transcriber import get_wav_duration, transcribe_audio_chunked
+from modules.speech_to_text.transcription_service import transcription_service
+
+
+def run(label, func):
+    start = time.perf_counter()
+    success, result, message = func()
+    elapsed = time.perf_counter() - start
+
+    if not success:
+        print(f"❌ {label}: {message}")
+        return None
+
+    print(f"✅ {label}: {elapsed:.1f}s, {len(result['segments'])} segments, language={result['language']}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single-call vs chunked Whisper')
+    parser.add_argument('audio_path')
+    parser.add_argument('--language', default=None)
+    args = parser.parse_args()
+
+    duration = get_wav_duration(args.audio_path)
+    if not duration:
+        print("Audio phải là WAV PCM 16kHz mono")
+        sys.exit(1)
+
+    print("=" * 80)
+    print(f"Audio: {args.audio_path} ({duration:.0f}s)")
+    print(f"Model: {Config.WHISPER_MODEL} ({Config.WHISPER_DEVICE}, {Config.WHISPER_COMPUTE_TYPE})")
+    print("=" * 80)
+
+    # Load model trước để không tính thời gian warm-up vào lần chạy đầu
+    transcription_service.warm_up(wait=True)
+    print(f"Chunk: {Config.WHISPER_CHUNK_SECONDS}s x {transcription_service.replica_count} replicas")
+
+    single = run('Single-call', lambda: transcribe_audio_whisper(
+        args.audio_path, language=args.language, chunked=False
+    ))
+
+    chunked = run('Chunked', lambda: transcribe_audio_chunked(
+        args.audio_path, language=args.language
+    ))
+
+    if single and chunked:
+        print("=" * 80)
+        print(f"Speedup: {single / chunked:.2f}x (real-time factor chunked: {chunked / duration:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Kiểm tra query plan của các API chính trên SQLite
+Chạy: python benchmarks/check_query_plans.py [--verbose]
+
+Dùng TestingConfig (SQLite in-memory): gọi lần lượt các endpoint qua test client, ghi lại
+mọi câu SQL, chạy EXPLAIN QUERY PLAN với đúng tham số và exit 1 nếu có câu nào quét toàn
+bảng (SCAN <bảng> không dùng index) → phát hiện index bị thiếu hoặc query đổi dạng.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app
+from database.db_config import db
+from database.models import (
+    User, Video, Subtitle, Vocabulary, UserVocabulary, Quiz, UserQuizResult, LearningProgress
+)
+from utils.pagination import encode_cursor
+
+# "SCAN videos" / "SCAN TABLE videos AS v" (không có USING INDEX) = quét toàn bảng
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# Subquery (vd. SELECT count(*) FROM (...) AS anon_1) → quét kết quả trung gian, không phải bảng
+SUBQUERY_PATTERN = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (?:SUBQUERY \d+ )?(\w+)')
+
+
+def seed():
+    """Tạo dữ liệu tối thiểu để mọi endpoint đi hết nhánh truy vấn; trả về các id cần dùng"""
+    user = User(username='plan', email='plan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+
+    video = Video(
+        user_id=user.user_id, title='Plan', original_filename='plan.mp4',
+        file_path='plan.mp4', status='completed', language_detected='en'
+    )
+    db.session.add(video)
+    db.session.flush()
+
+    vocab = Vocabulary(video_id=video.video_id, word='plan', translation='kế hoạch', language='en')
+    unsaved_vocab = Vocabulary(video_id=video.video_id, word='check', translation='kiểm tra', language='en')
+    quiz = Quiz(
+        video_id=video.video_id, question='?', correct_answer='a',
+        wrong_answer_1='b', wrong_answer_2='c', wrong_answer_3='d'
+    )
+    db.session.add_all([
+        vocab, unsaved_vocab, quiz,
+        Subtitle(video_id=video.video_id, language='en', content='1\n00:00:00,000 --> 00:00:01,000\nplan\n'),
+        LearningProgress(user_id=user.user_id, video_id=video.video_id)
+    ])
+    db.session.flush()
+
+    user_vocab = UserVocabulary(user_id=user.user_id, vocab_id=vocab.vocab_id, video_id=video.video_id)
+    db.session.add_all([
+        user_vocab,
+        UserQuizResult(user_id=user.user_id, quiz_id=quiz.quiz_id, selected_answer='a', is_correct=True)
+    ])
+    db.session.commit()
+
+    return {
+        'user_id': user.user_id,
+        'video_id': video.video_id,
+        'vocab_id': vocab.vocab_id,
+        'unsaved_vocab_id': unsaved_vocab.vocab_id,
+        'quiz_id': quiz.quiz_id,
+        'user_vocab_id': user_vocab.id
+    }
+
+
+def api_calls(ids):
+    """Danh sách (method, url, kwargs) cho test client"""
+    video_id = ids['video_id']
+    date_cursor = encode_cursor(datetime.utcnow(), 1 << 30)
+
+    return [
+        ('GET', '/api/v1/auth/me', {}),
+        ('GET', '/api/v1/users/profile', {}),
+        ('GET', '/api/v1/users/progress', {}),
+        ('GET', '/api/v1/users/progress', {'query_string': {'video_id': video_id}}),
+        ('POST', '/api/v1/users/progress', {'json': {'video_id': video_id, 'watch_duration': 10}}),
+        ('GET', '/api/v1/videos/', {}),
+        ('GET', '/api/v1/videos/', {'query_string': {'status': 'completed'}}),
+        ('GET', '/api/v1/videos/', {'query_string': {'cursor': date_cursor}}),
+        ('GET', f'/api/v1/videos/{video_id}', {}),
+        ('GET', f'/api/v1/videos/{video_id}/status', {}),
+        ('GET', f'/api/v1/process/status/{video_id}', {}),
+        ('GET', f'/api/v1/subtitles/{video_id}', {}),
+        ('GET', f'/api/v1/subtitles/{video_id}', {'query_string': {'language': 'en'}}),
+        ('GET', f'/api/v1/quiz/{video_id}', {}),
+        ('POST', '/api/v1/quiz/submit', {'json': {'quiz_id': ids['quiz_id'], 'selected_answer': 'a'}}),
+        ('GET', f"/api/v1/quiz/results/{ids['user_id']}", {}),
+        ('GET', f"/api/v1/quiz/results/{ids['user_id']}", {'query_string': {'video_id': video_id}}),
+        ('GET', f'/api/v1/vocabulary/{video_id}', {}),
+        ('GET', '/api/v1/vocabulary/all', {}),
+        ('GET', '/api/v1/vocabulary/all', {'query_string': {'video_id': video_id, 'language': 'en'}}),
+        ('GET', '/api/v1/vocabulary/all', {'query_string': {'cursor': encode_cursor(1 << 30)}}),
+        ('POST', '/api/v1/vocabulary/save', {'json': {'vocab_id': ids['unsaved_vocab_id'], 'video_id': video_id}}),
+        ('GET', '/api/v1/vocabulary/saved', {}),
+        ('GET', '/api/v1/vocabulary/saved', {'query_string': {'learned_status': 'learning', 'language': 'en'}}),
+        ('GET', '/api/v1/vocabulary/saved', {'query_string': {'video_id': video_id}}),
+        ('GET', '/api/v1/vocabulary/saved', {'query_string': {'cursor': date_cursor, 'include_total': 'true'}}),
+        ('PUT', f"/api/v1/vocabulary/{ids['user_vocab_id']}/status", {'json': {'learned_status': 'learned'}}),
+        ('GET', '/api/v1/vocabulary/stats', {}),
+        ('GET', f"/api/v1/vocabulary/detail/{ids['vocab_id']}", {}),
+        ('DELETE', f"/api/v1/vocabulary/{ids['user_vocab_id']}", {}),
+    ]
+
+
+def full_scans(connection, statement, parameters):
+    """Chạy EXPLAIN QUERY PLAN; trả về (danh sách bảng bị quét toàn bộ, các dòng plan)"""
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    details = [row[-1] for row in rows]
+    subqueries = {match.group(1) for match in map(SUBQUERY_PATTERN.match, details) if match}
+    tables = [
+        match.group(1) for match in map(FULL_SCAN_PATTERN.match, details)
+        if match and match.group(1) not in subqueries
+    ]
+
+    return tables, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check SQLite query plans of API queries')
+    parser.add_argument('--verbose', action='store_true', help='In plan của mọi câu SQL')
+    args = parser.parse_args()
+
+    app = create_app('testing', start_job_queue=False)
+    captured = []
+
+    with app.app_context():
+        ids = seed()
+        headers = {'Authorization': f"Bearer {create_access_token(identity=str(ids['user_id']))}"}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and not statement.startswith('EXPLAIN'):
+                captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+
+    client = app.test_client()
+    failed = False
+    seen = set()
+
+    print("=" * 80)
+
+    for method, url, kwargs in api_calls(ids):
+        captured.clear()
+        response = client.open(url, method=method, headers=headers, **kwargs)
+
+        if response.status_code >= 400:
+            print(f"❌ {method} {url} → HTTP {response.status_code}: {response.get_json()}")
+            failed = True
+            continue
+
+        with app.app_context():
+            connection = db.session.connection()
+
+            for statement, parameters in captured:
+                if statement in seen or statement.lstrip().upper().startswith('INSERT'):
+                    continue
+                seen.add(statement)
+
+                tables, details = full_scans(connection, statement, parameters)
+
+                if tables:
+                    failed = True
+                    print(f"❌ {method} {url}: quét toàn bảng {', '.join(tables)}")
+                elif args.verbose:
+                    print(f"✅ {method} {url}")
+                else:
+                    continue
+
+                print(f"   {' '.join(statement.split())}")
+                for detail in details:
+                    print(f"     {detail}")
+
+    print("=" * 80)
+    print(f"{len(seen)} câu SQL đã kiểm tra: {'có quét toàn bảng' if failed else 'không quét toàn bảng'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Stub OpenAI server - giả lập /v1/chat/completions để test dịch song song, rate limit và retry
+Chạy: python benchmarks/stub_openai_server.py --port 8089 --latency 0.5 --error-rate 0.2
+
+Sau đó đặt OPENAI_BASE_URL=http://127.0.0.1:8089/v1 (OPENAI_API_KEY bất kỳ).
+Mỗi dòng "N. text" trong prompt được trả lại thành "N. [vi] text"; với
+response_format json_object, object JSON {id: text} trong prompt được trả lại thành
+{"translations": {id: "[vi] text"}} (--misalign-rate bỏ ngẫu nhiên một số id).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+stats = {'requests': 0, 'errors_429': 0, 'errors_500': 0, 'in_flight': 0, 'max_in_flight': 0}
+stats_lock = threading.Lock()
+
+
+def build_reply(prompt):
+    lines = re.findall(r'^(\d+)\.\s*(.*)$', prompt, flags=re.MULTILINE)
+    return "\n".join(f"{num}. [vi] {text}" for num, text in lines)
+
+
+def build_json_reply(prompt, misalign_rate=0.0):
+    source = {}
+    for line in prompt.splitlines():
+        if line.startswith('{"'):
+            try:
+                source = json.loads(line)
+                break
+            except ValueError:
+                continue
+
+    translations = {
+        key: f"[vi] {text}"
+        for key, text in source.items()
+        if random.random() >= misalign_rate
+    }
+    return json.dumps({'translations': translations}, ensure_ascii=False)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    misalign_rate = 0.0
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        with stats_lock:
+            self._send(200, dict(stats))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        with stats_lock:
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+
+        try:
+            time.sleep(self.latency)
+
+            roll = random.random()
+            if roll < self.error_rate / 2:
+                with stats_lock:
+                    stats['errors_429'] += 1
+                return self._send(429, {'error': {'message': 'Rate limit (stub)'}}, {'Retry-After': '1'})
+            if roll < self.error_rate:
+                with stats_lock:
+                    stats['errors_500'] += 1
+                return self._send(500, {'error': {'message': 'Server error (stub)'}})
+
+            prompt = body['messages'][-1]['content']
+            if (body.get('response_format') or {}).get('type') == 'json_object':
+                content = build_json_reply(prompt, self.misalign_rate)
+            else:
+                content = build_reply(prompt)
+
+            self._send(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {
+                    'prompt_tokens': len(prompt) // 4,
+                    'completion_tokens': len(content) // 4,
+                    'total_tokens': (len(prompt) + len(content)) // 4
+                }
+            })
+        finally:
+            with stats_lock:
+                stats['in_flight'] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub OpenAI chat completions server')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='Độ trễ mỗi request (giây)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Tỉ lệ lỗi 429/500')
+    parser.add_argument('--misalign-rate', type=float, default=0.0, help='Tỉ lệ id bị bỏ trong JSON trả về')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.error_rate = args.error_rate
+    StubHandler.misalign_rate = args.misalign_rate
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"Stub OpenAI server: http://127.0.0.1:{args.port}/v1 (GET / để xem thống kê)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
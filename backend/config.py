@@ -44,14 +44,72 @@ class Config:
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     
+    # Cache user hiện tại giữa các request (trong process); 0 = chỉ cache trong request
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # giây
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+    
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o')
     
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # None = api.openai.com (đặt URL stub server khi test)
+    
+    # Translation Configuration
+    # Streaming: dịch từng batch ngay khi Whisper tạo đủ segments (chồng lấp với transcribe)
+    TRANSLATION_STREAMING = os.getenv('TRANSLATION_STREAMING', 'False').lower() == 'true'
+    TRANSLATION_MAX_CONCURRENCY = int(os.getenv('TRANSLATION_MAX_CONCURRENCY', 4))  # request đồng thời
+    TRANSLATION_TOKENS_PER_MINUTE = int(os.getenv('TRANSLATION_TOKENS_PER_MINUTE', 30000))  # 0 = không giới hạn
+    TRANSLATION_MAX_RETRIES = int(os.getenv('TRANSLATION_MAX_RETRIES', 5))
+    TRANSLATION_BACKOFF_BASE = float(os.getenv('TRANSLATION_BACKOFF_BASE', 1.0))  # giây
+    TRANSLATION_BACKOFF_MAX = float(os.getenv('TRANSLATION_BACKOFF_MAX', 60.0))  # giây
+    # Ngân sách token mỗi batch dịch (ước lượng); max_tokens của request = output budget + 25%
+    TRANSLATION_BATCH_INPUT_TOKENS = int(os.getenv('TRANSLATION_BATCH_INPUT_TOKENS', 1200))
+    TRANSLATION_BATCH_OUTPUT_TOKENS = int(os.getenv('TRANSLATION_BATCH_OUTPUT_TOKENS', 2400))
+    TRANSLATION_BATCH_MAX_SEGMENTS = int(os.getenv('TRANSLATION_BATCH_MAX_SEGMENTS', 40))
+
+    # Translation memory (cache bản dịch theo text/ngôn ngữ/model, SQLite + LRU)
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'True').lower() == 'true'
+    TRANSLATION_MEMORY_PATH = os.getenv('TRANSLATION_MEMORY_PATH', 'storage/translation_memory.db')
+    TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv('TRANSLATION_MEMORY_MAX_ENTRIES', 200000))
+    
+    # Audio Extraction
+    AUDIO_EXTRACT_BACKEND = os.getenv('AUDIO_EXTRACT_BACKEND', 'ffmpeg')  # ffmpeg | moviepy
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+    # file: ghi WAV rồi Whisper đọc lại | memory: decode qua pipe thành mảng float32 đưa thẳng vào Whisper
+    AUDIO_HANDOFF = os.getenv('AUDIO_HANDOFF', 'file')
+    AUDIO_MEMMAP_MIN_SECONDS = int(os.getenv('AUDIO_MEMMAP_MIN_SECONDS', 3600))  # dài hơn → memmap file tạm
+    
     # Whisper Configuration
     WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'medium')
     WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')
     WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'int8')
+    # Số model replica của transcription service (0 = tự tính theo core/RAM) và thread mỗi replica
+    WHISPER_REPLICAS = int(os.getenv('WHISPER_REPLICAS', 0))
+    WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', 4))
+    WHISPER_PRELOAD = os.getenv('WHISPER_PRELOAD', 'True').lower() == 'true'  # warm-up khi khởi động worker
+    
+    # Phát hiện ngôn ngữ trước khi transcribe (Whisper language ID trên các đoạn ngắn)
+    LANGUAGE_DETECT_ENABLED = os.getenv('LANGUAGE_DETECT_ENABLED', 'True').lower() == 'true'
+    LANGUAGE_DETECT_WINDOWS = int(os.getenv('LANGUAGE_DETECT_WINDOWS', 1))
+    LANGUAGE_DETECT_WINDOW_SECONDS = int(os.getenv('LANGUAGE_DETECT_WINDOW_SECONDS', 30))
+    LANGUAGE_DETECT_MIN_PROBABILITY = float(os.getenv('LANGUAGE_DETECT_MIN_PROBABILITY', 0.5))
+    
+    # Chunked Whisper (audio dài chia theo khoảng lặng, transcribe song song trên các replica)
+    WHISPER_CHUNKED = os.getenv('WHISPER_CHUNKED', 'False').lower() == 'true'
+    WHISPER_CHUNK_SECONDS = int(os.getenv('WHISPER_CHUNK_SECONDS', 300))  # ~5 phút
+    WHISPER_CHUNK_MIN_DURATION = int(os.getenv('WHISPER_CHUNK_MIN_DURATION', 900))  # giây
+    
+    # Processing Queue Configuration
+    JOB_QUEUE_ENABLED = os.getenv('JOB_QUEUE_ENABLED', 'True').lower() == 'true'
+    JOB_WORKER_MODE = os.getenv('JOB_WORKER_MODE', 'thread')  # thread | process
+    JOB_WORKER_COUNT = int(os.getenv('JOB_WORKER_COUNT', 2))
+    JOB_QUEUE_MAX_DEPTH = int(os.getenv('JOB_QUEUE_MAX_DEPTH', 100))
+    JOB_QUEUE_MAX_PER_USER = int(os.getenv('JOB_QUEUE_MAX_PER_USER', 10))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+    JOB_STALE_TIMEOUT = int(os.getenv('JOB_STALE_TIMEOUT', 300))  # giây
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    PIPELINE_MAX_PARALLEL_STAGES = int(os.getenv('PIPELINE_MAX_PARALLEL_STAGES', 3))
     
     # File Upload Configuration
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 524288000))  # 500MB
@@ -61,12 +119,26 @@ class Config:
     )
     MAX_VIDEO_DURATION = int(os.getenv('MAX_VIDEO_DURATION', 7200))  # 2 giờ
     
+    # Chunked (resumable) upload: MAX_CONTENT_LENGTH giới hạn mỗi chunk, MAX_UPLOAD_SIZE giới hạn cả file
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 2147483648))  # 2GB
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8388608))  # 8MB (gợi ý cho client)
+    UPLOAD_SESSION_EXPIRE_HOURS = int(os.getenv('UPLOAD_SESSION_EXPIRE_HOURS', 24))
+    UPLOAD_WRITE_LEASE_SECONDS = int(os.getenv('UPLOAD_WRITE_LEASE_SECONDS', 300))  # lease ghi chunk bị bỏ dở (worker chết)
+    UPLOAD_WRITE_LEASE_RENEW_BYTES = int(os.getenv('UPLOAD_WRITE_LEASE_RENEW_BYTES', 8388608))  # gia hạn lease mỗi 8MB đã ghi
+    
     # Storage Paths
     STORAGE_FOLDER = os.getenv('STORAGE_FOLDER', 'storage')
     SUBTITLES_FOLDER = os.getenv('SUBTITLES_FOLDER', 'storage/subtitles')
     AUDIO_FOLDER = os.getenv('AUDIO_FOLDER', 'storage/processed_audio')
     DOWNLOADS_FOLDER = os.getenv('DOWNLOADS_FOLDER', 'storage/downloads')
     
+    # HLS (đóng gói sau xử lý, phục vụ playlist/segment thay cho file gốc)
+    HLS_ENABLED = os.getenv('HLS_ENABLED', 'True').lower() == 'true'
+    HLS_FOLDER = os.getenv('HLS_FOLDER', 'storage/hls')
+    HLS_SEGMENT_SECONDS = int(os.getenv('HLS_SEGMENT_SECONDS', 6))
+    HLS_CACHE_MAX_AGE = int(os.getenv('HLS_CACHE_MAX_AGE', 31536000))  # segment không đổi → cache 1 năm
+    HLS_TOKEN_EXPIRES = int(os.getenv('HLS_TOKEN_EXPIRES', 7200))  # giây, hạn của URL HLS đã ký
+    
     # Tạo các thư mục nếu chưa tồn tại
     @staticmethod
     def init_folders():
@@ -79,6 +151,7 @@ class Config:
             Config.SUBTITLES_FOLDER,
             Config.AUDIO_FOLDER,
             Config.DOWNLOADS_FOLDER,
+            Config.HLS_FOLDER,
             'logs'
         ]
         for folder in folders:
@@ -107,6 +180,8 @@ class Config:
     MIN_WORD_LENGTH = 3
     MAX_VOCABULARY_PER_VIDEO = 20
     
+    VOCABULARY_STATS_CACHE_TTL = int(os.getenv('VOCABULARY_STATS_CACHE_TTL', 60))  # giây, 0 = không cache
+    
     # Quiz Settings
     QUIZ_QUESTIONS_PER_VIDEO = 10
     QUIZ_OPTIONS_COUNT = 4
@@ -132,6 +207,7 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    JOB_QUEUE_ENABLED = False
 
 
 # Dictionary để chọn config
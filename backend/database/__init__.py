@@ -1,12 +1,14 @@
 """
 Database package initialization
 """
-from .db_config import db, init_db
-from .models import User, Video, Subtitle, Vocabulary, UserVocabulary, Quiz, UserQuizResult, LearningProgress
+from .db_config import db, init_db, ensure_columns, ensure_indexes
+from .models import User, Video, Subtitle, Vocabulary, UserVocabulary, Quiz, UserQuizResult, LearningProgress, ProcessingJob, ProcessingCheckpoint, UploadSession
 
 __all__ = [
     'db',
     'init_db',
+    'ensure_columns',
+    'ensure_indexes',
     'User',
     'Video',
     'Subtitle',
@@ -14,5 +16,8 @@ __all__ = [
     'UserVocabulary',
     'Quiz',
     'UserQuizResult',
-    'LearningProgress'
+    'LearningProgress',
+    'ProcessingJob',
+    'ProcessingCheckpoint',
+    'UploadSession'
 ]
\ No newline at end of file
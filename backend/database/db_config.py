@@ -3,6 +3,7 @@ Database configuration và connection setup
 """
 import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 # Khởi tạo SQLAlchemy instance
 db = SQLAlchemy()
@@ -18,12 +19,17 @@ def init_db():
         # Import models để SQLAlchemy nhận biết
         from .models import (
             User, Video, Subtitle, Vocabulary, 
-            UserVocabulary, Quiz, UserQuizResult, LearningProgress
+            UserVocabulary, Quiz, UserQuizResult, LearningProgress,
+            ProcessingJob, ProcessingCheckpoint, UploadSession
         )
         
         # Tạo tất cả các bảng
         db.create_all()
         
+        # create_all không thêm cột/index vào bảng đã tồn tại
+        ensure_columns()
+        ensure_indexes()
+        
         logger.info("Database đã được khởi tạo thành công")
         
     except Exception as e:
@@ -31,6 +37,85 @@ def init_db():
         raise
 
 
+def ensure_columns():
+    """
+    Migration cột: thêm các cột khai báo trong models còn thiếu trên bảng đã tồn tại
+    (vd. videos.content_hash, videos.pipeline_version). Chỉ thêm cột cho phép NULL;
+    cột NOT NULL cần migration thủ công. Idempotent, chạy mỗi lần khởi tạo database.
+    
+    Returns:
+        list: Các cột vừa được thêm ("bảng.cột")
+    """
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            
+            if not column.nullable:
+                logger.warning(f"Thiếu cột NOT NULL {table.name}.{column.name}: cần migration thủ công")
+                continue
+            
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            
+            # "ADD <cột>" (không có COLUMN) hợp lệ với cả SQL Server và SQLite
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD {preparer.format_column(column)} {column_type}"
+                ))
+            added.append(f"{table.name}.{column.name}")
+    
+    if added:
+        logger.info(f"Đã thêm cột: {', '.join(added)}")
+    
+    return added
+
+
+def ensure_indexes():
+    """
+    Migration index: tạo các index khai báo trong models (tên idx_*) còn thiếu trên
+    database đã tồn tại. Bỏ qua nếu đã có index khác tên trên đúng các cột đó (vd.
+    ix_* do phiên bản cũ của models tạo). Idempotent, chạy mỗi lần khởi tạo database.
+    
+    Returns:
+        list: Tên các index vừa được tạo
+    """
+    inspector = inspect(db.engine)
+    created = []
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = inspector.get_indexes(table.name)
+        existing_names = {index['name'] for index in existing}
+        existing_columns = {tuple(index['column_names']) for index in existing}
+        
+        for index in table.indexes:
+            if not index.name.startswith('idx_') or index.name in existing_names:
+                continue
+            
+            if tuple(column.name for column in index.columns) in existing_columns:
+                continue
+            
+            index.create(db.engine)
+            created.append(index.name)
+    
+    if created:
+        logger.info(f"Đã tạo index: {', '.join(created)}")
+    
+    return created
+
+
 def get_db_session():
     """
     Lấy database session
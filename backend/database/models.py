@@ -24,6 +24,7 @@ class User(db.Model):
     vocabularies = db.relationship('UserVocabulary', backref='user', lazy=True, cascade='all, delete-orphan')
     quiz_results = db.relationship('UserQuizResult', backref='user', lazy=True, cascade='all, delete-orphan')
     learning_progress = db.relationship('LearningProgress', backref='user', lazy=True, cascade='all, delete-orphan')
+    upload_sessions = db.relationship('UploadSession', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         """Chuyển đổi object thành dictionary"""
@@ -41,6 +42,10 @@ class User(db.Model):
 class Video(db.Model):
     """Bảng video"""
     __tablename__ = 'videos'
+    __table_args__ = (
+        db.Index('idx_videos_content_hash', 'content_hash'),
+        db.Index('idx_videos_user_status_date', 'user_id', 'status', 'upload_date'),
+    )
     
     video_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -52,12 +57,16 @@ class Video(db.Model):
     status = db.Column(db.String(20), default='pending')
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     processed_date = db.Column(db.DateTime)
+    content_hash = db.Column(db.String(64))  # SHA-256 của file video
+    pipeline_version = db.Column(db.String(20))  # Phiên bản pipeline đã tạo kết quả
     
     # Relationships
     subtitles = db.relationship('Subtitle', backref='video', lazy=True, cascade='all, delete-orphan')
     vocabularies = db.relationship('Vocabulary', backref='video', lazy=True, cascade='all, delete-orphan')  # ✅ NEW
     quizzes = db.relationship('Quiz', backref='video', lazy=True, cascade='all, delete-orphan')
     learning_progress = db.relationship('LearningProgress', backref='video', lazy=True, cascade='all, delete-orphan')
+    processing_jobs = db.relationship('ProcessingJob', backref='video', lazy=True, cascade='all, delete-orphan')
+    checkpoints = db.relationship('ProcessingCheckpoint', backref='video', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         """Chuyển đổi object thành dictionary"""
@@ -71,13 +80,17 @@ class Video(db.Model):
             'language_detected': self.language_detected,
             'status': self.status,
             'upload_date': self.upload_date.isoformat() if self.upload_date else None,
-            'processed_date': self.processed_date.isoformat() if self.processed_date else None
+            'processed_date': self.processed_date.isoformat() if self.processed_date else None,
+            'content_hash': self.content_hash
         }
 
 
 class Subtitle(db.Model):
     """Bảng phụ đề"""
     __tablename__ = 'subtitles'
+    __table_args__ = (
+        db.Index('idx_subtitles_video_id', 'video_id'),
+    )
     
     subtitle_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'), nullable=False)
@@ -103,6 +116,9 @@ class Subtitle(db.Model):
 class Vocabulary(db.Model):
     """Bảng từ vựng - ✅ UPDATED WITH VIDEO_ID"""
     __tablename__ = 'vocabulary'
+    __table_args__ = (
+        db.Index('idx_vocabulary_video_id', 'video_id'),
+    )
     
     vocab_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'))  # ✅ NEW: Link to video
@@ -137,6 +153,9 @@ class Vocabulary(db.Model):
 class UserVocabulary(db.Model):
     """Bảng từ vựng cá nhân của user"""
     __tablename__ = 'user_vocabulary'
+    __table_args__ = (
+        db.Index('idx_user_vocabulary_user_status_date', 'user_id', 'learned_status', 'saved_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -164,6 +183,9 @@ class UserVocabulary(db.Model):
 class Quiz(db.Model):
     """Bảng quiz"""
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        db.Index('idx_quizzes_video_id', 'video_id'),
+    )
     
     quiz_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'), nullable=False)
@@ -198,6 +220,9 @@ class Quiz(db.Model):
 class UserQuizResult(db.Model):
     """Bảng kết quả quiz của user"""
     __tablename__ = 'user_quiz_results'
+    __table_args__ = (
+        db.Index('idx_user_quiz_results_user_quiz', 'user_id', 'quiz_id'),
+    )
     
     result_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -223,6 +248,9 @@ class UserQuizResult(db.Model):
 class LearningProgress(db.Model):
     """Bảng tiến trình học tập"""
     __tablename__ = 'learning_progress'
+    __table_args__ = (
+        db.Index('idx_learning_progress_user_video', 'user_id', 'video_id'),
+    )
     
     progress_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -242,4 +270,95 @@ class LearningProgress(db.Model):
             'completion_percentage': self.completion_percentage,
             'last_watched': self.last_watched.isoformat() if self.last_watched else None,
             'watch_count': self.watch_count
-        }
\ No newline at end of file
+        }
+
+class ProcessingJob(db.Model):
+    """Bảng hàng đợi xử lý video (durable job queue)"""
+    __tablename__ = 'processing_jobs'
+    __table_args__ = (
+        db.Index('idx_processing_jobs_status', 'status', 'created_at'),
+        db.Index('idx_processing_jobs_video_id', 'video_id'),
+    )
+    
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    worker_id = db.Column(db.String(100))
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Chuyển đổi object thành dictionary"""
+        return {
+            'job_id': self.job_id,
+            'video_id': self.video_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ProcessingCheckpoint(db.Model):
+    """Bảng checkpoint theo từng stage của pipeline xử lý video"""
+    __tablename__ = 'processing_checkpoints'
+    __table_args__ = (
+        db.UniqueConstraint('video_id', 'stage', name='uq_processing_checkpoints_video_stage'),
+    )
+    
+    checkpoint_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'), nullable=False)
+    stage = db.Column(db.String(30), nullable=False)
+    data = db.Column(db.Text)  # JSON string
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Chuyển đổi object thành dictionary"""
+        return {
+            'checkpoint_id': self.checkpoint_id,
+            'video_id': self.video_id,
+            'stage': self.stage,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UploadSession(db.Model):
+    """Bảng phiên upload theo chunk (resumable upload)"""
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (
+        db.Index('idx_upload_sessions_user_id', 'user_id'),
+    )
+    
+    upload_id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    title = db.Column(db.String(255))
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+    status = db.Column(db.String(20), default='uploading', nullable=False)
+    video_id = db.Column(db.Integer)  # video được tạo khi hoàn tất upload
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Chuyển đổi object thành dictionary"""
+        return {
+            'upload_id': self.upload_id,
+            'title': self.title,
+            'original_filename': self.original_filename,
+            'total_size': self.total_size,
+            'received_bytes': self.received_bytes,
+            'status': self.status,
+            'video_id': self.video_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -36,12 +36,16 @@ CREATE TABLE videos (
     status NVARCHAR(20) DEFAULT 'pending',
     upload_date DATETIME DEFAULT GETDATE(),
     processed_date DATETIME,
+    content_hash NVARCHAR(64),
+    pipeline_version NVARCHAR(20),
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
 -- Index cho videos
 CREATE INDEX idx_videos_user_id ON videos(user_id);
 CREATE INDEX idx_videos_status ON videos(status);
+CREATE INDEX idx_videos_content_hash ON videos(content_hash);
+CREATE INDEX idx_videos_user_status_date ON videos(user_id, status, upload_date);
 
 -- Bảng Subtitles (Phụ đề)
 CREATE TABLE subtitles (
@@ -69,12 +73,14 @@ CREATE TABLE vocabulary (
     example_translation NVARCHAR(MAX),
     language NVARCHAR(10) NOT NULL,
     part_of_speech NVARCHAR(20),
-    difficulty_level NVARCHAR(20)
+    difficulty_level NVARCHAR(20),
+    video_id INT  -- video tạo ra từ này (không FK: tránh nhiều cascade path tới user_vocabulary)
 );
 
 -- Index cho vocabulary
 CREATE INDEX idx_vocabulary_word ON vocabulary(word);
 CREATE INDEX idx_vocabulary_language ON vocabulary(language);
+CREATE INDEX idx_vocabulary_video_id ON vocabulary(video_id);
 
 -- Bảng UserVocabulary (Từ vựng cá nhân)
 CREATE TABLE user_vocabulary (
@@ -94,6 +100,7 @@ CREATE TABLE user_vocabulary (
 -- Index cho user_vocabulary
 CREATE INDEX idx_user_vocabulary_user_id ON user_vocabulary(user_id);
 CREATE INDEX idx_user_vocabulary_vocab_id ON user_vocabulary(vocab_id);
+CREATE INDEX idx_user_vocabulary_user_status_date ON user_vocabulary(user_id, learned_status, saved_date);
 
 -- Bảng Quizzes (Quiz)
 CREATE TABLE quizzes (
@@ -129,6 +136,7 @@ CREATE TABLE user_quiz_results (
 -- Index cho user_quiz_results
 CREATE INDEX idx_user_quiz_results_user_id ON user_quiz_results(user_id);
 CREATE INDEX idx_user_quiz_results_quiz_id ON user_quiz_results(quiz_id);
+CREATE INDEX idx_user_quiz_results_user_quiz ON user_quiz_results(user_id, quiz_id);
 
 -- Bảng LearningProgress (Tiến trình học)
 CREATE TABLE learning_progress (
@@ -146,5 +154,82 @@ CREATE TABLE learning_progress (
 -- Index cho learning_progress
 CREATE INDEX idx_learning_progress_user_id ON learning_progress(user_id);
 CREATE INDEX idx_learning_progress_video_id ON learning_progress(video_id);
+CREATE INDEX idx_learning_progress_user_video ON learning_progress(user_id, video_id);
 
-GO
\ No newline at end of file
+-- Bảng ProcessingJobs (Hàng đợi xử lý video)
+CREATE TABLE processing_jobs (
+    job_id INT PRIMARY KEY IDENTITY(1,1),
+    video_id INT NOT NULL,
+    user_id INT NOT NULL,
+    status NVARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INT DEFAULT 0,
+    worker_id NVARCHAR(100),
+    error_message NVARCHAR(MAX),
+    created_at DATETIME DEFAULT GETDATE(),
+    started_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME,
+    FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- Index cho processing_jobs
+CREATE INDEX idx_processing_jobs_status ON processing_jobs(status, created_at);
+CREATE INDEX idx_processing_jobs_video_id ON processing_jobs(video_id);
+
+-- Bảng ProcessingCheckpoints (Checkpoint theo stage của pipeline)
+CREATE TABLE processing_checkpoints (
+    checkpoint_id INT PRIMARY KEY IDENTITY(1,1),
+    video_id INT NOT NULL,
+    stage NVARCHAR(30) NOT NULL,
+    data NVARCHAR(MAX),
+    created_at DATETIME DEFAULT GETDATE(),
+    CONSTRAINT uq_processing_checkpoints_video_stage UNIQUE (video_id, stage),
+    FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+);
+
+-- Bảng UploadSessions (Upload theo chunk, có thể tiếp tục)
+CREATE TABLE upload_sessions (
+    upload_id NVARCHAR(36) PRIMARY KEY,
+    user_id INT NOT NULL,
+    title NVARCHAR(255),
+    original_filename NVARCHAR(255) NOT NULL,
+    file_path NVARCHAR(500) NOT NULL,
+    total_size BIGINT NOT NULL,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    status NVARCHAR(20) NOT NULL DEFAULT 'uploading',
+    video_id INT,  -- video được tạo khi hoàn tất (không FK: tránh nhiều cascade path từ users)
+    created_at DATETIME DEFAULT GETDATE(),
+    updated_at DATETIME DEFAULT GETDATE(),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_upload_sessions_user_id ON upload_sessions(user_id);
+
+GO
+
+-- Nâng cấp database đã tạo trước khi có các cột mới
+IF COL_LENGTH('videos', 'content_hash') IS NULL
+    ALTER TABLE videos ADD content_hash NVARCHAR(64);
+IF COL_LENGTH('videos', 'pipeline_version') IS NULL
+    ALTER TABLE videos ADD pipeline_version NVARCHAR(20);
+IF COL_LENGTH('vocabulary', 'video_id') IS NULL
+    ALTER TABLE vocabulary ADD video_id INT;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_videos_content_hash')
+    CREATE INDEX idx_videos_content_hash ON videos(content_hash);
+GO
+
+-- Index composite cho các truy vấn chính (tương ứng __table_args__ trong models.py)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_videos_user_status_date')
+    CREATE INDEX idx_videos_user_status_date ON videos(user_id, status, upload_date);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_vocabulary_video_id')
+    CREATE INDEX idx_vocabulary_video_id ON vocabulary(video_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_user_vocabulary_user_status_date')
+    CREATE INDEX idx_user_vocabulary_user_status_date ON user_vocabulary(user_id, learned_status, saved_date);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_user_quiz_results_user_quiz')
+    CREATE INDEX idx_user_quiz_results_user_quiz ON user_quiz_results(user_id, quiz_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_learning_progress_user_video')
+    CREATE INDEX idx_learning_progress_user_video ON learning_progress(user_id, video_id);
+GO
@@ -2,10 +2,11 @@
 Middleware package initialization
 """
 from .error_handler import register_error_handlers
-from .auth_middleware import token_required, get_current_user
+from .auth_middleware import token_required, get_current_user, invalidate_user_cache
 
 __all__ = [
     'register_error_handlers',
     'token_required',
-    'get_current_user'
+    'get_current_user',
+    'invalidate_user_cache'
 ]
\ No newline at end of file
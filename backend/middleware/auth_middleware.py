@@ -1,16 +1,98 @@
 """
 Authentication Middleware
 Xử lý xác thực JWT token
+
+User hiện tại được resolve tối đa một lần mỗi request (lưu trên flask.g). Giữa các
+request, bản ghi user được cache ngắn hạn trong process (USER_CACHE_TTL giây) và gắn
+lại vào DB session không cần query; cache bị xóa khi đổi profile/mật khẩu/trạng thái.
 """
 import logging
 from functools import wraps
-from flask import jsonify
+from flask import jsonify, g, has_app_context
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy.orm import make_transient_to_detached
 from database.models import User
+from database.db_config import db
 from utils.response_handler import error_response
+from utils.cache import TTLCache
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Cột của User giữ trong cache (password_hash luôn đọc lại từ DB khi cần)
+_CACHED_USER_COLUMNS = [
+    column.key for column in User.__table__.columns if column.key != 'password_hash'
+]
+
+# Cache bản ghi user đang active theo user_id: {user_id: {cột: giá trị}}
+_user_cache = TTLCache(max_entries=Config.USER_CACHE_MAX_ENTRIES, ttl=Config.USER_CACHE_TTL)
+
+
+def invalidate_user_cache(user_id):
+    """
+    Xóa user khỏi cache (gọi sau khi đổi profile, mật khẩu hoặc trạng thái active)
+
+    Args:
+        user_id: ID của user
+    """
+    _user_cache.invalidate(user_id)
+
+    if has_app_context() and g.get('current_user_id') == user_id:
+        g.pop('current_user', None)
+
+
+def _load_user(user_id):
+    """
+    Lấy User theo id: từ cache (gắn vào session hiện tại, không query) hoặc từ DB
+
+    Returns:
+        User or None
+    """
+    snapshot = _user_cache.get(user_id)
+
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+
+    if user is not None and user.is_active:
+        _user_cache.set(user_id, {key: getattr(user, key) for key in _CACHED_USER_COLUMNS})
+
+    return user
+
+
+def _resolve_current_user():
+    """
+    Xác thực token (nếu @jwt_required chưa làm) và lấy User; cache trên flask.g
+
+    Returns:
+        tuple: (user_id: int or None, user: User or None)
+    """
+    if 'current_user' in g:
+        return g.current_user_id, g.current_user
+
+    try:
+        # @jwt_required() đã xác thực → identity có sẵn, không verify lại
+        identity = get_jwt_identity()
+    except RuntimeError:
+        verify_jwt_in_request()
+        identity = get_jwt_identity()
+
+    try:
+        user_id = int(identity)
+    except (ValueError, TypeError):
+        logger.error(f"❌ Token identity không hợp lệ: {identity}")
+        user_id, user = None, None
+    else:
+        user = _load_user(user_id)
+
+    g.current_user_id = user_id
+    g.current_user = user
+
+    return user_id, user
+
 
 def token_required(f):
     """
@@ -25,27 +107,15 @@ def token_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            # Xác thực JWT token
-            verify_jwt_in_request()
-            
-            # Lấy user_id từ token (là string)
-            current_user_id_str = get_jwt_identity()
-            
-            logger.info(f"🔍 Token identity (string): {current_user_id_str}")
+            current_user_id, user = _resolve_current_user()
             
-            # Convert về integer
-            try:
-                current_user_id = int(current_user_id_str)
-                logger.info(f"✅ Converted to int: {current_user_id}")
-            except (ValueError, TypeError) as e:
-                logger.error(f"❌ Cannot convert to int: {current_user_id_str}")
+            if current_user_id is None:
                 return jsonify(error_response(
                     message='Token không hợp lệ',
                     status_code=401
                 )), 401
             
             # Kiểm tra user có tồn tại không
-            user = User.query.get(current_user_id)
             if not user:
                 logger.warning(f"❌ User not found: {current_user_id}")
                 return jsonify(error_response(
@@ -61,8 +131,6 @@ def token_required(f):
                     status_code=401
                 )), 401
             
-            logger.info(f"✅ Token valid for user: {user.username}")
-            
             return f(*args, **kwargs)
             
         except Exception as e:
@@ -78,33 +146,15 @@ def token_required(f):
 
 def get_current_user():
     """
-    Lấy thông tin user hiện tại từ JWT token
+    Lấy thông tin user hiện tại từ JWT token (một lần mỗi request)
     
     Returns:
         User object hoặc None
     """
     try:
-        # Xác thực JWT token
-        verify_jwt_in_request()
-        
-        # Lấy user_id từ token (là string)
-        current_user_id_str = get_jwt_identity()
-        
-        logger.info(f"🔍 Getting user from token: {current_user_id_str}")
-        
-        # Convert về integer
-        try:
-            current_user_id = int(current_user_id_str)
-        except (ValueError, TypeError) as e:
-            logger.error(f"❌ Cannot convert to int: {current_user_id_str}")
-            return None
-        
-        # Lấy user từ database
-        user = User.query.get(current_user_id)
+        current_user_id, user = _resolve_current_user()
         
-        if user:
-            logger.info(f"✅ User found: {user.username}")
-        else:
+        if current_user_id is not None and not user:
             logger.warning(f"❌ User not found: {current_user_id}")
         
         return user
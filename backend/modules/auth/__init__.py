@@ -1,7 +1,7 @@
 """
 Authentication Module
 """
-from .authentication import register_user, login_user, verify_password, change_password
+from .authentication import register_user, login_user, verify_password, change_password, set_user_active
 from .password_handler import hash_password, check_password
 
 __all__ = [
@@ -9,6 +9,7 @@ __all__ = [
     'login_user',
     'verify_password',
     'change_password',
+    'set_user_active',
     'hash_password',
     'check_password'
 ]
\ No newline at end of file
@@ -7,6 +7,7 @@ from datetime import datetime
 from database.models import User
 from database.db_config import db
 from .password_handler import hash_password, check_password
+from middleware.auth_middleware import invalidate_user_cache
 from utils.validators import validate_email, validate_password, validate_username
 
 logger = logging.getLogger(__name__)
@@ -109,6 +110,7 @@ def login_user(username, password):
         # Cập nhật last_login
         user.last_login = datetime.utcnow()
         db.session.commit()
+        invalidate_user_cache(user.user_id)
         
         logger.info(f"Đăng nhập thành công: {user.username}")
         
@@ -166,6 +168,7 @@ def change_password(user, old_password, new_password):
         # Cập nhật
         user.password_hash = new_password_hash
         db.session.commit()
+        invalidate_user_cache(user.user_id)
         
         logger.info(f"Đổi mật khẩu thành công: {user.username}")
         
@@ -174,4 +177,30 @@ def change_password(user, old_password, new_password):
     except Exception as e:
         db.session.rollback()
         logger.error(f"Lỗi khi đổi mật khẩu: {str(e)}")
-        return False, f"Lỗi khi đổi mật khẩu: {str(e)}"
\ No newline at end of file
+        return False, f"Lỗi khi đổi mật khẩu: {str(e)}"
+
+
+def set_user_active(user, is_active):
+    """
+    Kích hoạt / vô hiệu hóa tài khoản
+    
+    Args:
+        user: User object
+        is_active: True để kích hoạt, False để vô hiệu hóa
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        user.is_active = is_active
+        db.session.commit()
+        invalidate_user_cache(user.user_id)
+        
+        logger.info(f"{'Kích hoạt' if is_active else 'Vô hiệu hóa'} tài khoản: {user.username}")
+        
+        return True, "Cập nhật trạng thái tài khoản thành công"
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi khi cập nhật trạng thái tài khoản: {str(e)}")
+        return False, f"Lỗi khi cập nhật trạng thái tài khoản: {str(e)}"
@@ -1,10 +1,14 @@
 """
 Speech to Text Module
 """
-from .whisper_handler import transcribe_audio_whisper
-from .language_detector import detect_language
+from .whisper_handler import transcribe_audio_whisper, stream_transcribe_audio_whisper
+from .language_detector import detect_language, detect_language_from_audio
+from .transcription_service import transcription_service
 
 __all__ = [
     'transcribe_audio_whisper',
-    'detect_language'
+    'stream_transcribe_audio_whisper',
+    'detect_language',
+    'detect_language_from_audio',
+    'transcription_service'
 ]
\ No newline at end of file
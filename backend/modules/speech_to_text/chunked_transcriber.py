@@ -0,0 +1,246 @@
+"""
+Chunked Whisper Transcriber
+Chia audio dài thành các đoạn ~WHISPER_CHUNK_SECONDS tại khoảng lặng (VAD),
+transcribe song song trên các Whisper replica của transcription_service rồi ghép
+lại segments (id, timestamps).
+
+Chunk dùng chung replica (và ngân sách CPU/RAM) với transcribe thường, không load
+thêm bản model nào.
+
+Yêu cầu audio WAV PCM 16-bit mono 16kHz (định dạng do audio_extractor tạo ra).
+"""
+import logging
+import wave
+from collections import deque
+import numpy as np
+from config import Config
+from .transcription_service import transcription_service
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Khoảng tìm điểm cắt quanh mỗi mốc chunk (giây)
+BOUNDARY_SEARCH_SECONDS = 30
+
+# Đoạn đầu audio dùng để xác định ngôn ngữ chung cho mọi chunk (giây)
+LANGUAGE_DETECT_SECONDS = 30
+
+
+def get_wav_duration(audio_path):
+    """
+    Lấy thời lượng WAV PCM 16kHz mono (None nếu không đúng định dạng)
+
+    Args:
+        audio_path: Đường dẫn file WAV
+
+    Returns:
+        float or None: Thời lượng (giây)
+    """
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            if (wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1
+                    or wav.getsampwidth() != 2):
+                return None
+            return wav.getnframes() / float(SAMPLE_RATE)
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def read_wav_window(audio_path, start, end):
+    """
+    Đọc một đoạn WAV thành mảng float32 [-1, 1] (không load cả file)
+
+    Args:
+        audio_path: Đường dẫn file WAV
+        start: Thời điểm bắt đầu (giây)
+        end: Thời điểm kết thúc (giây)
+
+    Returns:
+        np.ndarray: float32 samples
+    """
+    with wave.open(audio_path, 'rb') as wav:
+        total = wav.getnframes()
+        first = max(0, min(total, int(start * SAMPLE_RATE)))
+        last = max(first, min(total, int(end * SAMPLE_RATE)))
+        wav.setpos(first)
+        raw = wav.readframes(last - first)
+
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _find_silence_point(audio_path, target, total_duration):
+    """
+    Tìm điểm cắt gần mốc target nằm giữa khoảng lặng dài nhất (theo VAD)
+
+    Args:
+        audio_path: Đường dẫn file WAV
+        target: Mốc thời gian mong muốn (giây)
+        total_duration: Tổng thời lượng (giây)
+
+    Returns:
+        float: Điểm cắt (giây)
+    """
+    window_start = max(0.0, target - BOUNDARY_SEARCH_SECONDS)
+    window_end = min(total_duration, target + BOUNDARY_SEARCH_SECONDS)
+    audio = read_wav_window(audio_path, window_start, window_end)
+
+    if len(audio) == 0:
+        return target
+
+    try:
+        from faster_whisper.vad import get_speech_timestamps
+
+        speech = get_speech_timestamps(audio)
+
+        if not speech:
+            return target
+
+        # Khoảng lặng giữa các đoạn có tiếng nói (tính cả hai đầu cửa sổ)
+        edges = [0] + [x for s in speech for x in (s['start'], s['end'])] + [len(audio)]
+        gaps = [(edges[i], edges[i + 1]) for i in range(0, len(edges), 2) if edges[i + 1] > edges[i]]
+
+        if gaps:
+            target_sample = (target - window_start) * SAMPLE_RATE
+            start, end = max(
+                gaps,
+                key=lambda g: (g[1] - g[0], -abs((g[0] + g[1]) / 2 - target_sample))
+            )
+            return window_start + (start + end) / 2.0 / SAMPLE_RATE
+
+    except Exception as e:
+        logger.warning(f"VAD lỗi, dùng năng lượng để tìm điểm cắt: {str(e)}")
+
+    # Fallback: frame 100ms có năng lượng thấp nhất
+    frame = SAMPLE_RATE // 10
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return target
+
+    energy = np.square(audio[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    quietest = int(np.argmin(energy))
+
+    return window_start + (quietest + 0.5) * frame / SAMPLE_RATE
+
+
+def compute_chunk_boundaries(audio_path, total_duration, chunk_seconds=None):
+    """
+    Chia audio thành các chunk ~chunk_seconds, cắt tại khoảng lặng
+
+    Args:
+        audio_path: Đường dẫn file WAV
+        total_duration: Tổng thời lượng (giây)
+        chunk_seconds: Độ dài chunk mong muốn
+
+    Returns:
+        list: [(start, end), ...] theo giây
+    """
+    chunk_seconds = chunk_seconds or Config.WHISPER_CHUNK_SECONDS
+
+    boundaries = [0.0]
+    target = chunk_seconds
+
+    while target < total_duration - chunk_seconds / 2:
+        cut = _find_silence_point(audio_path, target, total_duration)
+        if cut <= boundaries[-1]:
+            cut = target
+        boundaries.append(cut)
+        target = cut + chunk_seconds
+
+    boundaries.append(total_duration)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def stitch_chunk_segments(chunk_results):
+    """
+    Ghép segments của các chunk: cộng offset thời gian và đánh lại id
+
+    Args:
+        chunk_results: List [(chunk_start, segments), ...] theo thứ tự
+
+    Returns:
+        list: Segments đã ghép
+    """
+    stitched = []
+
+    for offset, segments in chunk_results:
+        for segment in segments:
+            segment['start'] += offset
+            segment['end'] += offset
+            for word in segment.get('words', []):
+                word['start'] += offset
+                word['end'] += offset
+            segment['id'] = len(stitched) + 1
+            stitched.append(segment)
+
+    return stitched
+
+
+def transcribe_audio_chunked(audio_path, language=None):
+    """
+    Transcribe audio dài bằng cách chia chunk và chạy song song
+
+    Args:
+        audio_path: Đường dẫn WAV 16kHz mono
+        language: Mã ngôn ngữ (None = auto detect trên 30 giây đầu)
+
+    Returns:
+        tuple: (success: bool, result: dict, message: str) - giống transcribe_audio_whisper
+    """
+    try:
+        total_duration = get_wav_duration(audio_path)
+
+        if not total_duration:
+            return False, None, "Audio không phải WAV PCM 16kHz mono"
+
+        chunks = compute_chunk_boundaries(audio_path, total_duration)
+
+        logger.info(
+            f"Bắt đầu transcribe chunked: {audio_path} "
+            f"({total_duration:.0f}s, {len(chunks)} chunks)"
+        )
+
+        # Cố định ngôn ngữ cho mọi chunk để kết quả nhất quán
+        language_probability = 1.0
+        if language is None:
+            info = transcription_service.detect_language(
+                read_wav_window(audio_path, 0, LANGUAGE_DETECT_SECONDS)
+            )
+            language, language_probability = info.language, info.language_probability
+            logger.info(f"Detected language: {language} ({language_probability:.2f})")
+
+        # Mỗi chunk là một job của service → các replica rảnh transcribe song song;
+        # chỉ giữ tối đa (số replica + 1) chunk trong RAM, timestamps tương đối so với đầu chunk
+        pending = deque()
+        chunk_results = []
+
+        for start, end in chunks:
+            if len(pending) > max(1, transcription_service.replica_count):
+                chunk_start, future = pending.popleft()
+                chunk_results.append((chunk_start, future.result()[0]))
+
+            audio = read_wav_window(audio_path, start, end)
+            pending.append((start, transcription_service.submit(audio, language)))
+
+        while pending:
+            chunk_start, future = pending.popleft()
+            chunk_results.append((chunk_start, future.result()[0]))
+
+        segments_list = stitch_chunk_segments(chunk_results)
+
+        result = {
+            'text': " ".join(seg['text'] for seg in segments_list).strip(),
+            'segments': segments_list,
+            'language': language,
+            'language_probability': language_probability,
+            'duration': total_duration
+        }
+
+        logger.info(f"Transcribe chunked hoàn tất: {len(segments_list)} segments")
+
+        return True, result, "Transcribe thành công"
+
+    except Exception as e:
+        logger.error(f"Lỗi khi transcribe chunked: {str(e)}")
+        return False, None, f"Lỗi khi transcribe: {str(e)}"
@@ -3,8 +3,10 @@ Language Detector
 Phát hiện ngôn ngữ từ text hoặc audio
 """
 import logging
+from collections import defaultdict
 from langdetect import detect, detect_langs
 from langdetect.lang_detect_exception import LangDetectException
+from config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +70,75 @@ def detect_language_from_audio_result(transcription_result):
         return None
 
 
+def _audio_windows(duration, windows, window_seconds):
+    """Các cửa sổ (start, end): cửa sổ đầu tại 0, các cửa sổ sau rải đều tới cuối audio"""
+    if not duration or duration <= window_seconds or windows <= 1:
+        return [(0, window_seconds)]
+
+    step = (duration - window_seconds) / (windows - 1)
+    return [(i * step, i * step + window_seconds) for i in range(windows)]
+
+
+def detect_language_from_audio(audio, windows=None, window_seconds=None):
+    """
+    Phát hiện ngôn ngữ từ audio bằng Whisper language ID trên các đoạn ngắn
+    (không decode cả audio), cộng xác suất của các đoạn
+    
+    Args:
+        audio: Đường dẫn WAV 16kHz mono hoặc mảng float32 (load_audio_array)
+        windows: Số đoạn (None = Config.LANGUAGE_DETECT_WINDOWS)
+        window_seconds: Độ dài mỗi đoạn (None = Config.LANGUAGE_DETECT_WINDOW_SECONDS)
+    
+    Returns:
+        tuple: (language_code: str, probability: float)
+        language_code = None nếu xác suất thấp hơn LANGUAGE_DETECT_MIN_PROBABILITY
+    """
+    from .transcription_service import transcription_service
+    from .chunked_transcriber import SAMPLE_RATE, get_wav_duration, read_wav_window
+    
+    try:
+        windows = windows or Config.LANGUAGE_DETECT_WINDOWS
+        window_seconds = window_seconds or Config.LANGUAGE_DETECT_WINDOW_SECONDS
+        
+        if isinstance(audio, str):
+            duration = get_wav_duration(audio)
+            if duration is None:
+                # Không đọc được WAV theo đoạn → Whisper tự lấy 30 giây đầu của file
+                windows = 1
+        else:
+            duration = len(audio) / SAMPLE_RATE
+        
+        scores = defaultdict(float)
+        bounds = _audio_windows(duration, windows, window_seconds)
+        
+        for start, end in bounds:
+            if isinstance(audio, str):
+                window = read_wav_window(audio, start, end) if duration is not None else audio
+            else:
+                window = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+            
+            info = transcription_service.detect_language(window)
+            probabilities = getattr(info, 'all_language_probs', None) or [
+                (info.language, info.language_probability)
+            ]
+            for language, probability in probabilities:
+                scores[language] += probability
+        
+        language = max(scores, key=scores.get)
+        probability = scores[language] / len(bounds)
+        
+        logger.info(f"Detected audio language: {language} ({probability:.2f}, {len(bounds)} đoạn)")
+        
+        if probability < Config.LANGUAGE_DETECT_MIN_PROBABILITY:
+            return None, probability
+        
+        return language, probability
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi phát hiện ngôn ngữ từ audio: {str(e)}")
+        return None, 0.0
+
+
 def is_language_supported(language_code, supported_languages):
     """
     Kiểm tra ngôn ngữ có được hỗ trợ không
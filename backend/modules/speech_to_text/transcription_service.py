@@ -0,0 +1,431 @@
+"""
+Transcription Service
+Quản lý N bản Whisper model (replica), mỗi replica có thread riêng lấy job từ một
+hàng đợi chung, nên mỗi model chỉ transcribe một audio tại một thời điểm.
+
+Số replica mặc định theo số core (WHISPER_CPU_THREADS mỗi replica) và RAM
+(ước lượng theo kích thước model).
+
+warm_up() load model và chạy thử một đoạn audio im lặng ngay khi khởi động, để
+video đầu tiên sau deploy không phải chờ load model; is_ready() dùng cho readiness probe.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# RAM ước lượng của một model (MB, int8/CPU) để giới hạn số replica
+MODEL_MEMORY_MB = {
+    'tiny': 150,
+    'base': 250,
+    'small': 600,
+    'medium': 1500,
+    'large-v2': 3000,
+    'large-v3': 3000
+}
+DEFAULT_MODEL_MEMORY_MB = 3000
+
+# Phần RAM tối đa dành cho các replica
+MEMORY_BUDGET_RATIO = 0.5
+
+# Audio im lặng dùng để warm-up (giây, 16kHz)
+WARMUP_AUDIO_SECONDS = 1
+
+# Đánh dấu kết thúc stream segments
+_END_OF_STREAM = object()
+
+
+def _current_rss_mb():
+    """RAM thường trú của process (MB), None nếu không đọc được"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+        import sys
+
+        # ru_maxrss: KB trên Linux, bytes trên macOS (giá trị đỉnh, không phải hiện tại)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // (1024 * 1024) if sys.platform == 'darwin' else peak // 1024
+    except (ImportError, OSError):
+        return None
+
+
+def _total_memory_mb():
+    """RAM vật lý (MB), None nếu không đọc được"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _process_count():
+    """Số process cùng load model (mỗi worker của job queue ở chế độ process có service riêng)"""
+    if Config.JOB_WORKER_MODE == 'process':
+        return max(1, Config.JOB_WORKER_COUNT)
+    return 1
+
+
+def default_replica_count():
+    """
+    Số replica của process này theo core và RAM (GPU: 1)
+
+    Ngân sách CPU/RAM của cả máy được chia đều cho các process cùng chạy service.
+
+    Returns:
+        int
+    """
+    if Config.WHISPER_REPLICAS > 0:
+        return Config.WHISPER_REPLICAS
+
+    if Config.WHISPER_DEVICE != 'cpu':
+        return 1
+
+    processes = _process_count()
+    cpu_slots = (os.cpu_count() or 1) // max(1, Config.WHISPER_CPU_THREADS)
+    by_cpu = max(1, cpu_slots // processes)
+
+    total_memory = _total_memory_mb()
+    if total_memory is None:
+        return by_cpu
+
+    model_memory = MODEL_MEMORY_MB.get(Config.WHISPER_MODEL, DEFAULT_MODEL_MEMORY_MB)
+    by_memory = max(1, int(total_memory * MEMORY_BUDGET_RATIO // model_memory) // processes)
+
+    return min(by_cpu, by_memory)
+
+
+class _TranscriptionJob:
+    """Một yêu cầu transcribe"""
+
+    __slots__ = ('audio', 'language', 'options', 'future', 'stream', 'detect_only', 'submitted_at')
+
+    def __init__(self, audio, language, options, stream=None, detect_only=False):
+        self.audio = audio
+        self.language = language
+        self.options = options
+        self.future = Future()
+        self.stream = stream  # queue.Queue nhận segments (streaming) hoặc None
+        self.detect_only = detect_only  # chỉ xác định ngôn ngữ, không decode segments
+        self.submitted_at = time.monotonic()
+
+
+class _Replica:
+    """Một Whisper model và thread xử lý job của nó"""
+
+    def __init__(self, index):
+        self.index = index
+        self.model = None
+        self.ready = False
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.rss_mb = None
+        self.thread = None
+        self.started_at = None
+        self.busy_since = None
+        self.busy_seconds = 0.0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    def get_stats(self):
+        now = time.monotonic()
+        busy = self.busy_seconds + (now - self.busy_since if self.busy_since else 0.0)
+        uptime = now - self.started_at if self.started_at else 0.0
+
+        return {
+            'replica': self.index,
+            'loaded': self.model is not None,
+            'ready': self.ready,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'rss_mb': self.rss_mb,
+            'busy': self.busy_since is not None,
+            'jobs_completed': self.jobs_completed,
+            'jobs_failed': self.jobs_failed,
+            'busy_seconds': round(busy, 1),
+            'utilization': round(busy / uptime, 3) if uptime else 0.0
+        }
+
+
+class TranscriptionService:
+    """
+    Hàng đợi transcribe dùng chung với N Whisper replica
+
+    Replica được khởi động lazy ở job đầu tiên (hoặc ngay khi gọi warm_up); mỗi
+    replica load model trong thread của chính nó.
+    """
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._replicas = []
+        self._lock = threading.Lock()
+        self._warmed = threading.Event()  # mọi replica đã load xong (hoặc lỗi)
+        self._settled_count = 0
+
+    @property
+    def replica_count(self):
+        return len(self._replicas)
+
+    def start(self, replicas=None):
+        """
+        Khởi động các replica thread (không làm gì nếu đã chạy)
+
+        Args:
+            replicas: Số replica (None = default_replica_count())
+        """
+        with self._lock:
+            if self._replicas:
+                return
+
+            count = replicas or default_replica_count()
+            logger.info(
+                f"Starting transcription service: {count} x Whisper {Config.WHISPER_MODEL} "
+                f"({Config.WHISPER_DEVICE}, {Config.WHISPER_CPU_THREADS} threads)"
+            )
+
+            for index in range(count):
+                replica = _Replica(index)
+                replica.thread = threading.Thread(
+                    target=self._replica_loop,
+                    args=(replica,),
+                    name=f'whisper-replica-{index}',
+                    daemon=True
+                )
+                self._replicas.append(replica)
+                replica.thread.start()
+
+    def warm_up(self, wait=False, timeout=None):
+        """
+        Load tất cả replica và chạy thử audio im lặng
+
+        Args:
+            wait: True = chờ tới khi mọi replica sẵn sàng
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            bool: Đã sẵn sàng hay chưa
+        """
+        self.start()
+
+        if wait:
+            self._warmed.wait(timeout)
+
+        return self.is_ready()
+
+    def is_ready(self):
+        """
+        Sẵn sàng nhận job mà không phải chờ load model: mọi replica đã warm-up và ít
+        nhất một replica load thành công (False nếu replica chưa được khởi động)
+        """
+        return self._warmed.is_set() and any(replica.ready for replica in self._replicas)
+
+    def submit(self, audio, language=None, stream=False, **options):
+        """
+        Đưa audio vào hàng đợi transcribe
+
+        Args:
+            audio: Đường dẫn audio hoặc mảng float32 16kHz mono
+            language: Mã ngôn ngữ (None = auto detect)
+            stream: True → future trả về ngay khi có info, segments đọc dần qua generator
+            **options: Tham số thêm cho model.transcribe
+
+        Returns:
+            Future: kết quả (segments: list of dict hoặc generator, info)
+        """
+        self.start()
+
+        job = _TranscriptionJob(audio, language, options, stream=queue.Queue() if stream else None)
+        self._jobs.put(job)
+        return job.future
+
+    def transcribe(self, audio, language=None, **options):
+        """
+        Transcribe và chờ kết quả
+
+        Returns:
+            tuple: (segments: list of dict, info)
+        """
+        return self.submit(audio, language, **options).result()
+
+    def stream(self, audio, language=None, **options):
+        """
+        Transcribe dạng streaming: trả về khi đã xác định ngôn ngữ
+
+        Returns:
+            tuple: (segments: generator of dict, info)
+        """
+        return self.submit(audio, language, stream=True, **options).result()
+
+    def detect_language(self, audio):
+        """
+        Xác định ngôn ngữ (Whisper language ID trên 30 giây đầu của audio sau VAD)
+
+        Returns:
+            TranscriptionInfo: language, language_probability, all_language_probs
+        """
+        self.start()
+
+        job = _TranscriptionJob(audio, None, {'beam_size': 1}, detect_only=True)
+        self._jobs.put(job)
+        return job.future.result()
+
+    def get_stats(self):
+        """
+        Thống kê hàng đợi và mức sử dụng từng replica
+
+        Returns:
+            dict
+        """
+        return {
+            'model': Config.WHISPER_MODEL,
+            'device': Config.WHISPER_DEVICE,
+            'ready': self.is_ready(),
+            'rss_mb': _current_rss_mb(),
+            'queued': self._jobs.qsize(),
+            'replicas': [replica.get_stats() for replica in self._replicas]
+        }
+
+    # ========== Replica ==========
+
+    def _load_model(self):
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(
+            Config.WHISPER_MODEL,
+            device=Config.WHISPER_DEVICE,
+            compute_type=Config.WHISPER_COMPUTE_TYPE,
+            cpu_threads=Config.WHISPER_CPU_THREADS
+        )
+
+    def _warm_up_replica(self, replica):
+        """Load model, chạy thử audio im lặng và ghi lại thời gian/RAM"""
+        import numpy as np
+
+        started = time.monotonic()
+        replica.model = self._load_model()
+        replica.load_seconds = round(time.monotonic() - started, 2)
+
+        started = time.monotonic()
+        silence = np.zeros(16000 * WARMUP_AUDIO_SECONDS, dtype=np.float32)
+        segments, _ = replica.model.transcribe(silence, language='en', beam_size=1)
+        list(segments)
+        replica.warmup_seconds = round(time.monotonic() - started, 2)
+        replica.rss_mb = _current_rss_mb()
+
+        logger.info(
+            f"Whisper replica {replica.index} ready: load {replica.load_seconds}s, "
+            f"warm-up {replica.warmup_seconds}s, RSS {replica.rss_mb} MB"
+        )
+
+    def _replica_loop(self, replica):
+        """Load + warm-up model rồi xử lý job tuần tự"""
+        replica.started_at = time.monotonic()
+
+        try:
+            self._warm_up_replica(replica)
+        except Exception as e:
+            logger.error(f"Không load được Whisper replica {replica.index}: {str(e)}")
+            replica.error = str(e)
+            # Các job tiếp theo vẫn được replica này nhận và báo lỗi thay vì treo
+            load_error = e
+        else:
+            load_error = None
+            replica.ready = True
+
+        with self._lock:
+            self._settled_count += 1
+            if self._settled_count == len(self._replicas):
+                self._warmed.set()
+
+        while True:
+            job = self._jobs.get()
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            if load_error is not None:
+                job.future.set_exception(load_error)
+                replica.jobs_failed += 1
+                continue
+
+            replica.busy_since = time.monotonic()
+            try:
+                self._run_job(replica.model, job)
+                replica.jobs_completed += 1
+            except Exception as e:
+                replica.jobs_failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                elif job.stream is not None:
+                    job.stream.put(e)
+            finally:
+                replica.busy_seconds += time.monotonic() - replica.busy_since
+                replica.busy_since = None
+
+    def _run_job(self, model, job):
+        """Transcribe trong thread của replica (segments được decode tại đây)"""
+        from .whisper_handler import segment_to_dict
+
+        options = {'beam_size': 5, 'vad_filter': True, 'word_timestamps': True}
+        options.update(job.options)
+
+        segments, info = model.transcribe(job.audio, language=job.language, **options)
+
+        if job.detect_only:
+            # Ngôn ngữ được xác định ngay trong transcribe(); segments chưa decode thì bỏ
+            job.future.set_result(info)
+            return
+
+        if job.stream is None:
+            job.future.set_result(([segment_to_dict(segment) for segment in segments], info))
+            return
+
+        # Streaming: trả info ngay, segments được đẩy vào queue khi decode xong từng đoạn
+        job.future.set_result((self._drain(job.stream), info))
+
+        for segment in segments:
+            job.stream.put(segment_to_dict(segment))
+
+        job.stream.put(_END_OF_STREAM)
+
+    @staticmethod
+    def _drain(stream):
+        """Generator đọc segments từ queue của job streaming"""
+        while True:
+            item = stream.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+# Singleton dùng chung trong process
+transcription_service = TranscriptionService()
+
+
+def init_transcription_service(wait=False):
+    """
+    Warm-up transcription service khi khởi động (nếu WHISPER_PRELOAD)
+
+    Args:
+        wait: True = chờ load xong (worker process), False = load ở background
+
+    Returns:
+        TranscriptionService
+    """
+    if Config.WHISPER_PRELOAD:
+        transcription_service.warm_up(wait=wait)
+    return transcription_service
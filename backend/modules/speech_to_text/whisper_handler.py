@@ -4,43 +4,58 @@ Xử lý Speech-to-Text bằng Faster-Whisper và WhisperX
 """
 import logging
 import os
-from faster_whisper import WhisperModel
 from config import Config
+from .transcription_service import transcription_service
 
 logger = logging.getLogger(__name__)
 
-# Global model instance (lazy loading)
-_whisper_model = None
 
-
-def get_whisper_model():
+def segment_to_dict(segment):
     """
-    Lấy Whisper model instance (singleton pattern)
+    Chuyển segment của Faster-Whisper thành dict
+    
+    Args:
+        segment: Segment từ model.transcribe
     
     Returns:
-        WhisperModel instance
+        dict: {'id', 'start', 'end', 'text', 'words'}
     """
-    global _whisper_model
+    segment_dict = {
+        'id': segment.id,
+        'start': segment.start,
+        'end': segment.end,
+        'text': segment.text.strip(),
+        'words': []
+    }
     
-    if _whisper_model is None:
-        logger.info(f"Loading Whisper model: {Config.WHISPER_MODEL}")
-        _whisper_model = WhisperModel(
-            Config.WHISPER_MODEL,
-            device=Config.WHISPER_DEVICE,
-            compute_type=Config.WHISPER_COMPUTE_TYPE
-        )
-        logger.info("Whisper model loaded successfully")
+    # Thêm word-level timestamps nếu có
+    if hasattr(segment, 'words') and segment.words:
+        for word in segment.words:
+            segment_dict['words'].append({
+                'word': word.word,
+                'start': word.start,
+                'end': word.end,
+                'probability': word.probability
+            })
     
-    return _whisper_model
+    return segment_dict
+
+
+def _describe_audio(audio):
+    """Mô tả audio để log (đường dẫn hoặc thời lượng của mảng trong bộ nhớ)"""
+    if isinstance(audio, str):
+        return audio
+    return f"<in-memory {len(audio) / 16000:.0f}s>"
 
 
-def transcribe_audio_whisper(audio_path, language=None):
+def transcribe_audio_whisper(audio_path, language=None, chunked=None):
     """
     Chuyển audio thành text bằng Faster-Whisper
     
     Args:
-        audio_path: Đường dẫn audio file
+        audio_path: Đường dẫn audio file hoặc mảng float32 16kHz mono (load_audio_array)
         language: Mã ngôn ngữ (None = auto detect)
+        chunked: True/False để ép chế độ chunk song song (None = theo Config.WHISPER_CHUNKED)
     
     Returns:
         tuple: (success: bool, result: dict, message: str)
@@ -52,52 +67,28 @@ def transcribe_audio_whisper(audio_path, language=None):
     """
     try:
         # Kiểm tra file tồn tại
-        if not os.path.exists(audio_path):
+        in_memory = not isinstance(audio_path, str)
+        if not in_memory and not os.path.exists(audio_path):
             return False, None, "File audio không tồn tại"
         
-        logger.info(f"Bắt đầu transcribe audio: {audio_path}")
+        # Audio dài → chia chunk theo khoảng lặng và transcribe song song (chỉ với file WAV)
+        if chunked is None:
+            chunked = Config.WHISPER_CHUNKED
         
-        # Lấy model
-        model = get_whisper_model()
+        if chunked and not in_memory:
+            from .chunked_transcriber import get_wav_duration, transcribe_audio_chunked
+            
+            duration = get_wav_duration(audio_path)
+            if duration and duration >= Config.WHISPER_CHUNK_MIN_DURATION:
+                return transcribe_audio_chunked(audio_path, language=language)
         
-        # Transcribe
-        segments, info = model.transcribe(
-            audio_path,
-            language=language,
-            beam_size=5,
-            vad_filter=True,  # Voice Activity Detection
-            word_timestamps=True  # Lấy timestamp cho từng từ
-        )
+        logger.info(f"Bắt đầu transcribe audio: {_describe_audio(audio_path)}")
         
-        # Xử lý kết quả
-        full_text = ""
-        segments_list = []
-        
-        for segment in segments:
-            full_text += segment.text + " "
-            
-            segment_dict = {
-                'id': segment.id,
-                'start': segment.start,
-                'end': segment.end,
-                'text': segment.text.strip(),
-                'words': []
-            }
-            
-            # Thêm word-level timestamps nếu có
-            if hasattr(segment, 'words') and segment.words:
-                for word in segment.words:
-                    segment_dict['words'].append({
-                        'word': word.word,
-                        'start': word.start,
-                        'end': word.end,
-                        'probability': word.probability
-                    })
-            
-            segments_list.append(segment_dict)
+        # Transcribe trên một replica của transcription service (VAD + word timestamps)
+        segments_list, info = transcription_service.transcribe(audio_path, language=language)
         
         result = {
-            'text': full_text.strip(),
+            'text': " ".join(segment['text'] for segment in segments_list),
             'segments': segments_list,
             'language': info.language,
             'language_probability': info.language_probability,
@@ -113,6 +104,47 @@ def transcribe_audio_whisper(audio_path, language=None):
         return False, None, f"Lỗi khi transcribe: {str(e)}"
 
 
+def stream_transcribe_audio_whisper(audio_path, language=None):
+    """
+    Transcribe dạng streaming: trả về generator segments ngay khi Whisper decode xong
+    từng đoạn (không chờ toàn bộ transcript)
+    
+    Args:
+        audio_path: Đường dẫn audio file hoặc mảng float32 16kHz mono (load_audio_array)
+        language: Mã ngôn ngữ (None = auto detect)
+    
+    Returns:
+        tuple: (success: bool, stream: dict, message: str)
+        stream = {
+            'segments': generator of segment dict,
+            'language': str,
+            'language_probability': float,
+            'duration': float
+        }
+    """
+    try:
+        if isinstance(audio_path, str) and not os.path.exists(audio_path):
+            return False, None, "File audio không tồn tại"
+        
+        logger.info(f"Bắt đầu transcribe (streaming): {_describe_audio(audio_path)}")
+        
+        # Ngôn ngữ được xác định ngay khi replica bắt đầu, segments decode dần trên replica
+        segments, info = transcription_service.stream(audio_path, language=language)
+        
+        stream = {
+            'segments': segments,
+            'language': info.language,
+            'language_probability': info.language_probability,
+            'duration': info.duration
+        }
+        
+        return True, stream, "Bắt đầu transcribe thành công"
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi transcribe streaming: {str(e)}")
+        return False, None, f"Lỗi khi transcribe: {str(e)}"
+
+
 def transcribe_audio_with_alignment(audio_path, language=None):
     """
     Transcribe audio với alignment tốt hơn (sử dụng WhisperX nếu cần)
@@ -1,9 +1,12 @@
 """
 Translation Module
 """
-from .gpt4_translator import translate_text_gpt4, translate_segments_gpt4
+from .gpt4_translator import translate_text_gpt4, translate_segments_gpt4, translate_segments_streaming
+from .translation_memory import translation_memory
 
 __all__ = [
     'translate_text_gpt4',
-    'translate_segments_gpt4'
+    'translate_segments_gpt4',
+    'translate_segments_streaming',
+    'translation_memory'
 ]
\ No newline at end of file
@@ -2,14 +2,37 @@
 GPT-4 Translator
 Dịch văn bản sử dụng GPT-4o với ngữ cảnh
 """
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from config import Config
+from .rate_limiter import translation_limiter, call_with_backoff, estimate_tokens
+from .translation_memory import translation_memory, normalize_text
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
+# Số segment ngữ cảnh trước/sau mỗi batch
+CONTEXT_SIZE = 2
+
+# Ước lượng token đầu ra: bản dịch tiếng Việt thường tốn gấp ~2 lần token so với câu gốc
+OUTPUT_TOKEN_RATIO = 2.0
+
+# Token cho id, dấu ngoặc kép và dấu phẩy JSON của mỗi segment
+LINE_OVERHEAD_TOKENS = 6
+
+# Token cho khung JSON {"translations": {...}} của response
+RESPONSE_OVERHEAD_TOKENS = 16
+
+# Dự phòng cho max_tokens so với token đầu ra ước lượng
+MAX_TOKENS_MARGIN = 1.25
+
+# Initialize OpenAI client (retry do call_with_backoff đảm nhiệm)
+client = OpenAI(
+    api_key=Config.OPENAI_API_KEY,
+    base_url=Config.OPENAI_BASE_URL,
+    max_retries=0
+)
 
 
 def translate_text_gpt4(text, source_language='en', target_language='vi', context=None):
@@ -79,31 +102,34 @@ def translate_segments_gpt4(segments, source_language='en', target_language='vi'
         if not segments:
             return False, None, "Không có segments để dịch"
         
-        translated_segments = []
+        # Segment đã có trong translation memory không cần gọi API
+        results = {}
+        pending = _apply_memory(segments, range(len(segments)), results, source_language, target_language)
         
-        # Dịch theo batch để có ngữ cảnh tốt hơn
-        batch_size = 10
+        # Segment trùng text (điệp khúc, câu lặp lại) chỉ dịch một lần
+        duplicates = []
+        pending = _dedupe(segments, pending, {}, duplicates)
         
-        for i in range(0, len(segments), batch_size):
-            batch = segments[i:i + batch_size]
-            
-            # Tạo context từ các segments trước và sau
-            context_before = segments[max(0, i-2):i] if i > 0 else []
-            context_after = segments[i+batch_size:i+batch_size+2] if i+batch_size < len(segments) else []
-            
-            # Dịch batch
-            success, batch_translations = translate_batch_with_context(
-                batch, context_before, context_after, 
-                source_language, target_language
-            )
-            
-            if not success:
-                logger.warning(f"Lỗi dịch batch {i}")
-                continue
-            
-            translated_segments.extend(batch_translations)
+        # Các batch được gửi song song (giới hạn bởi translation_limiter), kết quả giữ thứ tự
+        with ThreadPoolExecutor(
+            max_workers=Config.TRANSLATION_MAX_CONCURRENCY,
+            thread_name_prefix='translate'
+        ) as executor:
+            futures = [
+                _submit_batch(executor, segments, batch_indices, source_language, target_language)
+                for batch_indices in _pack_batches(segments, pending)
+            ]
+            _collect_batches(futures, results)
+        
+        _fan_out(segments, duplicates, results)
+        _remember(segments, pending, results, source_language, target_language)
+        
+        translated_segments = [results[i] for i in range(len(segments)) if i in results]
         
-        logger.info(f"Đã dịch {len(translated_segments)} segments")
+        logger.info(
+            f"Đã dịch {len(translated_segments)} segments ({len(pending)} gửi GPT, "
+            f"{len(duplicates)} trùng lặp, {len(segments) - len(pending) - len(duplicates)} từ translation memory)"
+        )
         
         return True, translated_segments, "Dịch segments thành công"
         
@@ -112,9 +138,248 @@ def translate_segments_gpt4(segments, source_language='en', target_language='vi'
         return False, None, f"Lỗi: {str(e)}"
 
 
+def translate_segments_streaming(segment_stream, source_language='en', target_language='vi'):
+    """
+    Dịch segments theo kiểu streaming: mỗi batch được gửi đi ngay khi đã có đủ
+    segments (kèm ngữ cảnh sau), trong khi Whisper vẫn đang tạo các segment tiếp theo
+    
+    Args:
+        segment_stream: Iterable segments (vd. generator từ stream_transcribe_audio_whisper)
+        source_language: Ngôn ngữ nguồn
+        target_language: Ngôn ngữ đích
+    
+    Returns:
+        tuple: (success: bool, segments: list, translated_segments: list, message: str)
+    """
+    segments = []
+    results = {}
+    pending = []
+    representatives = {}
+    duplicates = []
+    futures = []
+    next_batch = 0
+    
+    try:
+        with ThreadPoolExecutor(
+            max_workers=Config.TRANSLATION_MAX_CONCURRENCY,
+            thread_name_prefix='translate-stream'
+        ) as executor:
+            for segment in segment_stream:
+                segments.append(segment)
+                pending.extend(_dedupe(segments, _apply_memory(
+                    segments, [len(segments) - 1], results, source_language, target_language
+                ), representatives, duplicates))
+                
+                # Batch đã đầy ngân sách token + có ngữ cảnh sau → gửi dịch ngay
+                while next_batch < len(pending):
+                    count, full = _fit_batch(segments, pending[next_batch:])
+                    batch_indices = pending[next_batch:next_batch + count]
+                    if not full or len(segments) < batch_indices[-1] + 1 + CONTEXT_SIZE:
+                        break
+                    futures.append(_submit_batch(
+                        executor, segments, batch_indices, source_language, target_language
+                    ))
+                    next_batch += count
+            
+            # Phần còn lại sau khi transcribe xong
+            for batch_indices in _pack_batches(segments, pending[next_batch:]):
+                futures.append(_submit_batch(
+                    executor, segments, batch_indices, source_language, target_language
+                ))
+            
+            if not segments:
+                return False, [], [], "Không có segments để dịch"
+            
+            _collect_batches(futures, results)
+        
+        _fan_out(segments, duplicates, results)
+        _remember(segments, pending, results, source_language, target_language)
+        
+        translated_segments = [results[i] for i in range(len(segments)) if i in results]
+        
+        logger.info(
+            f"Đã dịch {len(translated_segments)}/{len(segments)} segments (streaming, "
+            f"{len(pending)} gửi GPT, {len(duplicates)} trùng lặp, "
+            f"{len(segments) - len(pending) - len(duplicates)} từ translation memory)"
+        )
+        
+        return True, segments, translated_segments, "Dịch segments thành công"
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi dịch streaming: {str(e)}")
+        return False, segments, None, f"Lỗi: {str(e)}"
+
+
+def _apply_memory(segments, indices, results, source_language, target_language):
+    """
+    Lấy bản dịch có sẵn trong translation memory cho segments[indices]
+    
+    Returns:
+        list: Chỉ số các segment chưa có bản dịch (cần gọi API)
+    """
+    cached = translation_memory.lookup(
+        [segments[i]['text'] for i in indices], source_language, target_language
+    )
+    
+    pending = []
+    for i in indices:
+        translation = cached.get(segments[i]['text'])
+        if translation is None:
+            pending.append(i)
+            continue
+        
+        translated_segment = segments[i].copy()
+        translated_segment['translation'] = translation
+        results[i] = translated_segment
+    
+    return pending
+
+
+def _dedupe(segments, indices, representatives, duplicates):
+    """
+    Gom các segment có text trùng nhau (sau chuẩn hóa): chỉ segment xuất hiện đầu tiên được dịch
+    
+    Args:
+        segments: List segments
+        indices: Chỉ số các segment cần dịch
+        representatives: {text chuẩn hóa: chỉ số segment đại diện} (dùng lại giữa các lần gọi)
+        duplicates: List (chỉ số, chỉ số đại diện) được bổ sung các segment trùng
+    
+    Returns:
+        list: Chỉ số các segment đại diện mới
+    """
+    unique = []
+    for i in indices:
+        representative = representatives.setdefault(normalize_text(segments[i]['text']), i)
+        if representative == i:
+            unique.append(i)
+        else:
+            duplicates.append((i, representative))
+    
+    return unique
+
+
+def _fan_out(segments, duplicates, results):
+    """Gán bản dịch của segment đại diện cho mọi segment trùng với nó"""
+    for i, representative in duplicates:
+        if representative not in results:
+            continue
+        
+        translated_segment = segments[i].copy()
+        translated_segment['translation'] = results[representative]['translation']
+        results[i] = translated_segment
+
+
+def _remember(segments, indices, results, source_language, target_language):
+    """Lưu bản dịch mới vào translation memory (bỏ qua segment lỗi hoặc giữ nguyên text gốc)"""
+    pairs = [
+        (segments[i]['text'], results[i]['translation'])
+        for i in indices
+        if i in results and results[i]['translation'] != segments[i]['text']
+    ]
+    translation_memory.store(pairs, source_language, target_language)
+
+
+def _expected_output_tokens(segment):
+    """Token đầu ra ước lượng cho bản dịch của một segment (kèm id/ký tự JSON)"""
+    return int((estimate_tokens(segment['text']) + LINE_OVERHEAD_TOKENS) * OUTPUT_TOKEN_RATIO)
+
+
+def _batch_max_tokens(batch):
+    """
+    max_tokens cho request dịch batch: theo token đầu ra ước lượng của chính batch
+    (retry từng segment/nửa batch giữ ít token của limiter), tối đa theo
+    TRANSLATION_BATCH_OUTPUT_TOKENS
+    """
+    expected = RESPONSE_OVERHEAD_TOKENS + sum(_expected_output_tokens(seg) for seg in batch)
+    cap = int(Config.TRANSLATION_BATCH_OUTPUT_TOKENS * MAX_TOKENS_MARGIN)
+    return min(cap, int(expected * MAX_TOKENS_MARGIN))
+
+
+def _fit_batch(segments, indices):
+    """
+    Số segment đầu tiên của indices vừa một batch theo ngân sách token vào/ra
+    
+    Args:
+        segments: List segments
+        indices: Chỉ số các segment chờ dịch (theo thứ tự)
+    
+    Returns:
+        tuple: (count: int, full: bool) - full=True nếu không thể thêm segment nào nữa
+    """
+    input_tokens = 0
+    output_tokens = 0
+    
+    for count, i in enumerate(indices):
+        tokens = estimate_tokens(segments[i]['text']) + LINE_OVERHEAD_TOKENS
+        expected_output = _expected_output_tokens(segments[i])
+        
+        # Segment đầu tiên luôn được nhận (dù vượt ngân sách)
+        if count and (count >= Config.TRANSLATION_BATCH_MAX_SEGMENTS
+                      or input_tokens + tokens > Config.TRANSLATION_BATCH_INPUT_TOKENS
+                      or output_tokens + expected_output > Config.TRANSLATION_BATCH_OUTPUT_TOKENS):
+            return count, True
+        
+        input_tokens += tokens
+        output_tokens += expected_output
+    
+    return len(indices), len(indices) >= Config.TRANSLATION_BATCH_MAX_SEGMENTS
+
+
+def _pack_batches(segments, indices):
+    """
+    Chia các segment chờ dịch thành batch theo ngân sách token
+    
+    Returns:
+        list: List các list chỉ số
+    """
+    batches = []
+    start = 0
+    
+    while start < len(indices):
+        count, _ = _fit_batch(segments, indices[start:])
+        batches.append(indices[start:start + count])
+        start += count
+    
+    return batches
+
+
+def _submit_batch(executor, segments, batch_indices, source_language, target_language):
+    """
+    Gửi dịch một batch (theo chỉ số trong segments); ngữ cảnh lấy từ các segment liền kề
+    
+    Returns:
+        tuple: (batch_indices, future)
+    """
+    first, last = batch_indices[0], batch_indices[-1]
+    
+    future = executor.submit(
+        translate_batch_with_context,
+        [segments[i] for i in batch_indices],
+        segments[max(0, first - CONTEXT_SIZE):first],
+        segments[last + 1:last + 1 + CONTEXT_SIZE],
+        source_language, target_language
+    )
+    
+    return batch_indices, future
+
+
+def _collect_batches(futures, results):
+    """Chờ các batch theo thứ tự và ghi bản dịch vào results[index]; batch lỗi bị bỏ qua"""
+    for batch_indices, future in futures:
+        success, batch_translations = future.result()
+        
+        if not success:
+            logger.warning(f"Lỗi dịch batch {batch_indices[0]}")
+            continue
+        
+        for i, translated_segment in zip(batch_indices, batch_translations):
+            results[i] = translated_segment
+
+
 def translate_batch_with_context(batch, context_before, context_after, source_language, target_language):
     """
-    Dịch một batch segments với ngữ cảnh
+    Dịch một batch segments với ngữ cảnh (GPT trả về JSON theo id của segment)
     
     Args:
         batch: List segments cần dịch
@@ -127,9 +392,15 @@ def translate_batch_with_context(batch, context_before, context_after, source_la
         tuple: (success: bool, translations: list)
     """
     try:
-        # Tạo text từ batch
-        batch_texts = [seg['text'] for seg in batch]
-        combined_text = "\n".join([f"{i+1}. {text}" for i, text in enumerate(batch_texts)])
+        # Id của segment làm key (dùng số thứ tự nếu id trùng/thiếu)
+        keys = [str(seg.get('id', i + 1)) for i, seg in enumerate(batch)]
+        if len(set(keys)) != len(keys):
+            keys = [str(i + 1) for i in range(len(batch))]
+        
+        source_json = json.dumps(
+            {key: seg['text'] for key, seg in zip(keys, batch)},
+            ensure_ascii=False
+        )
         
         # Tạo context
         context_text = ""
@@ -140,33 +411,84 @@ def translate_batch_with_context(batch, context_before, context_after, source_la
         
         # Tạo prompt
         prompt = f"""Dịch các câu sau từ {get_language_name(source_language)} sang {get_language_name(target_language)}.
-Giữ nguyên số thứ tự và dịch từng câu một cách chính xác, tự nhiên.
+Dịch từng câu một cách chính xác, tự nhiên.
 
-{context_text}Văn bản cần dịch:
-{combined_text}
+{context_text}Văn bản cần dịch (JSON, key là id của câu):
+{source_json}
 
-Chỉ trả về bản dịch, giữ nguyên định dạng số thứ tự."""
+Trả về JSON dạng {{"translations": {{"<id>": "<bản dịch>"}}}} với đúng các id ở trên."""
         
-        # Gọi GPT-4o
-        response = client.chat.completions.create(
-            model=Config.OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Bạn là chuyên gia dịch thuật. Dịch chính xác và tự nhiên, phù hợp với ngữ cảnh."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.3,
-            max_tokens=3000
-        )
+        # Gọi GPT-4o (giới hạn đồng thời/token mỗi phút, retry khi 429/5xx)
+        max_tokens = _batch_max_tokens(batch)
+        
+        def request():
+            with translation_limiter.limit(estimate_tokens(prompt) + max_tokens) as slot:
+                response = client.chat.completions.create(
+                    model=Config.OPENAI_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "Bạn là chuyên gia dịch thuật. Dịch chính xác và tự nhiên, phù hợp với ngữ cảnh. Chỉ trả về JSON hợp lệ."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"}
+                )
+                if response.usage:
+                    slot.used(response.usage.total_tokens)
+                return response
+        
+        response = call_with_backoff(request)
+        
+        # Bản dịch bị cắt do hết max_tokens → chia đôi batch và dịch lại
+        if response.choices[0].finish_reason == 'length' and len(batch) > 1:
+            middle = len(batch) // 2
+            logger.warning(f"Bản dịch bị cắt (finish_reason=length), chia batch {len(batch)} → {middle} + {len(batch) - middle}")
+            
+            success_first, first = translate_batch_with_context(
+                batch[:middle], context_before, batch[middle:middle + CONTEXT_SIZE],
+                source_language, target_language
+            )
+            success_second, second = translate_batch_with_context(
+                batch[middle:], batch[max(0, middle - CONTEXT_SIZE):middle], context_after,
+                source_language, target_language
+            )
+            
+            if not (success_first and success_second):
+                return False, []
+            
+            return True, first + second
         
         # Parse kết quả
-        translation_text = response.choices[0].message.content.strip()
-        translations = parse_batch_translation(translation_text, batch)
+        translations, missing = parse_batch_translation(
+            response.choices[0].message.content or "", batch, keys
+        )
+        
+        # Id bị thiếu/lệch → dịch lại riêng từng segment
+        if missing and len(batch) > 1:
+            logger.warning(f"Thiếu bản dịch cho {len(missing)}/{len(batch)} segments, dịch lại từng segment")
+            
+            for i in missing:
+                success, retried = translate_batch_with_context(
+                    [batch[i]],
+                    (context_before + batch[:i])[-CONTEXT_SIZE:],
+                    (batch[i + 1:] + context_after)[:CONTEXT_SIZE],
+                    source_language, target_language
+                )
+                if success:
+                    translations[i] = retried[0]
+        
+        # Vẫn không dịch được → giữ text gốc
+        for i, segment in enumerate(batch):
+            if translations[i] is None:
+                translated_segment = segment.copy()
+                translated_segment['translation'] = segment['text']
+                translations[i] = translated_segment
         
         return True, translations
         
@@ -175,42 +497,52 @@ Chỉ trả về bản dịch, giữ nguyên định dạng số thứ tự."""
         return False, []
 
 
-def parse_batch_translation(translation_text, original_batch):
+def parse_batch_translation(translation_text, original_batch, keys):
     """
-    Parse kết quả dịch batch
+    Parse kết quả dịch batch dạng JSON {"translations": {id: bản dịch}}
     
     Args:
-        translation_text: Text đã dịch
+        translation_text: JSON trả về từ GPT
         original_batch: Batch gốc
+        keys: Id của từng segment trong batch (cùng thứ tự)
     
     Returns:
-        list: Danh sách segments đã dịch
+        tuple: (translations: list - None ở vị trí không có bản dịch, missing: list chỉ số bị thiếu)
     """
+    content = translation_text.strip()
+    
+    # Clean markdown nếu có
+    if content.startswith("```"):
+        content = content.strip("`")
+        if content.startswith("json"):
+            content = content[4:]
+    
     try:
-        translations = []
-        lines = translation_text.split('\n')
-        
-        for i, segment in enumerate(original_batch):
-            # Tìm dòng tương ứng
-            translation = None
-            for line in lines:
-                if line.strip().startswith(f"{i+1}."):
-                    translation = line.strip()[len(f"{i+1}."):].strip()
-                    break
-            
-            # Nếu không tìm thấy, dùng text gốc
-            if not translation:
-                translation = segment['text']
-            
-            translated_segment = segment.copy()
-            translated_segment['translation'] = translation
-            translations.append(translated_segment)
+        data = json.loads(content)
+    except ValueError as e:
+        logger.error(f"Lỗi parse translation JSON: {str(e)}")
+        data = {}
+    
+    mapping = data.get('translations', data) if isinstance(data, dict) else {}
+    if not isinstance(mapping, dict):
+        mapping = {}
+    
+    translations = []
+    missing = []
+    
+    for i, (key, segment) in enumerate(zip(keys, original_batch)):
+        translation = mapping.get(key)
         
-        return translations
+        if not isinstance(translation, str) or not translation.strip():
+            translations.append(None)
+            missing.append(i)
+            continue
         
-    except Exception as e:
-        logger.error(f"Lỗi parse translation: {str(e)}")
-        return []
+        translated_segment = segment.copy()
+        translated_segment['translation'] = translation.strip()
+        translations.append(translated_segment)
+    
+    return translations, missing
 
 
 def create_translation_prompt(text, source_language, target_language, context=None):
@@ -0,0 +1,185 @@
+"""
+Rate Limiter
+Giới hạn số request đồng thời và token/phút khi gọi OpenAI, kèm retry
+exponential backoff cho lỗi 429/5xx
+"""
+import logging
+import random
+import threading
+import time
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """
+    Ước lượng số token của text (≈ 4 byte UTF-8 / token)
+
+    Args:
+        text: Văn bản
+
+    Returns:
+        int: Số token ước lượng
+    """
+    if not text:
+        return 0
+    return len(text.encode('utf-8')) // 4 + 1
+
+
+class RateLimiter:
+    """
+    Semaphore cho số request đang chạy + token bucket cho token/phút
+
+    Dùng:
+        with limiter.limit(estimated_tokens) as slot:
+            response = ...
+            slot.used(response.usage.total_tokens)
+    """
+
+    def __init__(self, max_in_flight, tokens_per_minute=0):
+        self._semaphore = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._capacity = tokens_per_minute
+        self._available = float(tokens_per_minute)
+        self._rate = tokens_per_minute / 60.0
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._available = min(self._capacity, self._available + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _take_tokens(self, tokens):
+        """Chờ đến khi bucket đủ token (tokens/phút = 0 → không giới hạn)"""
+        if self._capacity <= 0:
+            return 0
+
+        tokens = min(tokens, self._capacity)
+
+        with self._cond:
+            while True:
+                self._refill()
+                if self._available >= tokens:
+                    self._available -= tokens
+                    return tokens
+                self._cond.wait((tokens - self._available) / self._rate)
+
+    def _give_back(self, tokens):
+        if self._capacity <= 0 or tokens <= 0:
+            return
+
+        with self._cond:
+            self._available = min(self._capacity, self._available + tokens)
+            self._cond.notify_all()
+
+    def limit(self, estimated_tokens):
+        """
+        Context manager giữ 1 slot request và estimated_tokens token
+
+        Args:
+            estimated_tokens: Token ước lượng (prompt + max_tokens)
+        """
+        return _RateLimitSlot(self, estimated_tokens)
+
+
+class _RateLimitSlot:
+    """
+    Slot của RateLimiter; used() điều chỉnh lại theo token thực tế, request lỗi
+    (429/5xx/timeout) trước khi có usage được trả lại toàn bộ token đã giữ
+    """
+
+    def __init__(self, limiter, estimated_tokens):
+        self._limiter = limiter
+        self._estimated = estimated_tokens
+        self._taken = 0
+        self._settled = False
+
+    def __enter__(self):
+        self._taken = self._limiter._take_tokens(self._estimated)
+        self._limiter._semaphore.acquire()
+        return self
+
+    def used(self, actual_tokens):
+        """Trả lại phần token ước lượng dư so với usage thực tế"""
+        if actual_tokens is None:
+            return
+
+        self._settled = True
+        if actual_tokens < self._taken:
+            self._limiter._give_back(self._taken - actual_tokens)
+            self._taken = actual_tokens
+
+    def __exit__(self, exc_type, exc, tb):
+        self._limiter._semaphore.release()
+
+        if exc_type is not None and not self._settled:
+            self._limiter._give_back(self._taken)
+            self._taken = 0
+
+        return False
+
+
+def _is_retryable(error):
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    """Lấy Retry-After (giây) từ response nếu server trả về"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(func, max_retries=None, base_delay=None, max_delay=None):
+    """
+    Gọi func(), retry với exponential backoff + jitter khi gặp lỗi 429/5xx/mạng
+
+    Args:
+        func: Hàm không tham số thực hiện request
+        max_retries: Số lần retry tối đa
+        base_delay: Delay ban đầu (giây)
+        max_delay: Delay tối đa (giây)
+
+    Returns:
+        Kết quả của func()
+
+    Raises:
+        Lỗi cuối cùng nếu hết số lần retry hoặc lỗi không retry được
+    """
+    max_retries = Config.TRANSLATION_MAX_RETRIES if max_retries is None else max_retries
+    base_delay = Config.TRANSLATION_BACKOFF_BASE if base_delay is None else base_delay
+    max_delay = Config.TRANSLATION_BACKOFF_MAX if max_delay is None else max_delay
+
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+
+            delay = _retry_after(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * (2 ** attempt))
+                delay = delay / 2 + random.uniform(0, delay / 2)
+
+            attempt += 1
+            logger.warning(f"⚠️ OpenAI lỗi tạm thời ({str(e)[:100]}), retry {attempt}/{max_retries} sau {delay:.1f}s")
+            time.sleep(delay)
+
+
+# Limiter dùng chung cho mọi request dịch trong process
+translation_limiter = RateLimiter(
+    max_in_flight=Config.TRANSLATION_MAX_CONCURRENCY,
+    tokens_per_minute=Config.TRANSLATION_TOKENS_PER_MINUTE
+)
@@ -0,0 +1,239 @@
+"""
+Translation Memory
+Cache bản dịch trên đĩa (SQLite) theo (text nguồn, ngôn ngữ nguồn, ngôn ngữ đích, model)
+với LRU eviction. Segment trùng khớp chính xác không cần gọi GPT.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Giới hạn số biến trong một câu SQL
+_LOOKUP_CHUNK = 500
+
+
+def normalize_text(text):
+    """Chuẩn hóa khoảng trắng để so khớp"""
+    return ' '.join((text or '').split())
+
+
+class TranslationMemory:
+    """
+    Kho bản dịch dùng chung giữa các video/worker (SQLite WAL, an toàn đa process)
+    """
+
+    def __init__(self, path, max_entries, enabled=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        self._inserts_since_evict = 0
+
+        # Bộ đếm trong process hiện tại
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_memory (
+                    key TEXT PRIMARY KEY,
+                    source_text TEXT NOT NULL,
+                    source_lang TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tm_last_used ON translation_memory(last_used)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_memory_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang, model):
+        raw = '\x1f'.join([normalize_text(text), source_lang or '', target_lang or '', model or ''])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _bump_stats(self, conn, hits, misses):
+        for name, value in (('hits', hits), ('misses', misses)):
+            if value:
+                conn.execute(
+                    "INSERT INTO translation_memory_stats(name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (name, value)
+                )
+
+    def lookup(self, texts, source_lang, target_lang, model=None):
+        """
+        Tra cứu bản dịch cho nhiều text
+
+        Args:
+            texts: List text nguồn
+            source_lang: Ngôn ngữ nguồn
+            target_lang: Ngôn ngữ đích
+            model: Model dịch (mặc định Config.OPENAI_MODEL)
+
+        Returns:
+            dict: {text: translation} cho các text có trong cache
+        """
+        if not self.enabled or not texts:
+            return {}
+
+        model = model or Config.OPENAI_MODEL
+        keys = {}
+        for text in texts:
+            keys.setdefault(self.make_key(text, source_lang, target_lang, model), []).append(text)
+
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                key_list = list(keys.keys())
+
+                for i in range(0, len(key_list), _LOOKUP_CHUNK):
+                    chunk = key_list[i:i + _LOOKUP_CHUNK]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, translation FROM translation_memory WHERE key IN ({placeholders})",
+                        chunk
+                    ).fetchall()
+
+                    for key, translation in rows:
+                        for text in keys[key]:
+                            found[text] = translation
+
+                    if rows:
+                        conn.executemany(
+                            "UPDATE translation_memory SET hits = hits + 1, last_used = ? WHERE key = ?",
+                            [(time.time(), key) for key, _ in rows]
+                        )
+
+                hits = sum(1 for text in texts if text in found)
+                misses = len(texts) - hits
+                self._bump_stats(conn, hits, misses)
+                conn.commit()
+
+                self.hits += hits
+                self.misses += misses
+
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory lookup lỗi: {str(e)}")
+            return {}
+
+        return found
+
+    def store(self, pairs, source_lang, target_lang, model=None):
+        """
+        Lưu bản dịch mới
+
+        Args:
+            pairs: List (source_text, translation)
+            source_lang: Ngôn ngữ nguồn
+            target_lang: Ngôn ngữ đích
+            model: Model dịch (mặc định Config.OPENAI_MODEL)
+        """
+        if not self.enabled or not pairs:
+            return
+
+        model = model or Config.OPENAI_MODEL
+        now = time.time()
+        rows = [
+            (self.make_key(text, source_lang, target_lang, model), normalize_text(text),
+             source_lang, target_lang, model, translation, now, now)
+            for text, translation in pairs
+            if text and translation
+        ]
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO translation_memory "
+                    "(key, source_text, source_lang, target_lang, model, translation, hits, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    rows
+                )
+                conn.commit()
+
+                self._inserts_since_evict += len(rows)
+                if self._inserts_since_evict >= 1000:
+                    self._evict(conn)
+                    self._inserts_since_evict = 0
+
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory store lỗi: {str(e)}")
+
+    def _evict(self, conn):
+        """Xóa các bản dịch lâu không dùng nhất khi vượt max_entries (LRU)"""
+        total = conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()[0]
+        excess = total - self.max_entries
+
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM translation_memory WHERE key IN ("
+                "SELECT key FROM translation_memory ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            conn.commit()
+            logger.info(f"Translation memory: evicted {excess} entries")
+
+    def get_stats(self):
+        """
+        Thống kê hit/miss
+
+        Returns:
+            dict: Bộ đếm của process hiện tại và tích lũy (mọi process)
+        """
+        stats = {
+            'enabled': self.enabled,
+            'process': {'hits': self.hits, 'misses': self.misses},
+            'total': {'hits': 0, 'misses': 0},
+            'entries': 0
+        }
+
+        if not self.enabled:
+            return stats
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                for name, value in conn.execute("SELECT name, value FROM translation_memory_stats"):
+                    stats['total'][name] = value
+                stats['entries'] = conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory stats lỗi: {str(e)}")
+
+        lookups = stats['total']['hits'] + stats['total']['misses']
+        stats['hit_rate'] = round(stats['total']['hits'] / lookups, 4) if lookups else 0.0
+
+        return stats
+
+
+# Instance dùng chung
+translation_memory = TranslationMemory(
+    path=Config.TRANSLATION_MEMORY_PATH,
+    max_entries=Config.TRANSLATION_MEMORY_MAX_ENTRIES,
+    enabled=Config.TRANSLATION_MEMORY_ENABLED
+)
@@ -0,0 +1,133 @@
+"""
+Artifact Reuse
+Video trùng nội dung (cùng SHA-256) với một video đã xử lý bằng cùng phiên bản
+pipeline sẽ được sao chép phụ đề, từ vựng, quiz thay vì chạy lại Whisper/GPT.
+"""
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from database.models import Video, Subtitle, Vocabulary, Quiz
+from database.db_config import db
+from utils.constants import VIDEO_STATUS_COMPLETED, PIPELINE_VERSION
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def find_reusable_video(video):
+    """
+    Tìm video đã xử lý xong có cùng content_hash và phiên bản pipeline
+
+    Args:
+        video: Video cần xử lý
+
+    Returns:
+        Video or None
+    """
+    if not video.content_hash:
+        return None
+
+    return Video.query.filter(
+        Video.content_hash == video.content_hash,
+        Video.pipeline_version == PIPELINE_VERSION,
+        Video.status == VIDEO_STATUS_COMPLETED,
+        Video.video_id != video.video_id
+    ).order_by(Video.processed_date.desc()).first()
+
+
+def _copy_subtitle_file(subtitle, video_id):
+    """Sao chép file phụ đề sang tên của video mới (tạo lại từ content nếu file gốc đã mất)"""
+    source_prefix = f"video_{subtitle.video_id}_"
+    filename = os.path.basename(subtitle.file_path or '') or f"{source_prefix}bilingual.srt"
+    if filename.startswith(source_prefix):
+        filename = filename[len(source_prefix):]
+
+    new_path = os.path.join(Config.SUBTITLES_FOLDER, f"video_{video_id}_{filename}")
+
+    if subtitle.file_path and os.path.exists(subtitle.file_path):
+        shutil.copyfile(subtitle.file_path, new_path)
+        return new_path
+
+    from modules.subtitle import create_bilingual_subtitle
+
+    success, file_path, _ = create_bilingual_subtitle(
+        json.loads(subtitle.content),
+        new_path,
+        subtitle_format=subtitle.subtitle_format or 'srt'
+    )
+    return file_path if success else None
+
+
+def clone_processed_video(video):
+    """
+    Sao chép Subtitle, Vocabulary, Quiz từ video trùng nội dung đã xử lý và đánh dấu
+    video là completed
+
+    Args:
+        video: Video cần xử lý
+
+    Returns:
+        tuple: (cloned: bool, source_video_id: int or None, message: str)
+    """
+    source = find_reusable_video(video)
+
+    if source is None:
+        return False, None, "Không có video trùng nội dung đã xử lý"
+
+    try:
+        # Xóa kết quả dở dang (nếu có) trước khi sao chép
+        Subtitle.query.filter_by(video_id=video.video_id).delete()
+        Vocabulary.query.filter_by(video_id=video.video_id).delete()
+        Quiz.query.filter_by(video_id=video.video_id).delete()
+
+        for subtitle in source.subtitles:
+            db.session.add(Subtitle(
+                video_id=video.video_id,
+                language=subtitle.language,
+                content=subtitle.content,
+                file_path=_copy_subtitle_file(subtitle, video.video_id),
+                subtitle_format=subtitle.subtitle_format
+            ))
+
+        for vocab in source.vocabularies:
+            db.session.add(Vocabulary(
+                video_id=video.video_id,
+                word=vocab.word,
+                translation=vocab.translation,
+                pronunciation=vocab.pronunciation,
+                example_sentence=vocab.example_sentence,
+                example_translation=vocab.example_translation,
+                language=vocab.language,
+                part_of_speech=vocab.part_of_speech,
+                difficulty_level=vocab.difficulty_level
+            ))
+
+        for quiz in source.quizzes:
+            db.session.add(Quiz(
+                video_id=video.video_id,
+                question=quiz.question,
+                correct_answer=quiz.correct_answer,
+                wrong_answer_1=quiz.wrong_answer_1,
+                wrong_answer_2=quiz.wrong_answer_2,
+                wrong_answer_3=quiz.wrong_answer_3,
+                explanation=quiz.explanation,
+                difficulty_level=quiz.difficulty_level
+            ))
+
+        video.duration = video.duration or source.duration
+        video.language_detected = source.language_detected
+        video.pipeline_version = source.pipeline_version
+        video.status = VIDEO_STATUS_COMPLETED
+        video.processed_date = datetime.utcnow()
+        db.session.commit()
+
+        logger.info(f"♻️ Video {video.video_id} dùng lại kết quả của video {source.video_id} (cùng nội dung)")
+
+        return True, source.video_id, "Đã dùng lại kết quả của video trùng nội dung"
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi khi sao chép kết quả từ video {source.video_id}: {str(e)}")
+        return False, None, f"Lỗi khi sao chép kết quả: {str(e)}"
@@ -4,19 +4,27 @@ Trích xuất audio từ video
 """
 import logging
 import os
+import tempfile
+import numpy as np
 from moviepy import VideoFileClip
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 
-def extract_audio_from_video(video_path, output_path=None):
+# Định dạng audio cho Whisper: PCM 16-bit mono 16kHz
+SAMPLE_RATE = 16000
+AUDIO_OUTPUT_ARGS = {'acodec': 'pcm_s16le', 'ac': 1, 'ar': SAMPLE_RATE}
+
+
+def extract_audio_from_video(video_path, output_path=None, backend=None):
     """
     Trích xuất audio từ video
     
     Args:
         video_path: Đường dẫn video
         output_path: Đường dẫn lưu audio (optional)
+        backend: 'ffmpeg' hoặc 'moviepy' (mặc định Config.AUDIO_EXTRACT_BACKEND)
     
     Returns:
         tuple: (success: bool, audio_path: str, message: str)
@@ -38,28 +46,15 @@ def extract_audio_from_video(video_path, output_path=None):
         # Tạo thư mục nếu chưa có
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Load video
         logger.info(f"Đang trích xuất audio từ: {video_path}")
-        video = VideoFileClip(video_path)
-        
-        # Kiểm tra có audio không
-        if video.audio is None:
-            video.close()
-            return False, None, "Video không có audio"
         
-        # Trích xuất audio
-        audio = video.audio
-        audio.write_audiofile(
-            output_path,
-            codec='pcm_s16le',  # WAV format
-            fps=16000,  # Sample rate 16kHz cho Whisper
-            nbytes=2,
-            buffersize=2000,
-            logger=None  # Tắt logging của moviepy
-        )
+        if (backend or Config.AUDIO_EXTRACT_BACKEND) == 'moviepy':
+            success, msg = _extract_audio_moviepy(video_path, output_path)
+        else:
+            success, msg = _extract_audio_ffmpeg(video_path, output_path)
         
-        # Đóng video
-        video.close()
+        if not success:
+            return False, None, msg
         
         logger.info(f"Audio đã được trích xuất: {output_path}")
         
@@ -70,7 +65,7 @@ def extract_audio_from_video(video_path, output_path=None):
         return False, None, f"Lỗi khi trích xuất audio: {str(e)}"
 
 
-def extract_audio_segment(video_path, start_time, end_time, output_path=None):
+def extract_audio_segment(video_path, start_time, end_time, output_path=None, backend=None):
     """
     Trích xuất một đoạn audio từ video
     
@@ -79,6 +74,7 @@ def extract_audio_segment(video_path, start_time, end_time, output_path=None):
         start_time: Thời gian bắt đầu (giây)
         end_time: Thời gian kết thúc (giây)
         output_path: Đường dẫn lưu audio (optional)
+        backend: 'ffmpeg' hoặc 'moviepy' (mặc định Config.AUDIO_EXTRACT_BACKEND)
     
     Returns:
         tuple: (success: bool, audio_path: str, message: str)
@@ -100,27 +96,13 @@ def extract_audio_segment(video_path, start_time, end_time, output_path=None):
         # Tạo thư mục nếu chưa có
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Load video và cắt segment
-        video = VideoFileClip(video_path).subclip(start_time, end_time)
+        if (backend or Config.AUDIO_EXTRACT_BACKEND) == 'moviepy':
+            success, msg = _extract_audio_moviepy(video_path, output_path, start_time, end_time)
+        else:
+            success, msg = _extract_audio_ffmpeg(video_path, output_path, start_time, end_time)
         
-        # Kiểm tra có audio không
-        if video.audio is None:
-            video.close()
-            return False, None, "Video không có audio"
-        
-        # Trích xuất audio
-        audio = video.audio
-        audio.write_audiofile(
-            output_path,
-            codec='pcm_s16le',
-            fps=16000,
-            nbytes=2,
-            buffersize=2000,
-            logger=None
-        )
-        
-        # Đóng video
-        video.close()
+        if not success:
+            return False, None, msg
         
         logger.info(f"Audio segment đã được trích xuất: {output_path}")
         
@@ -131,6 +113,200 @@ def extract_audio_segment(video_path, start_time, end_time, output_path=None):
         return False, None, f"Lỗi: {str(e)}"
 
 
+def _ffmpeg_input(video_path, start_time=None, end_time=None):
+    """Tạo input ffmpeg (seek trước khi decode nếu chỉ lấy một đoạn)"""
+    import ffmpeg
+    
+    options = {}
+    if start_time is not None:
+        options['ss'] = start_time
+    if end_time is not None:
+        options['t'] = end_time - (start_time or 0)
+    
+    return ffmpeg.input(video_path, **options)
+
+
+def _ffmpeg_error_message(stderr):
+    """Chuyển stderr của ffmpeg thành thông báo lỗi"""
+    stderr = (stderr or b'').decode('utf-8', errors='ignore').strip()
+    
+    if 'does not contain any stream' in stderr or 'matches no streams' in stderr:
+        return "Video không có audio"
+    
+    return f"Lỗi ffmpeg: {stderr.splitlines()[-1] if stderr else 'không rõ'}"
+
+
+def _extract_audio_ffmpeg(video_path, output_path, start_time=None, end_time=None):
+    """
+    Trích xuất audio bằng ffmpeg (ghi thẳng WAV PCM 16kHz mono, không qua Python)
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    import ffmpeg
+    
+    try:
+        (
+            _ffmpeg_input(video_path, start_time, end_time)
+            .output(output_path, vn=None, **AUDIO_OUTPUT_ARGS)
+            .global_args('-nostdin', '-hide_banner', '-loglevel', 'error')
+            .overwrite_output()
+            .run(cmd=Config.FFMPEG_BINARY, capture_stdout=True, capture_stderr=True)
+        )
+        return True, "Trích xuất audio thành công"
+        
+    except ffmpeg.Error as e:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False, _ffmpeg_error_message(e.stderr)
+
+
+def _extract_audio_moviepy(video_path, output_path, start_time=None, end_time=None):
+    """
+    Trích xuất audio bằng moviepy
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    # Load video
+    video = VideoFileClip(video_path)
+    if start_time is not None or end_time is not None:
+        video = video.subclipped(start_time or 0, end_time)
+    
+    # Kiểm tra có audio không
+    if video.audio is None:
+        video.close()
+        return False, "Video không có audio"
+    
+    # Trích xuất audio
+    audio = video.audio
+    audio.write_audiofile(
+        output_path,
+        codec='pcm_s16le',  # WAV format
+        fps=SAMPLE_RATE,  # Sample rate 16kHz cho Whisper
+        nbytes=2,
+        buffersize=2000,
+        ffmpeg_params=['-ac', '1'],
+        logger=None  # Tắt logging của moviepy
+    )
+    
+    # Đóng video
+    video.close()
+    
+    return True, "Trích xuất audio thành công"
+
+
+def open_audio_pipe(video_path, start_time=None, end_time=None):
+    """
+    Chạy ffmpeg decode audio ra stdout (PCM s16le 16kHz mono, không ghi file)
+    
+    Args:
+        video_path: Đường dẫn video
+        start_time: Thời gian bắt đầu (giây, optional)
+        end_time: Thời gian kết thúc (giây, optional)
+    
+    Returns:
+        tuple: (success: bool, process: subprocess.Popen, message: str)
+            Đọc process.stdout đến hết rồi process.wait(); returncode != 0 là lỗi
+            (chi tiết trong process.stderr)
+    """
+    try:
+        if not os.path.exists(video_path):
+            return False, None, "File video không tồn tại"
+        
+        process = (
+            _ffmpeg_input(video_path, start_time, end_time)
+            .output('pipe:', format='s16le', vn=None, **AUDIO_OUTPUT_ARGS)
+            .global_args('-nostdin', '-hide_banner', '-loglevel', 'error')
+            .run_async(cmd=Config.FFMPEG_BINARY, pipe_stdout=True, pipe_stderr=True)
+        )
+        
+        return True, process, "Đã mở audio pipe"
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi mở audio pipe: {str(e)}")
+        return False, None, f"Lỗi khi mở audio pipe: {str(e)}"
+
+
+def load_audio_array(video_path, start_time=None, end_time=None):
+    """
+    Decode audio của video thành mảng float32 [-1, 1] (16kHz mono) qua ffmpeg pipe,
+    không ghi WAV trung gian. Audio dài hơn Config.AUDIO_MEMMAP_MIN_SECONDS được ghi
+    ra file tạm và trả về dạng memmap để không giữ toàn bộ trong RAM.
+    
+    Args:
+        video_path: Đường dẫn video
+        start_time: Thời gian bắt đầu (giây, optional)
+        end_time: Thời gian kết thúc (giây, optional)
+    
+    Returns:
+        tuple: (success: bool, samples: np.ndarray, message: str)
+    """
+    success, process, msg = open_audio_pipe(video_path, start_time, end_time)
+    
+    if not success:
+        return False, None, msg
+    
+    memmap_bytes = int(Config.AUDIO_MEMMAP_MIN_SECONDS * SAMPLE_RATE * 2)
+    buffer = bytearray()
+    spill = None
+    
+    try:
+        while True:
+            chunk = process.stdout.read(1 << 20)
+            if not chunk:
+                break
+            
+            if spill is None:
+                buffer.extend(chunk)
+                if len(buffer) >= memmap_bytes:
+                    # Audio quá dài → chuyển sang file tạm (float32), đọc lại bằng memmap
+                    spill = tempfile.TemporaryFile(dir=Config.AUDIO_FOLDER, suffix='.f32')
+                    usable = len(buffer) - len(buffer) % 2
+                    _pcm_to_float32(buffer[:usable]).tofile(spill)
+                    del buffer[:usable]
+            else:
+                buffer.extend(chunk)
+                usable = len(buffer) - len(buffer) % 2
+                _pcm_to_float32(buffer[:usable]).tofile(spill)
+                del buffer[:usable]
+        
+        process.wait()
+        
+        if process.returncode != 0:
+            return False, None, _ffmpeg_error_message(process.stderr.read())
+        
+        if spill is None:
+            samples = _pcm_to_float32(buffer[:len(buffer) - len(buffer) % 2])
+        else:
+            spill.flush()
+            samples = np.memmap(spill, dtype=np.float32, mode='r')
+        
+        if len(samples) == 0:
+            return False, None, "Video không có audio"
+        
+        logger.info(
+            f"Audio đã được decode vào bộ nhớ: {len(samples) / SAMPLE_RATE:.0f}s"
+            f"{' (memmap)' if spill is not None else ''}"
+        )
+        
+        return True, samples, "Trích xuất audio thành công"
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi decode audio: {str(e)}")
+        return False, None, f"Lỗi khi trích xuất audio: {str(e)}"
+        
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _pcm_to_float32(raw):
+    """PCM s16le → float32 [-1, 1]"""
+    return np.frombuffer(bytes(raw), dtype=np.int16).astype(np.float32) / 32768.0
+
+
 def get_audio_info(audio_path):
     """
     Lấy thông tin audio
@@ -0,0 +1,96 @@
+"""
+Pipeline Checkpoint
+Lưu kết quả từng stage của pipeline xử lý video để retry có thể tiếp tục
+từ stage chưa hoàn thành đầu tiên (không phải chạy lại Whisper)
+"""
+import json
+import logging
+from database.models import ProcessingCheckpoint
+from database.db_config import db
+
+logger = logging.getLogger(__name__)
+
+
+def load_checkpoints(video_id):
+    """
+    Lấy toàn bộ checkpoint của video
+
+    Args:
+        video_id: ID của video
+
+    Returns:
+        dict: {stage: data}
+    """
+    try:
+        rows = ProcessingCheckpoint.query.filter_by(video_id=video_id).all()
+
+        checkpoints = {}
+        for row in rows:
+            try:
+                checkpoints[row.stage] = json.loads(row.data) if row.data else {}
+            except ValueError:
+                logger.warning(f"Checkpoint hỏng: video {video_id}, stage {row.stage}")
+
+        return checkpoints
+
+    except Exception as e:
+        logger.error(f"Lỗi khi đọc checkpoint: {str(e)}")
+        return {}
+
+
+def save_checkpoint(video_id, stage, data):
+    """
+    Lưu (hoặc ghi đè) checkpoint của một stage
+
+    Args:
+        video_id: ID của video
+        stage: Tên stage
+        data: Dữ liệu JSON-serializable
+
+    Returns:
+        bool: True nếu thành công
+    """
+    try:
+        payload = json.dumps(data, ensure_ascii=False)
+
+        checkpoint = ProcessingCheckpoint.query.filter_by(
+            video_id=video_id,
+            stage=stage
+        ).first()
+
+        if checkpoint:
+            checkpoint.data = payload
+        else:
+            checkpoint = ProcessingCheckpoint(
+                video_id=video_id,
+                stage=stage,
+                data=payload
+            )
+            db.session.add(checkpoint)
+
+        db.session.commit()
+
+        logger.info(f"💾 Checkpoint saved: video {video_id}, stage {stage}")
+
+        return True
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi khi lưu checkpoint {stage}: {str(e)}")
+        return False
+
+
+def clear_checkpoints(video_id):
+    """
+    Xóa toàn bộ checkpoint của video (sau khi xử lý hoàn tất)
+
+    Args:
+        video_id: ID của video
+    """
+    try:
+        ProcessingCheckpoint.query.filter_by(video_id=video_id).delete()
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Không xóa được checkpoint của video {video_id}: {str(e)}")
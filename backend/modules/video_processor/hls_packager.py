@@ -0,0 +1,229 @@
+"""
+HLS Packager
+Đóng gói video thành HLS (playlist + segment .ts) để phát qua CDN/cache thay vì
+stream nguyên file gốc qua Flask worker.
+
+Video H.264 được remux (-c copy, không encode lại); codec khác mới encode sang
+H.264/AAC. Thư mục HLS đặt theo content_hash nên video trùng nội dung dùng chung.
+Phụ đề song ngữ được thêm vào master playlist dưới dạng rendition WebVTT.
+"""
+import logging
+import os
+import shutil
+from modules.video_processor.video_handler import probe_video
+from modules.video_processor.audio_extractor import _ffmpeg_error_message
+from modules.subtitle import create_bilingual_subtitle
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYLIST = 'master.m3u8'
+MEDIA_PLAYLIST = 'index.m3u8'
+SEGMENT_PATTERN = 'segment_%05d.ts'
+FIRST_SEGMENT = SEGMENT_PATTERN % 0
+SUBTITLE_PLAYLIST = 'subtitles_vi.m3u8'
+SUBTITLE_FILE = 'subtitles_vi.vtt'
+
+# Codec giữ nguyên được trong MPEG-TS (remux, không encode lại)
+COPY_VIDEO_CODECS = {'h264'}
+COPY_AUDIO_CODECS = {'aac', 'mp3'}
+
+# Đồng hồ MPEG-TS 90kHz; PTS mặc định của ffmpeg (1.4s) chỉ dùng khi không probe được segment
+MPEGTS_CLOCK = 90000
+DEFAULT_MPEGTS_START_PTS = 126000
+
+HLS_MIME_TYPES = {
+    'm3u8': 'application/vnd.apple.mpegurl',
+    'ts': 'video/mp2t',
+    'vtt': 'text/vtt'
+}
+
+
+def get_hls_folder(video):
+    """Thư mục HLS của video (theo content_hash, fallback theo video_id)"""
+    key = video.content_hash or f"video_{video.video_id}"
+    return os.path.join(Config.HLS_FOLDER, key)
+
+
+def get_hls_playlist(video):
+    """
+    Đường dẫn master playlist nếu video đã được đóng gói
+
+    Returns:
+        str or None
+    """
+    playlist = os.path.join(get_hls_folder(video), MASTER_PLAYLIST)
+    return playlist if os.path.exists(playlist) else None
+
+
+def _codec_args(info):
+    """Chọn copy hay encode cho từng stream"""
+    args = {}
+
+    if info.video_codec in COPY_VIDEO_CODECS:
+        args['vcodec'] = 'copy'
+    else:
+        args.update(vcodec='libx264', preset='veryfast', crf=23, pix_fmt='yuv420p')
+
+    if not info.has_audio:
+        args['an'] = None
+    elif info.audio_codec in COPY_AUDIO_CODECS:
+        args['acodec'] = 'copy'
+    else:
+        args.update(acodec='aac', audio_bitrate='128k')
+
+    return args
+
+
+def _first_segment_start_pts(output_dir):
+    """
+    PTS bắt đầu (90kHz) của segment đầu tiên, đọc bằng ffprobe (format.start_time)
+
+    Returns:
+        int
+    """
+    import ffmpeg
+
+    try:
+        probe = ffmpeg.probe(os.path.join(output_dir, FIRST_SEGMENT), cmd=Config.FFPROBE_BINARY)
+        return int(round(float(probe['format']['start_time']) * MPEGTS_CLOCK))
+    except Exception as e:
+        logger.warning(f"Không đọc được start_time của segment HLS, dùng PTS mặc định: {str(e)}")
+        return DEFAULT_MPEGTS_START_PTS
+
+
+def _write_subtitle_rendition(output_dir, segments, duration):
+    """Ghi file WebVTT song ngữ và playlist một segment cho nó"""
+    vtt_path = os.path.join(output_dir, SUBTITLE_FILE)
+
+    success, _, msg = create_bilingual_subtitle(segments, vtt_path, subtitle_format='vtt')
+    if not success:
+        return False, msg
+
+    with open(vtt_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # X-TIMESTAMP-MAP để player khớp thời gian phụ đề với PTS thật của segment .ts
+    content = content.replace(
+        "WEBVTT\n",
+        f"WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:{_first_segment_start_pts(output_dir)},LOCAL:00:00:00.000\n",
+        1
+    )
+    with open(vtt_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    target_duration = int(duration) + 1
+    with open(os.path.join(output_dir, SUBTITLE_PLAYLIST), 'w', encoding='utf-8') as f:
+        f.write(
+            "#EXTM3U\n"
+            f"#EXT-X-TARGETDURATION:{target_duration}\n"
+            "#EXT-X-VERSION:3\n"
+            "#EXT-X-MEDIA-SEQUENCE:0\n"
+            "#EXT-X-PLAYLIST-TYPE:VOD\n"
+            f"#EXTINF:{duration:.3f},\n"
+            f"{SUBTITLE_FILE}\n"
+            "#EXT-X-ENDLIST\n"
+        )
+
+    return True, "OK"
+
+
+def _write_master_playlist(output_dir, info, with_subtitles):
+    """Master playlist trỏ tới media playlist (và rendition phụ đề nếu có)"""
+    segments_size = sum(
+        os.path.getsize(os.path.join(output_dir, name))
+        for name in os.listdir(output_dir) if name.endswith('.ts')
+    )
+    bandwidth = int(segments_size * 8 / info.duration) if info.duration else 0
+
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    stream_inf = f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}"
+
+    if info.width and info.height:
+        stream_inf += f",RESOLUTION={info.width}x{info.height}"
+
+    if with_subtitles:
+        lines.append(
+            '#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="Song ngữ",LANGUAGE="vi",'
+            f'DEFAULT=YES,AUTOSELECT=YES,URI="{SUBTITLE_PLAYLIST}"'
+        )
+        stream_inf += ',SUBTITLES="subs"'
+
+    lines += [stream_inf, MEDIA_PLAYLIST]
+
+    with open(os.path.join(output_dir, MASTER_PLAYLIST), 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def package_hls(video_path, output_dir, subtitle_segments=None):
+    """
+    Đóng gói video thành HLS VOD
+
+    Ghi vào thư mục tạm rồi đổi tên, nên output_dir chỉ tồn tại khi đã đóng gói xong.
+
+    Args:
+        video_path: Đường dẫn video gốc
+        output_dir: Thư mục HLS
+        subtitle_segments: Segments đã dịch (optional) → rendition WebVTT
+
+    Returns:
+        tuple: (success: bool, playlist_path: str, message: str)
+    """
+    import ffmpeg
+
+    playlist_path = os.path.join(output_dir, MASTER_PLAYLIST)
+    if os.path.exists(playlist_path):
+        return True, playlist_path, "HLS đã tồn tại"
+
+    info = probe_video(video_path)
+    if info is None:
+        return False, None, "Không thể đọc thông tin video"
+
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    try:
+        codec_args = _codec_args(info)
+        logger.info(f"Đóng gói HLS ({codec_args.get('vcodec')}/{codec_args.get('acodec', 'none')}): {video_path}")
+
+        (
+            ffmpeg
+            .input(video_path)
+            .output(
+                os.path.join(tmp_dir, MEDIA_PLAYLIST),
+                format='hls',
+                hls_time=Config.HLS_SEGMENT_SECONDS,
+                hls_playlist_type='vod',
+                hls_segment_filename=os.path.join(tmp_dir, SEGMENT_PATTERN),
+                **codec_args
+            )
+            .global_args('-nostdin', '-hide_banner', '-loglevel', 'error')
+            .overwrite_output()
+            .run(cmd=Config.FFMPEG_BINARY, capture_stdout=True, capture_stderr=True)
+        )
+
+        with_subtitles = False
+        if subtitle_segments and info.duration:
+            with_subtitles, msg = _write_subtitle_rendition(tmp_dir, subtitle_segments, info.duration)
+            if not with_subtitles:
+                logger.warning(f"Không tạo được phụ đề WebVTT cho HLS: {msg}")
+
+        _write_master_playlist(tmp_dir, info, with_subtitles)
+
+        # Video trùng nội dung có thể vừa được đóng gói song song
+        if os.path.exists(playlist_path):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, output_dir)
+
+        return True, playlist_path, "Đóng gói HLS thành công"
+
+    except ffmpeg.Error as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False, None, _ffmpeg_error_message(e.stderr)
+
+    except Exception as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.error(f"Lỗi khi đóng gói HLS: {str(e)}")
+        return False, None, f"Lỗi khi đóng gói HLS: {str(e)}"
@@ -0,0 +1,595 @@
+"""
+Job Queue
+Hàng đợi xử lý video bền vững (lưu trong bảng processing_jobs) với worker pool giới hạn
+
+- FIFO kết hợp công bằng theo user: user đang có ít job chạy hơn được ưu tiên
+- Giới hạn độ sâu hàng đợi (toàn hệ thống và theo user)
+- Khôi phục job bị kẹt ở trạng thái 'processing' sau khi restart (dựa vào heartbeat)
+- Worker pool dạng thread hoặc process (JOB_WORKER_MODE); worker process được khởi động
+  và load Whisper ngay khi start, is_ready() cho readiness probe
+- Process pool bị hỏng (worker bị kill, vd. OOM) được tạo lại và job đang chạy được đưa
+  lại vào hàng đợi (chạy tiếp từ checkpoint của stage đang dở)
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database.models import ProcessingJob, Video
+from database.db_config import db
+from utils.constants import (
+    JOB_STATUS_QUEUED, JOB_STATUS_PROCESSING, JOB_STATUS_COMPLETED,
+    JOB_STATUS_FAILED, JOB_ACTIVE_STATUSES,
+    VIDEO_STATUS_PENDING, VIDEO_STATUS_FAILED
+)
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Flask app của worker process (chỉ dùng khi JOB_WORKER_MODE = 'process')
+_worker_app = None
+
+
+def _init_worker_process(config_name):
+    """
+    Khởi tạo Flask app trong worker process (không khởi động hàng đợi con)
+
+    Args:
+        config_name: Tên cấu hình của app cha
+    """
+    global _worker_app
+
+    from app import create_app
+    from modules.speech_to_text.transcription_service import init_transcription_service
+
+    _worker_app = create_app(config_name, start_job_queue=False)
+
+    # Load Whisper trước khi nhận job đầu tiên
+    init_transcription_service(wait=True)
+
+
+def _worker_process_ready():
+    """
+    Probe chạy trong worker process (sau initializer)
+
+    Returns:
+        tuple: (pid, Whisper đã load xong hay chưa)
+    """
+    from modules.speech_to_text.transcription_service import transcription_service
+    return os.getpid(), transcription_service.is_ready()
+
+
+def _run_job_in_worker_process(video_id):
+    """
+    Chạy pipeline xử lý video trong worker process
+
+    Args:
+        video_id: ID của video
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    from modules.video_processor.process_video import process_video_complete
+    return process_video_complete(video_id, _worker_app)
+
+
+class VideoJobQueue:
+    """
+    Hàng đợi xử lý video với worker pool giới hạn
+
+    Một dispatcher thread đọc job 'queued' từ database, claim nguyên tử
+    (UPDATE ... WHERE status = 'queued') rồi giao cho executor.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = None
+        self._dispatcher = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._running = {}  # job_id -> (Future, executor đã nhận job)
+        self._lock = threading.Lock()
+        self._ready_workers = set()  # pid của worker process đã load Whisper
+        self._workers_ready = threading.Event()
+
+        self.worker_count = Config.JOB_WORKER_COUNT
+        self.worker_mode = Config.JOB_WORKER_MODE
+        self.max_depth = Config.JOB_QUEUE_MAX_DEPTH
+        self.max_per_user = Config.JOB_QUEUE_MAX_PER_USER
+        self.poll_interval = Config.JOB_POLL_INTERVAL
+        self.stale_timeout = Config.JOB_STALE_TIMEOUT
+        self.max_attempts = Config.JOB_MAX_ATTEMPTS
+
+    def init_app(self, app):
+        """
+        Gắn app và khởi động worker pool
+
+        Args:
+            app: Flask app instance
+        """
+        self.app = app
+        self.worker_count = max(1, app.config.get('JOB_WORKER_COUNT', self.worker_count))
+        self.worker_mode = app.config.get('JOB_WORKER_MODE', self.worker_mode)
+        self.max_depth = app.config.get('JOB_QUEUE_MAX_DEPTH', self.max_depth)
+        self.max_per_user = app.config.get('JOB_QUEUE_MAX_PER_USER', self.max_per_user)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', self.poll_interval)
+        self.stale_timeout = app.config.get('JOB_STALE_TIMEOUT', self.stale_timeout)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts)
+
+        self.start()
+
+    def start(self):
+        """Khởi động executor và dispatcher thread"""
+        if self._dispatcher is not None:
+            return
+
+        self._executor = self._create_executor()
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop,
+            name='video-job-dispatcher',
+            daemon=True
+        )
+        self._dispatcher.start()
+
+        if self.worker_mode == 'process':
+            self._start_warm_up()
+
+        logger.info(
+            f"Job queue started: {self.worker_count} {self.worker_mode} workers "
+            f"(max depth {self.max_depth}, worker_id {self.worker_id})"
+        )
+
+    def _create_executor(self):
+        """Tạo worker pool theo worker_mode"""
+        if self.worker_mode == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker_process,
+                initargs=(self.app.config.get('CONFIG_NAME', 'default'),)
+            )
+
+        return ThreadPoolExecutor(
+            max_workers=self.worker_count,
+            thread_name_prefix='video-worker'
+        )
+
+    def _start_warm_up(self):
+        """ProcessPoolExecutor chỉ spawn worker khi có job → khởi động và warm-up ngay"""
+        self._workers_ready.clear()
+        self._ready_workers = set()
+
+        threading.Thread(
+            target=self._warm_up_workers,
+            args=(self._executor, self._ready_workers),
+            name='video-worker-warmup',
+            daemon=True
+        ).start()
+
+    def _reset_executor(self, broken):
+        """
+        Thay process pool bị hỏng (BrokenProcessPool: worker bị kill) bằng pool mới
+
+        Args:
+            broken: Executor bị hỏng (bỏ qua nếu đã được thay bởi lần gọi khác)
+        """
+        with self._lock:
+            if self._executor is not broken or self._stopping.is_set():
+                return
+            self._executor = self._create_executor()
+
+        logger.error("Worker process pool bị hỏng (worker bị dừng đột ngột), tạo lại pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+        if self.worker_mode == 'process':
+            self._start_warm_up()
+
+    def stop(self, wait=False):
+        """
+        Dừng dispatcher và executor
+
+        Args:
+            wait: Chờ các job đang chạy hoàn tất
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    @property
+    def ready_worker_count(self):
+        """Số worker process đã load xong Whisper (chế độ process)"""
+        return len(self._ready_workers)
+
+    def is_ready(self):
+        """
+        Worker đã load xong Whisper (readiness probe)
+
+        - process: mọi worker process đã chạy initializer và báo model sẵn sàng
+        - thread: transcription service của process này đã warm-up xong
+        - WHISPER_PRELOAD=false: model được load lazy ở job đầu tiên → không có gì để chờ
+
+        Returns:
+            bool
+        """
+        if self.app is None:
+            # Job queue không chạy trong process này (JOB_QUEUE_ENABLED=false) → không có
+            # worker nào cần chờ load model
+            return True
+
+        if not Config.WHISPER_PRELOAD:
+            return True
+
+        if self.worker_mode == 'process':
+            return self._workers_ready.is_set()
+
+        from modules.speech_to_text.transcription_service import transcription_service
+        return transcription_service.is_ready()
+
+    def enqueue(self, video_id, user_id):
+        """
+        Đưa video vào hàng đợi xử lý (gọi trong app context của request)
+
+        Args:
+            video_id: ID của video
+            user_id: ID của user sở hữu video
+
+        Returns:
+            tuple: (success: bool, job: ProcessingJob or None, message: str)
+        """
+        try:
+            # Video đã có job đang chờ/đang chạy → trả về job đó
+            existing = ProcessingJob.query.filter(
+                ProcessingJob.video_id == video_id,
+                ProcessingJob.status.in_(JOB_ACTIVE_STATUSES)
+            ).first()
+
+            if existing:
+                return True, existing, "Video đã có trong hàng đợi"
+
+            # Giới hạn độ sâu hàng đợi
+            queued_count = ProcessingJob.query.filter_by(status=JOB_STATUS_QUEUED).count()
+            if queued_count >= self.max_depth:
+                return False, None, "Hàng đợi xử lý đã đầy, vui lòng thử lại sau"
+
+            user_active = ProcessingJob.query.filter(
+                ProcessingJob.user_id == user_id,
+                ProcessingJob.status.in_(JOB_ACTIVE_STATUSES)
+            ).count()
+            if user_active >= self.max_per_user:
+                return False, None, "Bạn đã có quá nhiều video đang chờ xử lý"
+
+            job = ProcessingJob(
+                video_id=video_id,
+                user_id=user_id,
+                status=JOB_STATUS_QUEUED
+            )
+            db.session.add(job)
+            db.session.commit()
+
+            self._wakeup.set()
+
+            logger.info(f"Enqueued job {job.job_id} for video {video_id}")
+
+            return True, job, "Đã đưa video vào hàng đợi xử lý"
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Lỗi khi enqueue video {video_id}: {str(e)}")
+            return False, None, f"Lỗi khi đưa video vào hàng đợi: {str(e)}"
+
+    def get_queue_position(self, job):
+        """
+        Vị trí (1-based) của job trong hàng đợi, None nếu không còn chờ
+
+        Args:
+            job: ProcessingJob
+
+        Returns:
+            int or None
+        """
+        if job is None or job.status != JOB_STATUS_QUEUED:
+            return None
+
+        ahead = ProcessingJob.query.filter(
+            ProcessingJob.status == JOB_STATUS_QUEUED,
+            ProcessingJob.job_id < job.job_id
+        ).count()
+
+        return ahead + 1
+
+    def get_stats(self):
+        """
+        Thống kê hàng đợi
+
+        Returns:
+            dict: Số job theo trạng thái và số worker đang bận
+        """
+        rows = db.session.query(
+            ProcessingJob.status, func.count(ProcessingJob.job_id)
+        ).group_by(ProcessingJob.status).all()
+
+        with self._lock:
+            busy = len(self._running)
+
+        return {
+            'by_status': {status: count for status, count in rows},
+            'workers': self.worker_count,
+            'busy_workers': busy,
+            'ready_workers': self.ready_worker_count,
+            'worker_mode': self.worker_mode
+        }
+
+    def _warm_up_workers(self, executor, ready_workers):
+        """
+        Spawn đủ worker process và chờ từng process load xong Whisper
+
+        Mỗi vòng gửi một probe cho mỗi worker chưa báo sẵn sàng; probe có thể rơi vào worker
+        đã sẵn sàng (worker đang load chưa nhận job) nên lặp tới khi đủ pid khác nhau.
+
+        Args:
+            executor: Process pool cần warm-up
+            ready_workers: Set pid đã sẵn sàng của pool này
+        """
+        started = time.monotonic()
+
+        while not self._stopping.is_set() and len(ready_workers) < self.worker_count:
+            missing = self.worker_count - len(ready_workers)
+
+            try:
+                futures = [executor.submit(_worker_process_ready) for _ in range(missing)]
+                results = [future.result() for future in futures]
+            except Exception as e:
+                logger.error(f"Không khởi động được worker process: {str(e)}")
+                return
+
+            new_workers = False
+            for pid, ready in results:
+                # Không preload thì worker chỉ cần khởi động xong, model load ở job đầu tiên
+                if not ready and Config.WHISPER_PRELOAD:
+                    logger.warning(f"Worker process {pid} không load được Whisper")
+                    return
+                if pid not in ready_workers:
+                    ready_workers.add(pid)
+                    new_workers = True
+
+            if not new_workers:
+                self._stopping.wait(1)
+
+        if len(ready_workers) == self.worker_count and executor is self._executor:
+            self._workers_ready.set()
+            logger.info(
+                f"{self.worker_count} worker process ready "
+                f"({time.monotonic() - started:.1f}s)"
+            )
+
+    # ========== Dispatcher ==========
+
+    def _dispatch_loop(self):
+        """Vòng lặp chính: thu kết quả, heartbeat, khôi phục job kẹt, claim job mới"""
+        with self.app.app_context():
+            self._recover_stale_jobs()
+
+            while not self._stopping.is_set():
+                try:
+                    self._collect_finished_jobs()
+                    self._send_heartbeat()
+                    self._recover_stale_jobs()
+
+                    while self._free_slots() > 0:
+                        job = self._claim_next_job()
+                        if job is None:
+                            break
+                        self._submit(job)
+
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Job dispatcher error: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _free_slots(self):
+        with self._lock:
+            return self.worker_count - len(self._running)
+
+    def _claim_next_job(self):
+        """
+        Chọn và claim job tiếp theo (FIFO + công bằng theo user)
+
+        Returns:
+            ProcessingJob or None
+        """
+        candidates = ProcessingJob.query.filter_by(
+            status=JOB_STATUS_QUEUED
+        ).order_by(
+            ProcessingJob.created_at, ProcessingJob.job_id
+        ).limit(self.max_depth).all()
+
+        if not candidates:
+            return None
+
+        running_by_user = dict(
+            db.session.query(
+                ProcessingJob.user_id, func.count(ProcessingJob.job_id)
+            ).filter(
+                ProcessingJob.status == JOB_STATUS_PROCESSING
+            ).group_by(ProcessingJob.user_id).all()
+        )
+
+        # sorted() ổn định → giữ thứ tự FIFO khi số job đang chạy bằng nhau
+        ordered = sorted(candidates, key=lambda j: running_by_user.get(j.user_id, 0))
+
+        now = datetime.utcnow()
+        for job in ordered:
+            claimed = ProcessingJob.query.filter_by(
+                job_id=job.job_id,
+                status=JOB_STATUS_QUEUED
+            ).update({
+                'status': JOB_STATUS_PROCESSING,
+                'worker_id': self.worker_id,
+                'started_at': now,
+                'heartbeat_at': now,
+                'attempts': ProcessingJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed == 1:
+                return ProcessingJob.query.get(job.job_id)
+
+        return None
+
+    def _submit(self, job):
+        """Giao job cho executor (pool hỏng → tạo lại pool, job quay về hàng đợi)"""
+        executor = self._executor
+
+        try:
+            if self.worker_mode == 'process':
+                future = executor.submit(_run_job_in_worker_process, job.video_id)
+            else:
+                from modules.video_processor.process_video import process_video_complete
+                future = executor.submit(process_video_complete, job.video_id, self.app)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            self._requeue_or_fail(job, 'pool bị hỏng khi giao job')
+            db.session.commit()
+            self._wakeup.set()
+            return
+
+        future.add_done_callback(lambda _f: self._wakeup.set())
+
+        with self._lock:
+            self._running[job.job_id] = (future, executor)
+
+        logger.info(f"Job {job.job_id} (video {job.video_id}) started on {self.worker_id}")
+
+    def _collect_finished_jobs(self):
+        """Ghi nhận kết quả các job đã chạy xong"""
+        with self._lock:
+            finished = {
+                job_id: running for job_id, running in self._running.items() if running[0].done()
+            }
+            for job_id in finished:
+                del self._running[job_id]
+
+        for job_id, (future, executor) in finished.items():
+            job = ProcessingJob.query.get(job_id)
+
+            try:
+                success, message = future.result()
+            except BrokenProcessPool:
+                # Worker bị kill giữa chừng: job chạy lại từ checkpoint của stage đang dở
+                self._reset_executor(executor)
+                if job:
+                    self._requeue_or_fail(job, 'worker process bị dừng đột ngột')
+                    db.session.commit()
+                continue
+            except Exception as e:
+                success, message = False, str(e)
+
+            if not job:
+                continue
+
+            job.status = JOB_STATUS_COMPLETED if success else JOB_STATUS_FAILED
+            job.error_message = None if success else message
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            logger.info(f"Job {job_id} finished: {job.status}")
+
+    def _send_heartbeat(self):
+        """Cập nhật heartbeat cho các job đang chạy trên worker này"""
+        with self._lock:
+            job_ids = list(self._running.keys())
+
+        if not job_ids:
+            return
+
+        ProcessingJob.query.filter(
+            ProcessingJob.job_id.in_(job_ids)
+        ).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+    def _recover_stale_jobs(self):
+        """
+        Khôi phục các job 'processing' không còn heartbeat (worker đã chết/restart)
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_timeout)
+
+        stale_jobs = ProcessingJob.query.filter(
+            ProcessingJob.status == JOB_STATUS_PROCESSING,
+            db.or_(
+                ProcessingJob.heartbeat_at.is_(None),
+                ProcessingJob.heartbeat_at < cutoff
+            )
+        ).all()
+
+        for job in stale_jobs:
+            self._requeue_or_fail(job, 'không còn heartbeat')
+
+        if stale_jobs:
+            db.session.commit()
+
+    def _requeue_or_fail(self, job, reason):
+        """
+        Đưa job bị gián đoạn về hàng đợi, hoặc đánh dấu lỗi nếu đã hết số lần thử
+        (caller commit)
+
+        Args:
+            job: ProcessingJob
+            reason: Lý do gián đoạn (ghi log)
+        """
+        video = Video.query.get(job.video_id)
+
+        if (job.attempts or 0) >= self.max_attempts:
+            job.status = JOB_STATUS_FAILED
+            job.error_message = 'Vượt quá số lần thử lại sau khi worker bị gián đoạn'
+            job.finished_at = datetime.utcnow()
+            if video:
+                video.status = VIDEO_STATUS_FAILED
+            logger.warning(f"Job {job.job_id} marked failed after {job.attempts} attempts ({reason})")
+        else:
+            job.status = JOB_STATUS_QUEUED
+            job.worker_id = None
+            if video:
+                video.status = VIDEO_STATUS_PENDING
+            logger.warning(f"Requeued job {job.job_id} (video {job.video_id}): {reason}")
+
+
+# Global queue instance
+job_queue = VideoJobQueue()
+
+
+def init_job_queue(app):
+    """
+    Khởi động hàng đợi xử lý video cho app
+
+    Args:
+        app: Flask app instance
+    """
+    job_queue.init_app(app)
+    return job_queue
+
+
+def enqueue_video_processing(video_id, user_id):
+    """
+    Đưa video vào hàng đợi xử lý
+
+    Args:
+        video_id: ID của video
+        user_id: ID của user
+
+    Returns:
+        tuple: (success: bool, job: ProcessingJob or None, message: str)
+    """
+    return job_queue.enqueue(video_id, user_id)
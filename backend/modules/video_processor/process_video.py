@@ -2,239 +2,639 @@
 Main Video Processing Module - COMPLETE FIXED VERSION
 Xử lý hoàn chỉnh video: Speech-to-Text, Translation, Subtitle, Quiz, Vocabulary
 
+Mỗi stage lưu checkpoint (processing_checkpoints) khi thành công, nên khi retry
+pipeline sẽ tiếp tục từ stage chưa hoàn thành đầu tiên. Các stage được khai báo
+dưới dạng đồ thị phụ thuộc; stage độc lập (vocabulary, quiz, ...) chạy song song,
+mỗi stage dùng DB session riêng.
+
 VỊ TRÍ FILE: backend/modules/video_processor/process_video.py
 """
+import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import current_app
-from database.models import Video, Subtitle
+from database.models import Video, Subtitle, Vocabulary, UserVocabulary, Quiz
 from database.db_config import db
 from modules.video_processor import extract_audio_from_video, get_video_info
-from modules.speech_to_text import transcribe_audio_whisper
-from modules.translation import translate_segments_gpt4
+from modules.video_processor.audio_extractor import load_audio_array
+from modules.video_processor.checkpoint import load_checkpoints, save_checkpoint, clear_checkpoints
+from modules.video_processor.artifact_reuse import clone_processed_video
+from modules.video_processor.hls_packager import get_hls_folder, package_hls
+from modules.speech_to_text import (
+    transcribe_audio_whisper, stream_transcribe_audio_whisper, detect_language_from_audio
+)
+from modules.translation import translate_segments_gpt4, translate_segments_streaming
 from modules.subtitle import generate_subtitle_file, create_bilingual_subtitle
 from modules.quiz import generate_quiz_from_transcript, save_quizzes_to_database
 from modules.vocabulary import extract_vocabulary_from_transcript, save_vocabulary_to_database
+from utils.constants import (
+    PIPELINE_STAGE_INFO, PIPELINE_STAGE_AUDIO, PIPELINE_STAGE_LANGUAGE, PIPELINE_STAGE_TRANSCRIBE,
+    PIPELINE_STAGE_TRANSLATE, PIPELINE_STAGE_SUBTITLE, PIPELINE_STAGE_VOCABULARY,
+    PIPELINE_STAGE_QUIZ, PIPELINE_STAGE_HLS, PIPELINE_VERSION
+)
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 
+# ========== STAGES ==========
+# Mỗi stage nhận (video, ctx) và trả về tuple (success, data, message).
+# - success = False  → lỗi nghiêm trọng, dừng pipeline
+# - data (dict)      → được merge vào ctx và lưu làm checkpoint
+# - data = None      → stage lỗi nhưng không chặn pipeline (không lưu checkpoint)
+
+def _stage_info(video, ctx):
+    """Step 1: Validate và lấy thông tin video"""
+    logger.info("📹 Step 1: Lấy thông tin video...")
+    video_info = get_video_info(video.file_path)
+
+    if not video_info:
+        return False, None, "Không thể đọc thông tin video"
+
+    video.duration = video_info['duration']
+    db.session.commit()
+
+    return True, {'video_info': video_info}, "OK"
+
+
+def _uses_chunked_whisper(ctx):
+    """Audio đủ dài để transcribe theo chunk (cần file WAV cho các worker process)"""
+    if not Config.WHISPER_CHUNKED:
+        return False
+
+    duration = (ctx.get('video_info') or {}).get('duration')
+    return bool(duration) and duration >= Config.WHISPER_CHUNK_MIN_DURATION
+
+
+def _stage_audio(video, ctx):
+    """Step 2: Trích xuất audio (memory mode: decode thẳng vào bộ nhớ, không ghi WAV)"""
+    logger.info("🎵 Step 2: Trích xuất audio...")
+
+    if Config.AUDIO_HANDOFF == 'memory' and not _uses_chunked_whisper(ctx):
+        success, samples, msg = load_audio_array(video.file_path)
+
+        if not success:
+            return False, None, f"Lỗi trích xuất audio: {msg}"
+
+        # Mảng audio không lưu vào checkpoint: chỉ sống trong ctx của lần chạy này
+        ctx['audio_samples'] = samples
+        return True, {'audio_path': None}, msg
+
+    success, audio_path, msg = extract_audio_from_video(video.file_path)
+
+    if not success:
+        return False, None, f"Lỗi trích xuất audio: {msg}"
+
+    return True, {'audio_path': audio_path}, msg
+
+
+def _audio_input(ctx):
+    """Audio cho Whisper: mảng trong bộ nhớ (memory mode) hoặc đường dẫn WAV"""
+    samples = ctx.get('audio_samples')
+    return samples if samples is not None else ctx['audio_path']
+
+
+def _use_streaming_translation(ctx):
+    """Streaming chỉ áp dụng khi transcribe một lần (không chia chunk)"""
+    if not Config.TRANSLATION_STREAMING:
+        return False
+
+    if ctx.get('audio_samples') is not None:
+        return True
+
+    if Config.WHISPER_CHUNKED:
+        from modules.speech_to_text.chunked_transcriber import get_wav_duration
+
+        duration = get_wav_duration(ctx['audio_path'])
+        if duration and duration >= Config.WHISPER_CHUNK_MIN_DURATION:
+            return False
+
+    return True
+
+
+def _stage_language(video, ctx):
+    """Step 2b: Phát hiện ngôn ngữ trên đoạn đầu audio (trước khi transcribe cả audio)"""
+    if not Config.LANGUAGE_DETECT_ENABLED:
+        return True, None, "Phát hiện ngôn ngữ trước tắt"
+
+    logger.info("🗣️ Step 2b: Phát hiện ngôn ngữ...")
+    language, probability = detect_language_from_audio(_audio_input(ctx))
+
+    if not language:
+        # Không chắc chắn → để Whisper tự nhận diện khi transcribe (vẫn lưu checkpoint để
+        # retry không phải đọc lại audio)
+        logger.info(f"⚠️ Không xác định chắc chắn ngôn ngữ ({probability:.2f}), dùng auto detect")
+        data = {'predetected_language': None, 'language_probability': probability}
+        return True, data, "Không xác định được ngôn ngữ"
+
+    # UI và bước dịch biết ngôn ngữ ngay, không chờ transcribe xong
+    video.language_detected = language
+    db.session.commit()
+
+    return True, {'predetected_language': language, 'language_probability': probability}, "OK"
+
+
+def _stage_transcribe(video, ctx):
+    """Step 3: Speech to Text (streaming mode: dịch luôn trong lúc transcribe)"""
+    if _use_streaming_translation(ctx):
+        return _stage_transcribe_and_translate(video, ctx)
+
+    logger.info("🎤 Step 3: Speech to Text với Whisper...")
+    success, transcription_result, msg = transcribe_audio_whisper(
+        _audio_input(ctx),
+        language=ctx.get('predetected_language')  # None = auto detect
+    )
+
+    if not success:
+        return False, None, f"Lỗi Speech-to-Text: {msg}"
+
+    segments = transcription_result['segments']
+    detected_language = transcription_result['language']
+
+    # Update detected language
+    video.language_detected = detected_language
+    db.session.commit()
+
+    logger.info(f"✅ Detected language: {detected_language}, Segments: {len(segments)}")
+
+    return True, {'segments': segments, 'detected_language': detected_language}, msg
+
+
+def _stage_transcribe_and_translate(video, ctx):
+    """Step 3+4: Whisper tạo segments, batch dịch được gửi ngay khi đủ segments"""
+    logger.info("🎤🌐 Step 3+4: Speech to Text + dịch streaming...")
+    success, stream, msg = stream_transcribe_audio_whisper(
+        _audio_input(ctx),
+        language=ctx.get('predetected_language')  # None = auto detect
+    )
+
+    if not success:
+        return False, None, f"Lỗi Speech-to-Text: {msg}"
+
+    detected_language = stream['language']
+
+    # Ngôn ngữ có ngay từ đầu → cập nhật trước khi transcribe xong
+    video.language_detected = detected_language
+    db.session.commit()
+
+    success, segments, translated_segments, msg = translate_segments_streaming(
+        stream['segments'],
+        source_language=detected_language,
+        target_language='vi'
+    )
+
+    if translated_segments is None:
+        return False, None, f"Lỗi Speech-to-Text: {msg}"
+
+    logger.info(f"✅ Detected language: {detected_language}, Segments: {len(segments)}")
+
+    data = {'segments': segments, 'detected_language': detected_language}
+    if success:
+        data['translated_segments'] = translated_segments
+
+    return True, data, msg
+
+
+def _stage_translate(video, ctx):
+    """Step 4: Translation"""
+    if ctx.get('translated_segments') is not None:
+        # Đã dịch streaming trong stage transcribe
+        return True, {'translated_segments': ctx['translated_segments']}, "Đã dịch (streaming)"
+
+    logger.info("🌐 Step 4: Dịch segments sang tiếng Việt...")
+    success, translated_segments, msg = translate_segments_gpt4(
+        ctx['segments'],
+        source_language=ctx['detected_language'],
+        target_language='vi'
+    )
+
+    if not success:
+        logger.warning(f"⚠️ Lỗi dịch: {msg}. Tiếp tục với segments gốc...")
+        ctx['translated_segments'] = ctx['segments']
+        return True, None, msg
+
+    return True, {'translated_segments': translated_segments}, msg
+
+
+def _stage_subtitle(video, ctx):
+    """Step 5: Tạo phụ đề song ngữ SRT và lưu vào database"""
+    logger.info("📝 Step 5: Tạo phụ đề...")
+
+    translated_segments = ctx['translated_segments']
+    subtitle_path = os.path.join(
+        Config.SUBTITLES_FOLDER,
+        f"video_{video.video_id}_bilingual.srt"
+    )
+
+    success, file_path, msg = create_bilingual_subtitle(
+        translated_segments,
+        subtitle_path,
+        subtitle_format='srt'
+    )
+
+    if not success:
+        logger.warning(f"⚠️ Lỗi tạo phụ đề: {msg}")
+        return True, None, msg
+
+    # Xóa phụ đề dở dang của lần chạy trước (nếu có) để retry không tạo bản trùng
+    Subtitle.query.filter_by(video_id=video.video_id, language='vi').delete()
+
+    subtitle = Subtitle(
+        video_id=video.video_id,
+        language='vi',
+        content=json.dumps(translated_segments),  # JSON string
+        file_path=file_path,
+        subtitle_format='srt'
+    )
+    db.session.add(subtitle)
+    db.session.commit()
+
+    logger.info(f"✅ Phụ đề đã được lưu: {file_path}")
+
+    return True, {'subtitle_id': subtitle.subtitle_id, 'subtitle_path': file_path}, msg
+
+
+def _stage_vocabulary(video, ctx):
+    """Step 6: Trích xuất từ vựng và lưu với video_id"""
+    logger.info("📚 Step 6: Trích xuất từ vựng...")
+
+    try:
+        success, vocabularies, msg = extract_vocabulary_from_transcript(
+            segments=ctx['translated_segments'],
+            video_language=ctx['detected_language'],
+            max_words=Config.MAX_VOCABULARY_PER_VIDEO
+        )
+
+        if not (success and vocabularies and len(vocabularies) > 0):
+            logger.warning(f"⚠️ Không trích xuất được từ vựng: {msg}")
+            return True, None, msg
+
+        # Từ vựng của lần chạy trước (nếu có): giữ theo (video_id, word) để vocab_id mà user
+        # đã lưu không đổi, chỉ xóa từ không còn được trích xuất và chưa ai lưu
+        kept_ids, kept_words = _reconcile_vocabulary(video.video_id, vocabularies)
+        new_vocabularies = [vocab for vocab in vocabularies if vocab['word'] not in kept_words]
+
+        vocab_ids = kept_ids
+        msg = f"Giữ {len(kept_ids)} từ vựng của lần chạy trước"
+
+        if new_vocabularies:
+            success, new_ids, msg = save_vocabulary_to_database(
+                vocabularies=new_vocabularies,
+                language=ctx['detected_language'],
+                video_id=video.video_id,
+                db=db
+            )
+
+            if not success:
+                logger.warning(f"⚠️ Lỗi lưu từ vựng: {msg}")
+                return True, None, msg
+
+            vocab_ids = kept_ids + new_ids
+
+        logger.info(f"✅ Đã lưu {len(vocab_ids)} từ vựng cho video {video.video_id}")
+
+        return True, {'vocab_ids': vocab_ids}, msg
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Lỗi trích xuất từ vựng: {str(e)}", exc_info=True)
+        # Continue processing even if vocabulary extraction fails
+        return True, None, str(e)
+
+
+def _reconcile_vocabulary(video_id, vocabularies):
+    """
+    Đối chiếu từ vựng đã lưu của video (lần chạy trước) với kết quả trích xuất mới
+
+    Xóa bằng ORM (không dùng bulk delete) để cascade tới user_vocabulary vẫn áp dụng.
+
+    Returns:
+        tuple: (vocab_ids được giữ lại, set word được giữ lại)
+    """
+    existing = Vocabulary.query.filter_by(video_id=video_id).all()
+    if not existing:
+        return [], set()
+
+    words = {vocab['word'] for vocab in vocabularies}
+    saved_ids = {
+        vocab_id for (vocab_id,) in db.session.query(UserVocabulary.vocab_id).filter(
+            UserVocabulary.vocab_id.in_([vocab.vocab_id for vocab in existing])
+        ).distinct()
+    }
+
+    kept_ids = []
+    kept_words = set()
+
+    for vocab in existing:
+        if vocab.word in words and vocab.word not in kept_words:
+            kept_ids.append(vocab.vocab_id)
+            kept_words.add(vocab.word)
+        elif vocab.vocab_id not in saved_ids:
+            db.session.delete(vocab)
+
+    db.session.commit()
+
+    return kept_ids, kept_words
+
+
+def _stage_quiz(video, ctx):
+    """Step 7: Tạo quiz"""
+    logger.info("❓ Step 7: Tạo quiz...")
+
+    try:
+        success, quizzes, msg = generate_quiz_from_transcript(
+            ctx['translated_segments'],
+            num_questions=Config.QUIZ_QUESTIONS_PER_VIDEO
+        )
+
+        if not (success and quizzes and len(quizzes) > 0):
+            logger.warning(f"⚠️ Không tạo được quiz: {msg}")
+            return True, None, msg
+
+        # Xóa quiz dở dang của lần chạy trước (nếu có); xóa qua ORM để cascade tới
+        # user_quiz_results (bulk delete bỏ qua cascade → lỗi FK trên SQL Server)
+        for quiz in Quiz.query.filter_by(video_id=video.video_id).all():
+            db.session.delete(quiz)
+        db.session.commit()
+
+        success, msg = save_quizzes_to_database(quizzes, video.video_id, db)
+
+        if not success:
+            logger.warning(f"⚠️ Lỗi lưu quiz: {msg}")
+            return True, None, msg
+
+        logger.info(f"✅ Đã tạo {len(quizzes)} câu quiz")
+
+        return True, {'quiz_count': len(quizzes)}, msg
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Lỗi tạo quiz: {str(e)}", exc_info=True)
+        # Continue processing even if quiz generation fails
+        return True, None, str(e)
+
+
+def _stage_hls(video, ctx):
+    """Step 8: Đóng gói HLS (remux) kèm phụ đề WebVTT"""
+    if not Config.HLS_ENABLED:
+        return True, None, "HLS tắt"
+
+    logger.info("📦 Step 8: Đóng gói HLS...")
+
+    success, playlist_path, msg = package_hls(
+        video.file_path,
+        get_hls_folder(video),
+        subtitle_segments=ctx.get('translated_segments')
+    )
+
+    if not success:
+        # Không chặn pipeline: video vẫn phát được qua /stream
+        logger.warning(f"⚠️ Lỗi đóng gói HLS: {msg}")
+        return True, None, msg
+
+    logger.info(f"✅ HLS: {playlist_path}")
+
+    return True, {'hls_playlist': playlist_path}, msg
+
+
+def _audio_checkpoint_valid(data, checkpoints):
+    """Checkpoint audio chỉ dùng lại được nếu file còn, hoặc không cần nữa"""
+    if PIPELINE_STAGE_TRANSCRIBE in checkpoints:
+        return True
+    audio_path = data.get('audio_path')
+    return bool(audio_path) and os.path.exists(audio_path)
+
+
+def _hls_checkpoint_valid(data, checkpoints):
+    """Checkpoint HLS chỉ dùng lại được nếu playlist còn"""
+    return os.path.exists(data.get('hls_playlist') or '')
+
+
+# Đồ thị phụ thuộc của pipeline: (stage, handler, các stage phải xong trước).
+# Các stage cùng sẵn sàng (vd. subtitle, vocabulary, quiz sau translate) chạy song song.
+PIPELINE = [
+    (PIPELINE_STAGE_INFO, _stage_info, []),
+    (PIPELINE_STAGE_AUDIO, _stage_audio, [PIPELINE_STAGE_INFO]),
+    (PIPELINE_STAGE_LANGUAGE, _stage_language, [PIPELINE_STAGE_AUDIO]),
+    (PIPELINE_STAGE_TRANSCRIBE, _stage_transcribe, [PIPELINE_STAGE_LANGUAGE]),
+    (PIPELINE_STAGE_TRANSLATE, _stage_translate, [PIPELINE_STAGE_TRANSCRIBE]),
+    (PIPELINE_STAGE_SUBTITLE, _stage_subtitle, [PIPELINE_STAGE_TRANSLATE]),
+    (PIPELINE_STAGE_VOCABULARY, _stage_vocabulary, [PIPELINE_STAGE_TRANSLATE]),
+    (PIPELINE_STAGE_QUIZ, _stage_quiz, [PIPELINE_STAGE_TRANSLATE]),
+    (PIPELINE_STAGE_HLS, _stage_hls, [PIPELINE_STAGE_TRANSLATE])
+]
+
+# Kiểm tra checkpoint còn dùng được hay không (mặc định: luôn dùng được)
+CHECKPOINT_VALIDATORS = {
+    PIPELINE_STAGE_AUDIO: _audio_checkpoint_valid,
+    PIPELINE_STAGE_HLS: _hls_checkpoint_valid
+}
+
+
+def _run_stage(app, video_id, stage, handler, ctx):
+    """
+    Chạy một stage trong app context (và DB session) riêng, lưu checkpoint nếu thành công
+
+    Args:
+        app: Flask app instance
+        video_id: ID của video
+        stage: Tên stage
+        handler: Hàm xử lý stage
+        ctx: Dữ liệu từ các stage trước (handler có thể ghi thêm)
+
+    Returns:
+        tuple: (success: bool, data: dict or None, message: str)
+    """
+    with app.app_context():
+        try:
+            video = Video.query.get(video_id)
+            success, data, msg = handler(video, ctx)
+
+            if success and data is not None:
+                save_checkpoint(video_id, stage, data)
+
+            return success, data, msg
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Lỗi stage '{stage}': {str(e)}", exc_info=True)
+            return False, None, f"Lỗi stage {stage}: {str(e)}"
+
+        finally:
+            db.session.remove()
+
+
+def run_pipeline(app, video_id, checkpoints):
+    """
+    Chạy các stage theo đồ thị phụ thuộc; stage độc lập chạy song song
+
+    Args:
+        app: Flask app instance
+        video_id: ID của video
+        checkpoints: Checkpoint đã có {stage: data}
+
+    Returns:
+        tuple: (success: bool, ctx: dict, message: str)
+    """
+    ctx = {}
+    done = set()
+    pending = list(PIPELINE)
+
+    with ThreadPoolExecutor(
+        max_workers=Config.PIPELINE_MAX_PARALLEL_STAGES,
+        thread_name_prefix=f'video-{video_id}-stage'
+    ) as executor:
+        while pending:
+            ready = [item for item in pending if all(dep in done for dep in item[2])]
+
+            if not ready:
+                return False, ctx, "Pipeline có phụ thuộc vòng"
+
+            to_run = []
+            for item in ready:
+                stage = item[0]
+                data = checkpoints.get(stage)
+                validator = CHECKPOINT_VALIDATORS.get(stage)
+
+                if data is not None and (validator is None or validator(data, checkpoints)):
+                    logger.info(f"⏭️ Stage '{stage}' đã có checkpoint, bỏ qua")
+                    ctx.update(data)
+                    done.add(stage)
+                else:
+                    to_run.append(item)
+
+            if to_run:
+                if len(to_run) == 1:
+                    stage, handler, _ = to_run[0]
+                    results = [(stage, _run_stage(app, video_id, stage, handler, ctx))]
+                else:
+                    logger.info(f"⚡ Chạy song song: {', '.join(item[0] for item in to_run)}")
+                    futures = [
+                        (stage, executor.submit(_run_stage, app, video_id, stage, handler, dict(ctx)))
+                        for stage, handler, _ in to_run
+                    ]
+                    results = [(stage, future.result()) for stage, future in futures]
+
+                failures = []
+                for stage, (success, data, msg) in results:
+                    if not success:
+                        failures.append(msg)
+                        continue
+                    if data is not None:
+                        ctx.update(data)
+                    done.add(stage)
+
+                if failures:
+                    return False, ctx, failures[0]
+
+            pending = [item for item in pending if item[0] not in done]
+
+    return True, ctx, "OK"
+
+
 def process_video_complete(video_id, app=None):
     """
-    Xử lý hoàn chỉnh video
-    
+    Xử lý hoàn chỉnh video (tiếp tục từ checkpoint nếu có)
+
     Args:
         video_id: ID của video
         app: Flask app instance (bắt buộc cho background processing)
-    
+
     Returns:
         tuple: (success: bool, message: str)
     """
     # Nếu không có app, lấy từ current_app
     if app is None:
         app = current_app._get_current_object()
-    
+
     # Chạy trong app context
     with app.app_context():
         try:
             # Get video từ database
             video = Video.query.get(video_id)
-            
+
             if not video:
                 return False, "Video không tồn tại"
-            
+
             logger.info(f"🎬 Bắt đầu xử lý video ID: {video_id}")
-            
+
+            # Video trùng nội dung đã xử lý → sao chép kết quả, không chạy pipeline
+            cloned, _, msg = clone_processed_video(video)
+            if cloned:
+                clear_checkpoints(video_id)
+                return True, msg
+
             # Update status
             video.status = 'processing'
             db.session.commit()
-            
-            # Step 1: Validate và lấy thông tin video
-            logger.info("📹 Step 1: Lấy thông tin video...")
-            video_info = get_video_info(video.file_path)
-            
-            if not video_info:
-                video.status = 'failed'
-                db.session.commit()
-                return False, "Không thể đọc thông tin video"
-            
-            video.duration = video_info['duration']
-            db.session.commit()
-            
-            # Step 2: Trích xuất audio
-            logger.info("🎵 Step 2: Trích xuất audio...")
-            success, audio_path, msg = extract_audio_from_video(video.file_path)
-            
-            if not success:
-                video.status = 'failed'
-                db.session.commit()
-                return False, f"Lỗi trích xuất audio: {msg}"
-            
-            # Step 3: Speech to Text
-            logger.info("🎤 Step 3: Speech to Text với Whisper...")
-            success, transcription_result, msg = transcribe_audio_whisper(
-                audio_path,
-                language=None  # Auto detect
-            )
-            
+
+            checkpoints = load_checkpoints(video_id)
+
+            success, ctx, msg = run_pipeline(app, video_id, checkpoints)
+
+            # Các stage chạy trên session riêng → đọc lại video
+            db.session.expire_all()
+            video = Video.query.get(video_id)
+
             if not success:
                 video.status = 'failed'
                 db.session.commit()
-                return False, f"Lỗi Speech-to-Text: {msg}"
-            
-            segments = transcription_result['segments']
-            detected_language = transcription_result['language']
-            
-            # Update detected language
-            video.language_detected = detected_language
-            db.session.commit()
-            
-            logger.info(f"✅ Detected language: {detected_language}, Segments: {len(segments)}")
-            
-            # Step 4: Translation
-            logger.info("🌐 Step 4: Dịch segments sang tiếng Việt...")
-            success, translated_segments, msg = translate_segments_gpt4(
-                segments,
-                source_language=detected_language,
-                target_language='vi'
-            )
-            
-            if not success:
-                logger.warning(f"⚠️ Lỗi dịch: {msg}. Tiếp tục với segments gốc...")
-                translated_segments = segments
-            
-            # Step 5: Tạo phụ đề
-            logger.info("📝 Step 5: Tạo phụ đề...")
-            
-            # Tạo phụ đề song ngữ SRT
-            subtitle_path = os.path.join(
-                Config.SUBTITLES_FOLDER,
-                f"video_{video_id}_bilingual.srt"
-            )
-            
-            success, file_path, msg = create_bilingual_subtitle(
-                translated_segments,
-                subtitle_path,
-                subtitle_format='srt'
-            )
-            
-            if success:
-                # Lưu subtitle vào database
-                import json
-                subtitle = Subtitle(
-                    video_id=video_id,
-                    language='vi',
-                    content=json.dumps(translated_segments),  # JSON string
-                    file_path=file_path,
-                    subtitle_format='srt'
-                )
-                db.session.add(subtitle)
-                db.session.commit()
-                
-                logger.info(f"✅ Phụ đề đã được lưu: {file_path}")
-            
-            # ✅ Step 6: Trích xuất từ vựng - FIXED WITH VIDEO_ID
-            logger.info("📚 Step 6: Trích xuất từ vựng...")
-            
-            try:
-                success, vocabularies, msg = extract_vocabulary_from_transcript(
-                    segments=translated_segments,
-                    video_language=detected_language,  # ✅ Pass detected language
-                    max_words=Config.MAX_VOCABULARY_PER_VIDEO
-                )
-                
-                if success and vocabularies and len(vocabularies) > 0:
-                    # ✅ FIXED: Pass video_id để link với video
-                    success, vocab_ids, msg = save_vocabulary_to_database(
-                        vocabularies=vocabularies,
-                        language=detected_language,
-                        video_id=video_id,  # ✅ NEW: Link to specific video
-                        db=db
-                    )
-                    
-                    if success:
-                        logger.info(f"✅ Đã lưu {len(vocab_ids)} từ vựng cho video {video_id}")
-                    else:
-                        logger.warning(f"⚠️ Lỗi lưu từ vựng: {msg}")
-                else:
-                    logger.warning(f"⚠️ Không trích xuất được từ vựng: {msg}")
-                    
-            except Exception as e:
-                logger.error(f"❌ Lỗi trích xuất từ vựng: {str(e)}", exc_info=True)
-                # Continue processing even if vocabulary extraction fails
-            
-            # Step 7: Tạo quiz
-            logger.info("❓ Step 7: Tạo quiz...")
-            
-            try:
-                success, quizzes, msg = generate_quiz_from_transcript(
-                    translated_segments,
-                    num_questions=Config.QUIZ_QUESTIONS_PER_VIDEO
-                )
-                
-                if success and quizzes and len(quizzes) > 0:
-                    success, msg = save_quizzes_to_database(quizzes, video_id, db)
-                    
-                    if success:
-                        logger.info(f"✅ Đã tạo {len(quizzes)} câu quiz")
-                    else:
-                        logger.warning(f"⚠️ Lỗi lưu quiz: {msg}")
-                else:
-                    logger.warning(f"⚠️ Không tạo được quiz: {msg}")
-                    
-            except Exception as e:
-                logger.error(f"❌ Lỗi tạo quiz: {str(e)}", exc_info=True)
-                # Continue processing even if quiz generation fails
-            
-            # Step 8: Update video status
+                return False, msg
+
+            # Step 9: Update video status
             video.status = 'completed'
             video.processed_date = datetime.utcnow()
+            video.pipeline_version = PIPELINE_VERSION
             db.session.commit()
-            
+
+            clear_checkpoints(video_id)
+
             logger.info(f"✅ Xử lý video {video_id} hoàn tất!")
-            
+
             # Cleanup audio file
+            audio_path = ctx.get('audio_path')
             try:
-                if os.path.exists(audio_path):
+                if audio_path and os.path.exists(audio_path):
                     os.remove(audio_path)
                     logger.info(f"🗑️ Đã xóa file audio tạm: {audio_path}")
             except Exception as e:
                 logger.warning(f"⚠️ Không xóa được audio file: {str(e)}")
-            
+
             return True, "Xử lý video thành công"
-            
+
         except Exception as e:
             logger.error(f"❌ Lỗi xử lý video: {str(e)}", exc_info=True)
-            
+
             # Update status to failed
             try:
+                db.session.rollback()
                 video = Video.query.get(video_id)
                 if video:
                     video.status = 'failed'
                     db.session.commit()
             except:
                 pass
-            
+
             return False, f"Lỗi xử lý video: {str(e)}"
 
 
 def process_video_background(video_id, app):
     """
     Xử lý video trong background (để dùng với threading)
-    
+
     Args:
         video_id: ID của video
         app: Flask app instance (BẮT BUỘC)
     """
     try:
         success, message = process_video_complete(video_id, app)
-        
+
         if success:
             logger.info(f"✅ Background processing completed for video {video_id}")
         else:
             logger.error(f"❌ Background processing failed for video {video_id}: {message}")
-            
+
     except Exception as e:
-        logger.error(f"❌ Background processing error: {str(e)}", exc_info=True)
\ No newline at end of file
+        logger.error(f"❌ Background processing error: {str(e)}", exc_info=True)
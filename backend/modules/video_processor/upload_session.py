@@ -0,0 +1,367 @@
+"""
+Upload Session
+Upload video theo chunk, có thể tiếp tục khi mất kết nối: mỗi chunk được ghi thẳng
+vào file đích theo offset và SHA-256 được tính dần theo từng chunk.
+
+Quyền ghi chunk và quyền hoàn tất upload được claim bằng UPDATE có điều kiện trong
+database (WHERE status/received_bytes = ...), nên an toàn khi nhiều process/server
+cùng nhận request của một phiên upload.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from werkzeug.utils import secure_filename
+from database.models import UploadSession
+from database.db_config import db
+from utils.file_handler import generate_filename, delete_file, COPY_CHUNK_SIZE
+from utils.constants import (
+    UPLOAD_STATUS_UPLOADING, UPLOAD_STATUS_WRITING, UPLOAD_STATUS_FINALIZING, UPLOAD_STATUS_COMPLETED
+)
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái hash theo upload: {upload_id: (offset đã hash, hashlib object)}
+# Chỉ là cache trong process: mất khi restart hoặc chunk tới worker khác → tính lại
+# từ phần file đã nhận
+_hash_states = {}
+_hash_states_lock = threading.Lock()
+
+
+def _forget_upload(upload_id):
+    with _hash_states_lock:
+        _hash_states.pop(upload_id, None)
+
+
+def _lease_stamp():
+    """
+    Mốc updated_at dùng làm token của lease ghi chunk (làm tròn giây để so sánh bằng
+    chính xác sau khi lưu vào DATETIME của SQL Server)
+    """
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def _claim_upload(session, from_statuses, to_status, values=None, **conditions):
+    """
+    Chuyển trạng thái phiên upload bằng một UPDATE có điều kiện
+
+    Args:
+        session: UploadSession
+        from_statuses: Điều kiện trạng thái hiện tại (biểu thức SQLAlchemy)
+        to_status: Trạng thái mới
+        values: Các cột cập nhật thêm (vd. {UploadSession.received_bytes: n})
+        conditions: Điều kiện cột bổ sung (vd. received_bytes=offset)
+
+    Returns:
+        bool: True nếu request này claim được (đúng một dòng được cập nhật)
+    """
+    query = UploadSession.query.filter(
+        UploadSession.upload_id == session.upload_id,
+        from_statuses
+    ).filter_by(**conditions)
+
+    claimed = query.update(
+        {UploadSession.status: to_status, UploadSession.updated_at: _lease_stamp(), **(values or {})},
+        synchronize_session=False
+    ) == 1
+    db.session.commit()
+    db.session.refresh(session)
+
+    return claimed
+
+
+def _hasher_at(session):
+    """
+    Lấy hasher đã hash đúng received_bytes byte đầu của file
+
+    Returns:
+        hashlib object
+    """
+    with _hash_states_lock:
+        state = _hash_states.pop(session.upload_id, None)
+
+    if state and state[0] == session.received_bytes:
+        return state[1]
+
+    # Tính lại từ file (sau restart hoặc chunk lỗi giữa chừng)
+    hasher = hashlib.sha256()
+    remaining = session.received_bytes
+
+    if remaining and os.path.exists(session.file_path):
+        with open(session.file_path, 'rb') as f:
+            while remaining > 0:
+                chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+
+    return hasher
+
+
+def cleanup_expired_uploads():
+    """Xóa các phiên upload dở dang quá hạn (và file tạm của chúng)"""
+    expire_before = datetime.utcnow() - timedelta(hours=Config.UPLOAD_SESSION_EXPIRE_HOURS)
+
+    expired = UploadSession.query.filter(
+        UploadSession.status.in_([UPLOAD_STATUS_UPLOADING, UPLOAD_STATUS_WRITING]),
+        UploadSession.updated_at < expire_before
+    ).all()
+
+    removed = sum(
+        1 for session in expired
+        if cancel_upload_session(session, expected_status=session.status)
+    )
+
+    if removed:
+        logger.info(f"Đã xóa {removed} phiên upload quá hạn")
+
+
+def create_upload_session(user_id, filename, total_size, title=None):
+    """
+    Tạo phiên upload mới (file đích được tạo rỗng)
+
+    Args:
+        user_id: ID của user
+        filename: Tên file gốc
+        total_size: Kích thước file (bytes)
+        title: Tiêu đề video (optional)
+
+    Returns:
+        tuple: (success: bool, session: UploadSession, message: str)
+    """
+    try:
+        if total_size <= 0:
+            return False, None, "Kích thước file không hợp lệ"
+
+        if total_size > Config.MAX_UPLOAD_SIZE:
+            return False, None, f"File quá lớn. Tối đa: {Config.MAX_UPLOAD_SIZE // (1024 * 1024)} MB"
+
+        cleanup_expired_uploads()
+
+        original_filename = secure_filename(filename)
+        save_path = os.path.join(Config.UPLOAD_FOLDER, 'videos')
+        os.makedirs(save_path, exist_ok=True)
+
+        file_path = os.path.join(save_path, generate_filename(original_filename))
+        open(file_path, 'wb').close()
+
+        session = UploadSession(
+            upload_id=str(uuid.uuid4()),
+            user_id=user_id,
+            title=title or filename,
+            original_filename=original_filename,
+            file_path=file_path,
+            total_size=total_size,
+            received_bytes=0,
+            status=UPLOAD_STATUS_UPLOADING
+        )
+        db.session.add(session)
+        db.session.commit()
+
+        logger.info(f"Upload session {session.upload_id}: {original_filename} ({total_size} bytes)")
+
+        return True, session, "Tạo phiên upload thành công"
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Lỗi khi tạo phiên upload: {str(e)}")
+        return False, None, f"Lỗi khi tạo phiên upload: {str(e)}"
+
+
+def write_upload_chunk(session, offset, stream):
+    """
+    Ghi một chunk vào file đích tại offset (phải bằng số byte đã nhận)
+
+    Trước khi ghi, request claim lease ghi bằng
+    UPDATE ... SET status='writing' WHERE status='uploading' AND received_bytes=offset;
+    lease bị bỏ dở quá UPLOAD_WRITE_LEASE_SECONDS (worker chết) được claim lại.
+    updated_at lúc claim là token của lease: được gia hạn trong lúc ghi và mọi UPDATE sau
+    đó đều có điều kiện updated_at = token, nên request đã mất lease không ghi đè trạng
+    thái của request mới.
+
+    Args:
+        session: UploadSession
+        offset: Vị trí byte của chunk
+        stream: Stream dữ liệu chunk (request.stream)
+
+    Returns:
+        tuple: (success: bool, received_bytes: int, message: str)
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=Config.UPLOAD_WRITE_LEASE_SECONDS)
+    claimable = or_(
+        UploadSession.status == UPLOAD_STATUS_UPLOADING,
+        and_(UploadSession.status == UPLOAD_STATUS_WRITING, UploadSession.updated_at < stale_before)
+    )
+
+    if not _claim_upload(session, claimable, UPLOAD_STATUS_WRITING, received_bytes=offset):
+        if session.status not in (UPLOAD_STATUS_UPLOADING, UPLOAD_STATUS_WRITING):
+            return False, session.received_bytes, "Phiên upload đã kết thúc"
+
+        if offset == session.received_bytes:
+            return False, session.received_bytes, "Một chunk khác đang được ghi"
+
+        return False, session.received_bytes, "Offset không khớp với số byte đã nhận"
+
+    lease = session.updated_at
+    hasher = _hasher_at(session)
+    written = 0
+    renewed_bytes = 0
+    renewed_at = time.monotonic()
+
+    try:
+        with open(session.file_path, 'r+b') as f:
+            # Bỏ phần dữ liệu thừa của chunk lỗi trước đó (nếu có)
+            f.seek(offset)
+            f.truncate()
+
+            while True:
+                chunk = stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if offset + written + len(chunk) > session.total_size:
+                    _release_write_lease(session, lease)
+                    return False, session.received_bytes, "Dữ liệu vượt quá kích thước file đã khai báo"
+
+                # Gia hạn lease theo số byte đã ghi (hoặc sau 1/3 thời hạn với client chậm)
+                if (written - renewed_bytes >= Config.UPLOAD_WRITE_LEASE_RENEW_BYTES
+                        or time.monotonic() - renewed_at >= Config.UPLOAD_WRITE_LEASE_SECONDS / 3):
+                    lease = _renew_write_lease(session, offset, lease)
+                    if lease is None:
+                        return _lost_write_lease(session)
+                    renewed_bytes = written
+                    renewed_at = time.monotonic()
+
+                f.write(chunk)
+                hasher.update(chunk)
+                written += len(chunk)
+
+        if not _claim_upload(
+            session, UploadSession.status == UPLOAD_STATUS_WRITING, UPLOAD_STATUS_UPLOADING,
+            values={UploadSession.received_bytes: offset + written},
+            received_bytes=offset, updated_at=lease
+        ):
+            return _lost_write_lease(session)
+
+        with _hash_states_lock:
+            _hash_states[session.upload_id] = (session.received_bytes, hasher)
+
+        return True, session.received_bytes, "Đã nhận chunk"
+
+    except Exception as e:
+        db.session.rollback()
+        _release_write_lease(session, lease)
+        logger.error(f"Lỗi khi ghi chunk upload {session.upload_id}: {str(e)}")
+        return False, offset, f"Lỗi khi ghi chunk: {str(e)}"
+
+
+def _renew_write_lease(session, offset, lease):
+    """
+    Gia hạn lease ghi chunk (UPDATE updated_at có điều kiện token hiện tại)
+
+    Returns:
+        datetime or None: Token mới, None nếu lease đã bị request khác claim
+    """
+    renewed = max(_lease_stamp(), lease)
+
+    updated = UploadSession.query.filter_by(
+        upload_id=session.upload_id, status=UPLOAD_STATUS_WRITING,
+        received_bytes=offset, updated_at=lease
+    ).update({UploadSession.updated_at: renewed}, synchronize_session=False) == 1
+    db.session.commit()
+
+    return renewed if updated else None
+
+
+def _lost_write_lease(session):
+    """Lease đã bị request khác claim lại: không lưu hash state, báo lỗi cho client"""
+    db.session.refresh(session)
+    logger.warning(f"Upload {session.upload_id}: mất lease ghi chunk")
+    return False, session.received_bytes, "Lease ghi chunk đã hết hạn, vui lòng gửi lại chunk"
+
+
+def _release_write_lease(session, lease):
+    """Trả lease ghi chunk (received_bytes giữ nguyên → client gửi lại chunk)"""
+    _claim_upload(
+        session, UploadSession.status == UPLOAD_STATUS_WRITING, UPLOAD_STATUS_UPLOADING,
+        received_bytes=session.received_bytes, updated_at=lease
+    )
+
+
+def finalize_upload(session):
+    """
+    Kết thúc upload: claim phiên (uploading → finalizing) rồi trả về SHA-256 của file
+
+    Chỉ một request claim được (UPDATE ... WHERE status='uploading' AND
+    received_bytes=total_size), nên các lần gọi /complete đồng thời không tạo video trùng.
+    Sau đó phải gọi complete_upload_session, release_upload_session hoặc
+    cancel_upload_session.
+
+    Args:
+        session: UploadSession
+
+    Returns:
+        tuple: (success: bool, content_hash: str, message: str)
+    """
+    if not _claim_upload(
+        session, UploadSession.status == UPLOAD_STATUS_UPLOADING, UPLOAD_STATUS_FINALIZING,
+        received_bytes=session.total_size
+    ):
+        if session.status == UPLOAD_STATUS_WRITING:
+            return False, None, "Một chunk đang được ghi"
+
+        if session.status != UPLOAD_STATUS_UPLOADING:
+            return False, None, "Phiên upload đã kết thúc hoặc đang được hoàn tất"
+
+        return False, None, f"Upload chưa hoàn tất ({session.received_bytes}/{session.total_size} bytes)"
+
+    try:
+        content_hash = _hasher_at(session).hexdigest()
+    except Exception:
+        release_upload_session(session)
+        raise
+
+    _forget_upload(session.upload_id)
+
+    return True, content_hash, "Upload hoàn tất"
+
+
+def complete_upload_session(session, video_id):
+    """Đánh dấu phiên upload đã tạo video"""
+    session.status = UPLOAD_STATUS_COMPLETED
+    session.video_id = video_id
+    db.session.commit()
+
+
+def release_upload_session(session):
+    """Trả phiên đang finalizing về uploading (tạo video lỗi → client gọi /complete lại)"""
+    db.session.rollback()
+    _claim_upload(session, UploadSession.status == UPLOAD_STATUS_FINALIZING, UPLOAD_STATUS_UPLOADING)
+
+
+def cancel_upload_session(session, expected_status=UPLOAD_STATUS_UPLOADING):
+    """
+    Hủy phiên upload và xóa file đã nhận
+
+    Xóa bằng DELETE có điều kiện trạng thái, nên không hủy phiên đang được ghi chunk
+    hoặc hoàn tất ở request khác.
+
+    Returns:
+        bool: True nếu đã hủy
+    """
+    deleted = UploadSession.query.filter_by(
+        upload_id=session.upload_id, status=expected_status
+    ).delete(synchronize_session=False) == 1
+    db.session.commit()
+
+    if deleted:
+        delete_file(session.file_path)
+        _forget_upload(session.upload_id)
+
+    return deleted
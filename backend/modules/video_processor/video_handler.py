@@ -1,51 +1,165 @@
 """
 Video Handler
 Xử lý và validate video
+
+Metadata được đọc một lần bằng ffprobe (không decode frame) và cache theo
+(đường dẫn, mtime), nên upload và pipeline xử lý dùng chung kết quả.
 """
 import logging
 import os
-from moviepy import VideoFileClip  # ✅ Cách mới
+import threading
+from collections import OrderedDict
 from utils.validators import validate_duration
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Cache VideoInfo: {đường dẫn tuyệt đối: ((mtime_ns, size), VideoInfo)}
+_probe_cache = OrderedDict()
+_probe_cache_lock = threading.Lock()
+PROBE_CACHE_SIZE = 256
 
-def get_video_info(video_path):
+
+class VideoInfo:
+    """Metadata của video từ ffprobe"""
+    
+    __slots__ = (
+        'duration', 'fps', 'width', 'height', 'size',
+        'format_name', 'video_codec', 'audio_codec', 'has_audio'
+    )
+    
+    def __init__(self, duration, fps, width, height, size,
+                 format_name=None, video_codec=None, audio_codec=None):
+        self.duration = duration
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.size = size
+        self.format_name = format_name
+        self.video_codec = video_codec
+        self.audio_codec = audio_codec
+        self.has_audio = audio_codec is not None
+    
+    @property
+    def resolution(self):
+        return (self.width, self.height)
+    
+    def to_dict(self):
+        """Chuyển sang dict (giữ các key cũ của get_video_info)"""
+        return {
+            'duration': self.duration,  # giây
+            'fps': self.fps,
+            'size': self.size,  # bytes
+            'resolution': self.resolution,
+            'has_audio': self.has_audio,
+            'format_name': self.format_name,
+            'video_codec': self.video_codec,
+            'audio_codec': self.audio_codec
+        }
+    
+    def __repr__(self):
+        # ffprobe có thể không trả duration (stream/container lỗi)
+        duration = f"{self.duration:.1f}s" if self.duration is not None else "?s"
+        return (f"<VideoInfo {duration} {self.width}x{self.height} "
+                f"{self.video_codec}/{self.audio_codec}>")
+
+
+def _parse_frame_rate(rate):
+    """'30000/1001' → 29.97"""
+    try:
+        num, _, den = (rate or '').partition('/')
+        return float(num) / float(den or 1) if float(den or 1) else None
+    except ValueError:
+        return None
+
+
+def _run_ffprobe(video_path):
     """
-    Lấy thông tin video
+    Gọi ffprobe một lần và tạo VideoInfo
+    
+    Returns:
+        VideoInfo
+    """
+    import ffmpeg
+    
+    probe = ffmpeg.probe(video_path, cmd=Config.FFPROBE_BINARY)
+    streams = probe.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    
+    if video_stream is None:
+        raise ValueError("File không có video stream")
+    
+    fmt = probe.get('format', {})
+    duration = fmt.get('duration') or video_stream.get('duration')
+    
+    return VideoInfo(
+        duration=float(duration) if duration else None,
+        fps=_parse_frame_rate(video_stream.get('avg_frame_rate') or video_stream.get('r_frame_rate')),
+        width=video_stream.get('width'),
+        height=video_stream.get('height'),
+        size=os.path.getsize(video_path),
+        format_name=fmt.get('format_name'),
+        video_codec=video_stream.get('codec_name'),
+        audio_codec=audio_stream.get('codec_name') if audio_stream else None
+    )
+
+
+def probe_video(video_path):
+    """
+    Lấy VideoInfo (cache theo đường dẫn + mtime, file đổi thì probe lại)
     
     Args:
         video_path: Đường dẫn video
     
     Returns:
-        dict: Thông tin video (duration, fps, size, resolution)
+        VideoInfo or None: None nếu file không tồn tại hoặc không đọc được
     """
     try:
-        if not os.path.exists(video_path):
-            return None
-        
-        # Load video
-        video = VideoFileClip(video_path)
-        
-        info = {
-            'duration': video.duration,  # giây
-            'fps': video.fps,
-            'size': os.path.getsize(video_path),  # bytes
-            'resolution': (video.w, video.h),
-            'has_audio': video.audio is not None
-        }
-        
-        # Đóng video
-        video.close()
-        
-        logger.info(f"Video info: {info}")
-        
-        return info
-        
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    
+    key = os.path.abspath(video_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    
+    with _probe_cache_lock:
+        cached = _probe_cache.get(key)
+        if cached and cached[0] == version:
+            _probe_cache.move_to_end(key)
+            return cached[1]
+    
+    try:
+        info = _run_ffprobe(video_path)
     except Exception as e:
-        logger.error(f"Lỗi khi lấy thông tin video: {str(e)}")
+        stderr = getattr(e, 'stderr', None)
+        detail = stderr.decode('utf-8', errors='ignore').strip() if stderr else str(e)
+        logger.error(f"Lỗi khi probe video {video_path}: {detail}")
         return None
+    
+    with _probe_cache_lock:
+        _probe_cache[key] = (version, info)
+        _probe_cache.move_to_end(key)
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    
+    logger.info(f"Video info: {info}")
+    
+    return info
+
+
+def get_video_info(video_path):
+    """
+    Lấy thông tin video
+    
+    Args:
+        video_path: Đường dẫn video
+    
+    Returns:
+        dict: Thông tin video (duration, fps, size, resolution, has_audio, codecs)
+    """
+    info = probe_video(video_path)
+    return info.to_dict() if info else None
 
 
 def validate_video(video_path):
@@ -71,7 +185,7 @@ def validate_video(video_path):
         
         # Validate duration
         is_valid, message = validate_duration(
-            info['duration'],
+            info['duration'] or 0,
             Config.MAX_VIDEO_DURATION
         )
         
@@ -99,14 +213,8 @@ def get_video_duration(video_path):
     Returns:
         float: Thời lượng (giây)
     """
-    try:
-        video = VideoFileClip(video_path)
-        duration = video.duration
-        video.close()
-        return duration
-    except Exception as e:
-        logger.error(f"Lỗi khi lấy duration: {str(e)}")
-        return 0
+    info = probe_video(video_path)
+    return (info.duration or 0) if info else 0
 
 
 def check_video_format(video_path):
@@ -119,10 +227,4 @@ def check_video_format(video_path):
     Returns:
         bool: True nếu format hợp lệ
     """
-    try:
-        video = VideoFileClip(video_path)
-        video.close()
-        return True
-    except Exception as e:
-        logger.error(f"Format video không hợp lệ: {str(e)}")
-        return False
\ No newline at end of file
+    return probe_video(video_path) is not None
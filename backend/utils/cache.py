@@ -0,0 +1,62 @@
+"""
+Cache Utilities
+Cache trong bộ nhớ process có TTL và giới hạn số phần tử (LRU)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache key → value, mỗi phần tử hết hạn sau `ttl` giây; vượt `max_entries` thì
+    bỏ phần tử lâu không dùng nhất. Thread-safe.
+
+    Chỉ có hiệu lực trong một process: mỗi worker (gunicorn, process pool) có cache
+    riêng, nên TTL cần đủ ngắn để chấp nhận dữ liệu cũ giữa các process.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Lấy value còn hạn (default nếu không có hoặc đã hết hạn)"""
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                return default
+
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        """Lưu value với TTL mặc định"""
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Xóa một key (không lỗi nếu không có)"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -15,6 +15,38 @@ VIDEO_STATUSES = [
     VIDEO_STATUS_FAILED
 ]
 
+# Upload Session Status (upload theo chunk)
+UPLOAD_STATUS_UPLOADING = 'uploading'
+UPLOAD_STATUS_WRITING = 'writing'        # một request đang ghi chunk (lease trong DB)
+UPLOAD_STATUS_FINALIZING = 'finalizing'  # đang tạo video từ file đã nhận
+UPLOAD_STATUS_COMPLETED = 'completed'
+
+# Processing Job Status
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_PROCESSING = 'processing'
+JOB_STATUS_COMPLETED = 'completed'
+JOB_STATUS_FAILED = 'failed'
+
+JOB_ACTIVE_STATUSES = [
+    JOB_STATUS_QUEUED,
+    JOB_STATUS_PROCESSING
+]
+
+# Phiên bản pipeline: tăng khi thay đổi cách tạo phụ đề/từ vựng/quiz để video
+# trùng nội dung không dùng lại kết quả của pipeline cũ
+PIPELINE_VERSION = '1'
+
+# Pipeline Stages (checkpoint keys)
+PIPELINE_STAGE_INFO = 'info'
+PIPELINE_STAGE_AUDIO = 'audio'
+PIPELINE_STAGE_LANGUAGE = 'language'
+PIPELINE_STAGE_TRANSCRIBE = 'transcribe'
+PIPELINE_STAGE_TRANSLATE = 'translate'
+PIPELINE_STAGE_SUBTITLE = 'subtitle'
+PIPELINE_STAGE_VOCABULARY = 'vocabulary'
+PIPELINE_STAGE_QUIZ = 'quiz'
+PIPELINE_STAGE_HLS = 'hls'
+
 # Learned Status
 LEARNED_STATUS_LEARNING = 'learning'
 LEARNED_STATUS_LEARNED = 'learned'
@@ -75,6 +107,17 @@ VIDEO_EXTENSIONS = ['mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv']
 AUDIO_EXTENSIONS = ['mp3', 'wav', 'aac', 'm4a']
 SUBTITLE_EXTENSIONS = ['srt', 'vtt']
 
+# MIME types cho stream/download video (mimetypes của Python thiếu mkv/flv tùy hệ điều hành)
+VIDEO_MIME_TYPES = {
+    'mp4': 'video/mp4',
+    'avi': 'video/x-msvideo',
+    'mov': 'video/quicktime',
+    'mkv': 'video/x-matroska',
+    'flv': 'video/x-flv',
+    'wmv': 'video/x-ms-wmv',
+    'webm': 'video/webm'
+}
+
 # Subtitle Formats
 SUBTITLE_FORMAT_SRT = 'srt'
 SUBTITLE_FORMAT_VTT = 'vtt'
@@ -10,7 +10,11 @@ from werkzeug.utils import secure_filename
 logger = logging.getLogger(__name__)
 
 
-def save_uploaded_file(file, upload_folder, subfolder=''):
+# Kích thước mỗi lần đọc khi ghi/hash file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def save_uploaded_file(file, upload_folder, subfolder='', hasher=None):
     """
     Lưu file được upload
     
@@ -18,6 +22,7 @@ def save_uploaded_file(file, upload_folder, subfolder=''):
         file: File object từ request
         upload_folder: Thư mục lưu file
         subfolder: Thư mục con (optional)
+        hasher: hashlib object (optional), được update trong lúc ghi file
     
     Returns:
         tuple: (success: bool, file_path: str, message: str)
@@ -39,8 +44,15 @@ def save_uploaded_file(file, upload_folder, subfolder=''):
         # Đường dẫn file hoàn chỉnh
         file_path = os.path.join(save_path, unique_filename)
         
-        # Lưu file
-        file.save(file_path)
+        # Lưu file (đọc theo chunk, hash cùng lúc)
+        with open(file_path, 'wb') as output:
+            while True:
+                chunk = file.stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                output.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
         
         logger.info(f"File đã được lưu: {file_path}")
         
@@ -0,0 +1,75 @@
+"""
+Pagination Utilities
+Phân trang keyset (cursor): thay vì OFFSET (chậm dần ở trang sâu), trang sau được lấy bằng
+điều kiện WHERE trên khóa sắp xếp của dòng cuối trang trước.
+
+Cursor là base64 (urlsafe) của danh sách giá trị khóa; client chỉ cần gửi lại nguyên văn.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(*values):
+    """
+    Tạo cursor từ giá trị khóa sắp xếp của dòng cuối trang
+
+    Returns:
+        str
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, *converters):
+    """
+    Đọc cursor, áp dụng converter cho từng giá trị (vd. datetime.fromisoformat, int)
+
+    Returns:
+        tuple: Giá trị khóa
+
+    Raises:
+        ValueError: Cursor không hợp lệ
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Cursor không hợp lệ")
+
+    if not isinstance(values, list) or len(values) != len(converters):
+        raise ValueError("Cursor không hợp lệ")
+
+    try:
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except (TypeError, ValueError):
+        raise ValueError("Cursor không hợp lệ")
+
+
+def keyset_filter(columns, values):
+    """
+    Điều kiện lấy các dòng đứng sau cursor khi sắp xếp giảm dần theo `columns`
+    (col1 < v1 OR (col1 = v1 AND col2 < v2) ...; không dùng so sánh tuple vì SQL Server
+    không hỗ trợ)
+
+    Args:
+        columns: Các cột sắp xếp (cột cuối phải unique, vd. khóa chính)
+        values: Giá trị tương ứng đọc từ cursor
+    """
+    conditions = []
+
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        conditions.append(and_(*equal_prefix, column < value))
+
+    return or_(*conditions)
+
+
+def parse_bool_arg(value, default=False):
+    """Đọc query param dạng boolean (true/1/yes)"""
+    if value is None:
+        return default
+    return value.lower() in ('true', '1', 'yes')
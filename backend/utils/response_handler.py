@@ -55,21 +55,31 @@ def error_response(message="Đã xảy ra lỗi", status_code=400, error=None):
     return response
 
 
-def paginated_response(items, page, per_page, total_items, message="Thành công"):
+def paginated_response(items, page, per_page, total_items, message="Thành công", next_cursor=None,
+                       cursor=None):
     """
     Tạo response có phân trang
     
     Args:
         items: Danh sách items
-        page: Trang hiện tại
+        page: Trang hiện tại (None khi phân trang theo cursor)
         per_page: Số items mỗi trang
-        total_items: Tổng số items
+        total_items: Tổng số items (None nếu không đếm)
         message: Thông báo
+        next_cursor: Cursor để lấy trang tiếp theo (None nếu hết dữ liệu)
+        cursor: Cursor client đã gửi (có cursor → có trang trước)
     
     Returns:
         Dictionary chứa paginated response
     """
-    total_pages = (total_items + per_page - 1) // per_page
+    total_pages = (total_items + per_page - 1) // per_page if total_items is not None else None
+    
+    if page is None or total_pages is None:
+        has_next = next_cursor is not None
+    else:
+        has_next = page < total_pages
+    
+    has_prev = cursor is not None if page is None else page > 1
     
     response = success_response(
         message=message,
@@ -80,10 +90,11 @@ def paginated_response(items, page, per_page, total_items, message="Thành công
                 "per_page": per_page,
                 "total_items": total_items,
                 "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": has_next,
+                "has_prev": has_prev,
+                "next_cursor": next_cursor
             }
         }
     )
     
-    return response
\ No newline at end of file
+    return response